@@ -8,6 +8,7 @@ from .gui_node_manager import BlenderGUINodeManager
 from .node_menu_manager import node_menu_manager, HiveNodeMenu
 from .text_area import BlenderTextAreaManager
 from .types import HiveNodeTree
+from ..models import model
 from ..node_manager import NodeManager
 
 hives = get_hives(test_sca, dragonfly, sparta)
@@ -74,7 +75,8 @@ class BlendManager:
             pass
 
         else:
-            gui_manager.node_manager.from_string(text_block.as_string())
+            # Only apply the changes, rather than re-creating all nodes
+            gui_manager.node_manager.patch_hivemap(model.Hivemap(text_block.as_string()))
 
     def on_loaded(self):
         self._gui_node_managers.clear()
@@ -0,0 +1,87 @@
+from copy import deepcopy
+
+from .utils import freeze
+
+
+class InspectionCache:
+    """Memoise the results of hive inspection, keyed by reference path and configured meta args.
+
+    Values that depend only upon the hive class built from the meta args (such as the pin layout, or the inspector
+    options of each stage) can be shared between all nodes of the same reference path and meta args.
+    """
+
+    def __init__(self):
+        self._reference_path_to_entries = {}
+
+    def get(self, reference_path, meta_args):
+        """Return the cached value for a reference path and meta args.
+
+        Raises KeyError if no value is cached.
+
+        :param reference_path: reference path of hive
+        :param meta_args: meta args dictionary
+        """
+        entries = self._reference_path_to_entries[reference_path]
+        try:
+            key = freeze(meta_args)
+
+        except TypeError:
+            raise KeyError(reference_path)
+
+        return entries[key][1]
+
+    def set(self, reference_path, meta_args, value):
+        """Cache a value for a reference path and meta args.
+
+        Values for unhashable meta args are not cached.
+
+        :param reference_path: reference path of hive
+        :param meta_args: meta args dictionary
+        :param value: value to cache
+        """
+        try:
+            key = freeze(meta_args)
+
+        except TypeError:
+            return
+
+        try:
+            entries = self._reference_path_to_entries[reference_path]
+
+        except KeyError:
+            entries = self._reference_path_to_entries[reference_path] = {}
+
+        entries[key] = deepcopy(meta_args), value
+
+    def get_entries(self, reference_path):
+        """Return list of (meta args, value) pairs cached for a reference path
+
+        :param reference_path: reference path of hive
+        """
+        return list(self._reference_path_to_entries.get(reference_path, {}).values())
+
+    def invalidate(self, reference_path):
+        """Remove all cached values for a reference path
+
+        :param reference_path: reference path of hive
+        """
+        self._reference_path_to_entries.pop(reference_path, None)
+
+    def clear(self):
+        """Remove all cached values"""
+        self._reference_path_to_entries.clear()
+
+    def __contains__(self, reference_path):
+        return reference_path in self._reference_path_to_entries
+
+
+# Pin layouts (produced by HiveNodeFactory)
+pin_layout_cache = InspectionCache()
+# Inspector options of each stage (produced by HiveNodeInspector)
+inspection_cache = InspectionCache()
+
+
+def clear_caches():
+    """Clear all cached inspection results"""
+    pin_layout_cache.clear()
+    inspection_cache.clear()
@@ -1,17 +1,120 @@
+from ast import literal_eval
+from collections import defaultdict, namedtuple
+from hashlib import sha256
+from logging import getLogger
+from operator import attrgetter
+
 from .models import model
 from .utils import hive_import_from_path
 
 
-def _eval_spyder_string(type_name, value):
-    """Helper function
+logger = getLogger(__name__)
+
+
+def _decode_bool(value):
+    try:
+        return {"True": True, "False": False}[value]
+
+    except KeyError:
+        raise ValueError(value)
+
+
+def _decode_none(value):
+    if value != "None":
+        raise ValueError(value)
+
+    return None
+
+
+def _decode_number(value):
+    value = value.strip()
+
+    if value.lstrip("+-").isdigit():
+        return int(value)
+
+    return float(value)
+
+
+def _decode_number_sequence(value, opening, closing):
+    """Decode repr of a flat sequence of numbers, e.g (1.0, 2.0, 3.0)
+
+    :param value: value string
+    :param opening: opening bracket
+    :param closing: closing bracket
+    """
+    value = value.strip()
+    if not (value.startswith(opening) and value.endswith(closing)):
+        raise ValueError(value)
+
+    body = value[1:-1].strip()
+    if not body:
+        return []
+
+    items = body.split(",")
+    # Permit trailing comma
+    if not items[-1].strip():
+        del items[-1]
+
+    return [_decode_number(item) for item in items]
+
+
+def _decode_number_tuple(value):
+    return tuple(_decode_number_sequence(value, "(", ")"))
+
+
+def _decode_number_list(value):
+    return _decode_number_sequence(value, "[", "]")
+
+
+# Decoders for parameter value strings, by data type.
+# Decoders raise ValueError for values they cannot handle, which are then decoded with ast.literal_eval
+parameter_decoders = {
+    "str": str,
+    "bool": _decode_bool,
+    "NoneType": _decode_none,
+    "int": int,
+    "float": float,
+    "tuple": _decode_number_tuple,
+    "list": _decode_number_list,
+    "vector": _decode_number_tuple,
+    "colour": _decode_number_tuple,
+    "euler": _decode_number_tuple,
+}
+
+
+def register_parameter_decoder(data_type, decoder):
+    """Register a decoder for parameter value strings of a given data type
+
+    :param data_type: name of parameter type
+    :param decoder: callable which takes the value string, and returns the value or raises ValueError
+    """
+    parameter_decoders[data_type] = decoder
+
 
-    Writing repr'd strings to Spyder String objects will remove the leading apostrophe,
-    Handle this case explicitly before calling eval
+def decode_parameter_value(data_type, value):
+    """Decode parameter value string written by parameter_dict_to_array.
+
+    Writing repr'd strings to Spyder String objects will remove the leading apostrophe, so strings are stored verbatim.
+    Other values are decoded by the registered decoder for their data type, falling back to ast.literal_eval.
+    Arbitrary expressions are never evaluated.
+
+    :param data_type: name of parameter type
+    :param value: value string
     """
-    if type_name == "str":
-        return str(value)
+    decoder = parameter_decoders.get(data_type)
+
+    if decoder is not None:
+        try:
+            return decoder(value)
+
+        except (ValueError, TypeError):
+            pass
 
-    return eval(value)
+    try:
+        return literal_eval(value)
+
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError) as err:
+        raise ValueError("Unable to decode {} parameter value: {!r}".format(data_type, value)) from err
 
 
 def _get_type_name(value):
@@ -31,7 +134,7 @@ def parameter_group_array_to_dict(parameter_group_array):
 
 
 def parameter_array_to_dict(array):
-    return {p.identifier: _eval_spyder_string(p.data_type, p.value) for p in array}
+    return {p.identifier: decode_parameter_value(p.data_type, p.value) for p in array}
 
 
 def parameter_dict_to_array(parameters):
@@ -43,29 +146,85 @@ wraps_attribute_reference_paths = {"hive.pull_in", "hive.push_in", "hive.push_ou
 wrapper_reference_paths = io_reference_path | wraps_attribute_reference_paths
 
 
-def hivemap_to_python_source(hivemap, class_name, builder_name="builder"):
-    """Generate Hive builder from Hivemap
+HivemapSource = namedtuple("HivemapSource", "source digest")
+PrunedHivemapPlan = namedtuple("PrunedHivemapPlan", "plan removed_identifiers")
+HivemapPlan = namedtuple("HivemapPlan", "imports docstring modifiers declarations connections io_declarations")
 
-    :param hivemap: Hivemap instance
-    :param class_name: name of class
-    :param builder_name: name of builder function
+# Builder statements, with attribute paths as tuples of names from the builder wrappers (i or ex)
+HiveDeclaration = namedtuple("HiveDeclaration", "identifier reference_path argument_stages")
+AttributeDeclaration = namedtuple("AttributeDeclaration", "wrapper_name identifier data_type start_value_source")
+ModifierDeclaration = namedtuple("ModifierDeclaration", "identifier")
+TriggerfuncDeclaration = namedtuple("TriggerfuncDeclaration", "identifier")
+WrapperDeclaration = namedtuple("WrapperDeclaration", "identifier reference_path attribute_path")
+ConnectionStatement = namedtuple("ConnectionStatement", "source_path target_path is_trigger is_pre_trigger")
+IODeclaration = namedtuple("IODeclaration", "identifier reference_path target_path")
+
+# Record types of a HivemapPlan, for serialisation with hivemap_io.dump_literal
+plan_record_types = (HivemapPlan, HiveDeclaration, AttributeDeclaration, ModifierDeclaration, TriggerfuncDeclaration,
+                     WrapperDeclaration, ConnectionStatement, IODeclaration)
+
+
+def _format_keyword_arguments(arguments):
+    return ", ".join(["{}={!r}".format(k, v) for k, v in arguments.items()])
+
+
+def _get_hive_argument_stages(params, import_result):
+    """Return list of keyword argument dictionaries, one for each call required to instantiate a HIVE node
+
+    :param params: node parameters dictionary
+    :param import_result: result of hive_import_from_path for reference path
     """
-    if not class_name.isidentifier():
-        raise ValueError("Class name must be a Python identifier, not '{}'".format(class_name))
+    args = params.get("args", {})
+    cls_args = params.get("cls_args", {})
 
-    if not builder_name.isidentifier():
-        raise ValueError("Builder name must be a Python identifier, not '{}'".format(builder_name))
+    # A pre-configured meta-hive
+    if import_result.is_meta_primitive:
+        all_args = args.copy()
+        all_args.update(cls_args)
+        return [all_args]
+
+    hive_cls = import_result.cls
+
+    is_meta_hive = bool(hive_cls._declarators)
+    is_dyna_hive = hive_cls._is_dyna_hive
+
+    meta_args = params.get("meta_args", {})
+
+    # Two stage instantiation (an unconfigured meta hive)
+    if is_meta_hive and not is_dyna_hive:
+        non_meta_args = args.copy()
+        non_meta_args.update(cls_args)
+        return [meta_args, non_meta_args]
 
+    # One stage instantiation (a dyna/normal hive)
+    all_args = meta_args.copy()
+    all_args.update(args)
+    all_args.update(cls_args)
+    return [all_args]
+
+
+def plan_hivemap(hivemap, import_editor=True):
+    """Analyse Hivemap into the statements of a Hive builder
+
+    Each hive reference path is imported once.
+
+    :param hivemap: Hivemap instance
+    :param import_editor: import hive_editor (to support importing nested hivemaps)
+    """
     bees = {}
     # Add hive and hive_gui to support declarations and hivemap import machinery
-    additional_imports = set()
-    required_imports = ["hive_editor", "hive"]
+    # (Ordered by first use, for deterministic output)
+    additional_imports = {}
+    required_imports = ["hive_editor", "hive"] if import_editor else ["hive"]
 
-    declaration_body = []
+    modifiers = []
+    declarations = []
 
     wraps_attribute = []
     attribute_name_to_wrapper = {}
 
+    reference_path_to_import_result = {}
+
     # Build hives
     for spyder_bee_node in hivemap.nodes:
         identifier = spyder_bee_node.identifier
@@ -78,52 +237,23 @@ def hivemap_to_python_source(hivemap, class_name, builder_name="builder"):
         if spyder_bee_node.family == "HIVE":
             # Add import path to import set
             root, cls = reference_path.rsplit(".", 1)
-            additional_imports.add(root)
+            additional_imports[root] = None
 
             # Find Hive class and inspect it
             try:
-                import_result = hive_import_from_path(reference_path)
+                import_result = reference_path_to_import_result[reference_path]
 
-            except (ImportError, AttributeError):
-                raise ValueError("Invalid reference path: {}".format(reference_path))
+            except KeyError:
+                try:
+                    import_result = hive_import_from_path(reference_path)
 
-            args = params.get("args", {})
-            cls_args = params.get("cls_args", {})
+                except (ImportError, AttributeError):
+                    raise ValueError("Invalid reference path: {}".format(reference_path))
 
-            # A pre-configured meta-hive
-            if import_result.is_meta_primitive:
-                all_args = args.copy()
-                all_args.update(cls_args)
+                reference_path_to_import_result[reference_path] = import_result
 
-                all_arg_pairs = ", ".join(["{}={}".format(k, repr(v)) for k, v in all_args.items()])
-                statement = "i.{} = {}({})".format(identifier, reference_path, all_arg_pairs)
-
-            else:
-                hive_cls = import_result.cls
-
-                is_meta_hive = bool(hive_cls._declarators)
-                is_dyna_hive = hive_cls._is_dyna_hive
-
-                meta_args = params.get("meta_args", {})
-
-                # Two stage instantiation (an unconfigured meta hive)
-                if is_meta_hive and not is_dyna_hive:
-                    non_meta_args = args.copy()
-                    non_meta_args.update(cls_args)
-                    meta_arg_pairs = ", ".join(["{}={}".format(k, repr(v)) for k, v in meta_args.items()])
-                    arg_pairs = ", ".join(["{}={}".format(k, repr(v)) for k, v in non_meta_args.items()])
-                    statement = "i.{} = {}({})({})".format(identifier, reference_path, meta_arg_pairs, arg_pairs)
-
-                # One stage instantiation (a dyna/normal hive)
-                else:
-                    all_args = meta_args.copy()
-                    all_args.update(args)
-                    all_args.update(cls_args)
-
-                    all_arg_pairs = ", ".join(["{}={}".format(k, repr(v)) for k, v in all_args.items()])
-                    statement = "i.{} = {}({})".format(identifier, reference_path, all_arg_pairs)
-
-            declaration_body.append(statement)
+            argument_stages = _get_hive_argument_stages(params, import_result)
+            declarations.append(HiveDeclaration(identifier, reference_path, argument_stages))
 
         # Handle BEE nodes
         elif spyder_bee_node.family == "BEE":
@@ -133,7 +263,7 @@ def hivemap_to_python_source(hivemap, class_name, builder_name="builder"):
             if reference_path in wrapper_reference_paths:
                 # If bee wraps an attribute
                 if reference_path in wraps_attribute_reference_paths:
-                    wraps_attribute.append(spyder_bee_node)
+                    wraps_attribute.append((spyder_bee_node, params))
 
                 continue
 
@@ -151,51 +281,43 @@ def hivemap_to_python_source(hivemap, class_name, builder_name="builder"):
                 else:
                     wrapper_name = "i"
 
-                declaration_body.append("{}.{} = hive.attribute('{}', {})"
-                                        .format(wrapper_name, identifier, data_type, start_value))
+                declarations.append(AttributeDeclaration(wrapper_name, identifier, data_type, str(start_value)))
                 attribute_name_to_wrapper[identifier] = wrapper_name
 
             # For modifier
             elif reference_path == "hive.modifier":
                 args = params['args']
-                code = args['code']
-
-                code_body = "\n    ".join(code.split("\n"))
-                statement = """def {}(self):\n    {}\n""".format(identifier, code_body)
-                declaration_body[:0] = statement.split("\n")
-                declaration_body.append("i.{0} = hive.modifier({0})".format(identifier))
+                modifiers.append((identifier, args['code']))
+                declarations.append(ModifierDeclaration(identifier))
 
             elif reference_path == "hive.triggerfunc":
-                declaration_body.append("i.{} = hive.triggerfunc()".format(identifier))
+                declarations.append(TriggerfuncDeclaration(identifier))
 
         else:
             raise ValueError(spyder_bee_node.family)
 
     # Second Bee pass (For attribute wrappers)
-    for spyder_bee_node in wraps_attribute:
-        reference_path = spyder_bee_node.reference_path
-        params = parameter_group_array_to_dict(spyder_bee_node.parameter_groups)
-
+    for spyder_bee_node, params in wraps_attribute:
         # Get attribute
         meta_args = params['meta_args']
         attribute_name = meta_args['attribute_name']
         attribute_wrapper = attribute_name_to_wrapper[attribute_name]
 
-        declaration_body.append("i.{} = {}({}.{})".format(spyder_bee_node.identifier, reference_path, attribute_wrapper,
-                                                          attribute_name))
+        declarations.append(WrapperDeclaration(spyder_bee_node.identifier, spyder_bee_node.reference_path,
+                                               (attribute_wrapper, attribute_name)))
 
     # At this point, wrappers have attribute, modifier, triggerfunc, pullin, pullout, pushin, pushout
     io_definitions = []
 
     # Define connections
-    connectivity_body = []
+    connections = []
     for connection in hivemap.connections:
         from_identifier = connection.from_node
         to_identifier = connection.to_node
 
         # From a HIVE
         if from_identifier not in bees:
-            source_path = "i.{}.{}".format(from_identifier, connection.output_name)
+            source_path = "i", from_identifier, connection.output_name
 
             is_pre_trigger = False
 
@@ -209,11 +331,11 @@ def hivemap_to_python_source(hivemap, class_name, builder_name="builder"):
                 continue
 
             # Here bee can be triggerfunc [trigger, pretrigger] or a push in/out [pre, post update value]]
-            source_path = "i.{}".format(from_identifier)
+            source_path = "i", from_identifier
             is_pre_trigger = "pre" in connection.output_name  # HACK XXX
 
         if to_identifier not in bees:
-            target_path = "i.{}.{}".format(to_identifier, connection.input_name)
+            target_path = "i", to_identifier, connection.input_name
 
         # From a BEE
         else:
@@ -225,16 +347,12 @@ def hivemap_to_python_source(hivemap, class_name, builder_name="builder"):
                 continue
 
             # Here bee can be modifier[trigger], ppio[trigger,value]
-            target_path = "i.{}".format(to_identifier)
-
-        if connection.is_trigger:
-            connectivity_body.append("hive.trigger({}, {}, pretrigger={})".format(source_path, target_path, is_pre_trigger))
+            target_path = "i", to_identifier
 
-        else:
-            connectivity_body.append("hive.connect({}, {})".format(source_path, target_path))
+        connections.append(ConnectionStatement(source_path, target_path, connection.is_trigger, is_pre_trigger))
 
     # Define IO pins (antenna, entry, output, hook)
-    io_body = []
+    io_declarations = []
     for connection in io_definitions:
         from_identifier = connection.from_node
         to_identifier = connection.to_node
@@ -252,10 +370,10 @@ def hivemap_to_python_source(hivemap, class_name, builder_name="builder"):
 
             # From a generic other bee
             else:
-                target_path = "i.{}".format(from_identifier)
+                target_path = "i", from_identifier
 
         else:
-            target_path = "i.{}.{}".format(from_identifier, connection.output_name)
+            target_path = "i", from_identifier, connection.output_name
 
         # To a BEE
         if to_identifier in bees:
@@ -269,51 +387,485 @@ def hivemap_to_python_source(hivemap, class_name, builder_name="builder"):
             # To a generic other bee
             else:
                 assert target_path is None
-                target_path = "i.{}".format(to_identifier)
+                target_path = "i", to_identifier
 
         # To a hive
         else:
             assert target_path is None
-            target_path = "i.{}.{}".format(to_identifier, connection.input_name)
+            target_path = "i", to_identifier, connection.input_name
+
+        io_declarations.append(IODeclaration(wrapper_bee.identifier, wrapper_bee.reference_path, target_path))
+
+    imports = required_imports + list(additional_imports)
+    return HivemapPlan(imports, hivemap.docstring, modifiers, declarations, connections, io_declarations)
+
+
+def _format_modifier_definition(identifier, code):
+    code_body = "\n    ".join(code.split("\n"))
+    return "def {}(self):\n    {}\n".format(identifier, code_body)
+
+
+def _format_declaration(declaration):
+    if isinstance(declaration, HiveDeclaration):
+        calls = "".join(["({})".format(_format_keyword_arguments(a)) for a in declaration.argument_stages])
+        return "i.{} = {}{}".format(declaration.identifier, declaration.reference_path, calls)
+
+    if isinstance(declaration, AttributeDeclaration):
+        return "{}.{} = hive.attribute('{}', {})".format(declaration.wrapper_name, declaration.identifier,
+                                                         declaration.data_type, declaration.start_value_source)
+
+    if isinstance(declaration, ModifierDeclaration):
+        return "i.{0} = hive.modifier({0})".format(declaration.identifier)
+
+    if isinstance(declaration, TriggerfuncDeclaration):
+        return "i.{} = hive.triggerfunc()".format(declaration.identifier)
+
+    if isinstance(declaration, WrapperDeclaration):
+        return "i.{} = {}({})".format(declaration.identifier, declaration.reference_path,
+                                      ".".join(declaration.attribute_path))
+
+    raise TypeError(declaration)
+
+
+def _format_connection(connection):
+    source_path = ".".join(connection.source_path)
+    target_path = ".".join(connection.target_path)
+
+    if connection.is_trigger:
+        return "hive.trigger({}, {}, pretrigger={})".format(source_path, target_path, connection.is_pre_trigger)
+
+    return "hive.connect({}, {})".format(source_path, target_path)
 
-        io_body.append("ex.{} = {}({})".format(wrapper_bee.identifier, wrapper_bee.reference_path, target_path))
 
-    body_declaration_statement = ""
+def _get_builder_docstring(docstring):
+    return docstring + ("\n" if "\n" in docstring else "")
 
-    docstring = hivemap.docstring
+
+def plan_to_python_source(plan, class_name, builder_name="builder"):
+    """Generate Hive builder source from HivemapPlan
+
+    Source lines are collected into flat lists and joined once.
+
+    :param plan: HivemapPlan instance
+    :param class_name: name of class
+    :param builder_name: name of builder function
+    """
+    # Write builder body into a single buffer of lines
+    body_lines = []
+
+    docstring = plan.docstring
 
     if docstring:
-        new_line = "\n" if "\n" in docstring else ""
         # Escape quotation characters
-        escaped_docstring = docstring.replace("\"", r'\"')
-        body_declaration_statement += '"""{}{}"""\n'.format(escaped_docstring, new_line)
+        escaped_docstring = _get_builder_docstring(docstring).replace("\"", r'\"')
+        body_lines.extend('"""{}"""'.format(escaped_docstring).split("\n"))
 
-    if declaration_body:
-        body_declaration_statement += "# Declarations\n{}\n\n".format("\n".join(declaration_body))
+    if plan.declarations:
+        body_lines.append("# Declarations")
 
-    if connectivity_body:
-        body_declaration_statement += "# Connectivity\n{}\n\n".format("\n".join(connectivity_body))
+        # Modifier definitions precede other declarations (most recent first)
+        for identifier, code in reversed(plan.modifiers):
+            body_lines.extend(_format_modifier_definition(identifier, code).split("\n"))
 
-    if io_body:
-        body_declaration_statement += "# IO\n{}\n\n".format("\n".join(io_body))
+        for declaration in plan.declarations:
+            body_lines.extend(_format_declaration(declaration).split("\n"))
 
-    all_imports = required_imports + list(additional_imports)
+        body_lines.append("")
 
-    if all_imports:
-        import_statement = "# Imports\n{}\n".format("\n".join(["import {}".format(x) for x in all_imports]))
+    if plan.connections:
+        body_lines.append("# Connectivity")
+        body_lines.extend([_format_connection(c) for c in plan.connections])
+        body_lines.append("")
 
-    else:
-        import_statement = ""
+    if plan.io_declarations:
+        body_lines.append("# IO")
+        body_lines.extend(["ex.{} = {}({})".format(d.identifier, d.reference_path, ".".join(d.target_path))
+                           for d in plan.io_declarations])
+        body_lines.append("")
+
+    # Terminate final section
+    if body_lines:
+        body_lines.append("")
+
+    lines = []
+
+    if plan.imports:
+        lines.append("# Imports")
+        lines.extend(["import {}".format(x) for x in plan.imports])
+
+    lines.append("")
+    lines.append("")
+    lines.append("def {}(i, ex, args):".format(builder_name))
 
     # Allow empty hives to be built
-    if not body_declaration_statement:
-        builder_body = "pass"
+    if not body_lines:
+        lines.append("    pass")
+
+    else:
+        lines.extend(["    {}".format(l) for l in body_lines])
+
+    lines.append("{class_name} = hive.hive('{class_name}', builder={builder_name})"
+                 .format(class_name=class_name, builder_name=builder_name))
+    return "\n".join(lines)
+
+
+def _validate_names(class_name, builder_name):
+    if not class_name.isidentifier():
+        raise ValueError("Class name must be a Python identifier, not '{}'".format(class_name))
+
+    if not builder_name.isidentifier():
+        raise ValueError("Builder name must be a Python identifier, not '{}'".format(builder_name))
+
+
+def hivemap_to_python_source(hivemap, class_name, builder_name="builder", import_editor=True, prune_unreachable=False):
+    """Generate Hive builder from Hivemap
+
+    :param hivemap: Hivemap instance
+    :param class_name: name of class
+    :param builder_name: name of builder function
+    :param import_editor: import hive_editor (not required if nested hivemaps are compiled to modules)
+    :param prune_unreachable: remove nodes which are not connected to the hive IO or behaviour
+    (see prune_unreachable_nodes)
+    """
+    _validate_names(class_name, builder_name)
+
+    plan = plan_hivemap(hivemap, import_editor)
+    if prune_unreachable:
+        plan = _prune_plan(plan, class_name)
+
+    return plan_to_python_source(plan, class_name, builder_name)
+
+
+def _find_reachable(roots, adjacency):
+    reachable = set(roots)
+    pending = list(roots)
+
+    while pending:
+        identifier = pending.pop()
+
+        for other_identifier in adjacency[identifier]:
+            if other_identifier not in reachable:
+                reachable.add(other_identifier)
+                pending.append(other_identifier)
+
+    return reachable
+
+
+def prune_unreachable_nodes(plan):
+    """Remove declarations of nodes which are not connected (directly or indirectly) to the hive IO, or to its
+    behaviour.
+
+    Nodes are reachable from IO bees, exported attributes, modifiers and the sources of trigger connections (which
+    run behaviour without any IO), following connections and attribute wrappers in either direction. As modifier code
+    may use any attribute or triggerfunc, these are all kept if the hive has a modifier.
+    Child hives which are not connected to anything else are removed, even if they behave independently.
+
+    Return PrunedHivemapPlan of the new plan and the identifiers of the removed nodes
+
+    :param plan: HivemapPlan instance
+    """
+    adjacency = defaultdict(set)
+
+    for connection in plan.connections:
+        source_identifier = connection.source_path[1]
+        target_identifier = connection.target_path[1]
+
+        adjacency[source_identifier].add(target_identifier)
+        adjacency[target_identifier].add(source_identifier)
+
+    for declaration in plan.declarations:
+        if isinstance(declaration, WrapperDeclaration):
+            attribute_identifier = declaration.attribute_path[1]
+
+            adjacency[declaration.identifier].add(attribute_identifier)
+            adjacency[attribute_identifier].add(declaration.identifier)
+
+    roots = [d.target_path[1] for d in plan.io_declarations]
+    roots.extend([c.source_path[1] for c in plan.connections if c.is_trigger])
+
+    for declaration in plan.declarations:
+        if isinstance(declaration, ModifierDeclaration) or \
+                (isinstance(declaration, AttributeDeclaration) and declaration.wrapper_name == "ex"):
+            roots.append(declaration.identifier)
+
+    if plan.modifiers:
+        roots.extend([d.identifier for d in plan.declarations
+                      if isinstance(d, (AttributeDeclaration, TriggerfuncDeclaration))])
+
+    reachable = _find_reachable(roots, adjacency)
+
+    removed_identifiers = [d.identifier for d in plan.declarations if d.identifier not in reachable]
+    if not removed_identifiers:
+        return PrunedHivemapPlan(plan, removed_identifiers)
+
+    declarations = [d for d in plan.declarations if d.identifier in reachable]
+    modifiers = [(i, c) for i, c in plan.modifiers if i in reachable]
+    connections = [c for c in plan.connections if c.source_path[1] in reachable]
+
+    # Remove imports which are no longer used
+    used_imports = {d.reference_path.rsplit(".", 1)[0] for d in declarations if isinstance(d, HiveDeclaration)}
+    used_imports.update(("hive_editor", "hive"))
+    imports = [i for i in plan.imports if i in used_imports]
+
+    plan = plan._replace(imports=imports, modifiers=modifiers, declarations=declarations, connections=connections)
+    return PrunedHivemapPlan(plan, removed_identifiers)
+
+
+def _prune_plan(plan, class_name):
+    plan, removed_identifiers = prune_unreachable_nodes(plan)
+
+    if removed_identifiers:
+        logger.info("Removed unreachable nodes from {}: {}".format(class_name, ", ".join(removed_identifiers)))
+
+    return plan
+
+
+def canonicalise_plan(plan):
+    """Return HivemapPlan with imports and declarations in a canonical order
+
+    Hivemaps which differ only in node order produce the same canonical plan.
+    Connections and IO declarations keep their order, as it determines trigger order and pin order.
+
+    :param plan: HivemapPlan instance
+    """
+    imports = [i for i in ("hive_editor", "hive") if i in plan.imports]
+    imports.extend(sorted(set(plan.imports).difference(imports)))
+
+    # Wrappers must follow the attributes they wrap
+    declarations = sorted([d for d in plan.declarations if not isinstance(d, WrapperDeclaration)],
+                          key=attrgetter("identifier"))
+    declarations.extend(sorted([d for d in plan.declarations if isinstance(d, WrapperDeclaration)],
+                               key=attrgetter("identifier")))
+
+    modifiers = sorted(plan.modifiers)
+    return plan._replace(imports=imports, modifiers=modifiers, declarations=declarations)
+
+
+def hivemap_to_canonical_python_source(hivemap, class_name, builder_name="builder", import_editor=True,
+                                       prune_unreachable=False):
+    """Generate Hive builder from Hivemap in canonical form.
+
+    Return HivemapSource of source and its SHA-256 hex digest, which can be used to share compiled artefacts
+
+    :param hivemap: Hivemap instance
+    :param class_name: name of class
+    :param builder_name: name of builder function
+    :param import_editor: import hive_editor (not required if nested hivemaps are compiled to modules)
+    :param prune_unreachable: remove nodes which are not connected to the hive IO or behaviour
+    (see prune_unreachable_nodes)
+    """
+    _validate_names(class_name, builder_name)
+
+    plan = plan_hivemap(hivemap, import_editor)
+    if prune_unreachable:
+        plan = _prune_plan(plan, class_name)
+
+    plan = canonicalise_plan(plan)
+    source = plan_to_python_source(plan, class_name, builder_name)
+    return HivemapSource(source, sha256(source.encode("utf-8")).hexdigest())
+
+
+def _resolve_name(namespace, path):
+    """Resolve dotted name from namespace, e.g 'hive.attribute'"""
+    root, *attributes = path.split(".")
+    value = namespace[root]
+
+    for attribute in attributes:
+        value = getattr(value, attribute)
+
+    return value
+
+
+def _path_getter(path):
+    """Return function to resolve attribute path from builder wrappers (i or ex)
+
+    :param path: tuple of names, starting with wrapper name
+    """
+    wrapper_name, *attributes = path
+    get_attributes = attrgetter(".".join(attributes))
+
+    if wrapper_name == "i":
+        return lambda i, ex: get_attributes(i)
+
+    return lambda i, ex: get_attributes(ex)
+
+
+def _compile_modifier_factory(modifiers, namespace, builder_name, file_name):
+    """Compile function which defines the modifier functions of a builder, with access to the builder arguments
+
+    Only the (user) code of modifiers is parsed.
+
+    :param modifiers: list of (identifier, code) pairs
+    :param namespace: global namespace of the builder
+    :param builder_name: name of builder function (modifiers are qualified by it)
+    :param file_name: file name used for tracebacks
+    """
+    lines = ["def {}(i, ex, args):".format(builder_name)]
+
+    for identifier, code in reversed(modifiers):
+        lines.extend(["    {}".format(l) for l in _format_modifier_definition(identifier, code).split("\n")])
+
+    lines.append("    return {{{}}}".format(", ".join(["{0!r}: {0}".format(m) for m, _ in modifiers])))
+
+    local_namespace = {}
+    exec(compile("\n".join(lines), file_name, "exec", dont_inherit=True), namespace, local_namespace)
+    return local_namespace[builder_name]
+
+
+def _bind_declaration(declaration, namespace, file_name):
+    """Return builder step function for a declaration
+
+    :param declaration: declaration from HivemapPlan
+    :param namespace: global namespace of the builder
+    :param file_name: file name used for tracebacks
+    """
+    hive = namespace["hive"]
+    identifier = declaration.identifier
+
+    if isinstance(declaration, HiveDeclaration):
+        hive_cls = _resolve_name(namespace, declaration.reference_path)
+        argument_stages = declaration.argument_stages
+
+        def step(i, ex, modifiers):
+            value = hive_cls
+            for arguments in argument_stages:
+                value = value(**arguments)
+
+            setattr(i, identifier, value)
+
+    elif isinstance(declaration, AttributeDeclaration):
+        data_type = declaration.data_type
+        start_value_source = declaration.start_value_source
+        use_ex = declaration.wrapper_name == "ex"
+
+        # Start values are decoded (never evaluated), and decoded again for each build so that they are not shared
+        decode_parameter_value(data_type, start_value_source)
+
+        def step(i, ex, modifiers):
+            start_value = decode_parameter_value(data_type, start_value_source)
+            setattr(ex if use_ex else i, identifier, hive.attribute(data_type, start_value))
+
+    elif isinstance(declaration, ModifierDeclaration):
+        def step(i, ex, modifiers):
+            setattr(i, identifier, hive.modifier(modifiers[identifier]))
+
+    elif isinstance(declaration, TriggerfuncDeclaration):
+        def step(i, ex, modifiers):
+            setattr(i, identifier, hive.triggerfunc())
+
+    elif isinstance(declaration, WrapperDeclaration):
+        wrapper = _resolve_name(namespace, declaration.reference_path)
+        get_attribute = _path_getter(declaration.attribute_path)
+
+        def step(i, ex, modifiers):
+            setattr(i, identifier, wrapper(get_attribute(i, ex)))
 
     else:
-        builder_body = body_declaration_statement.replace("\n", "\n    ")
+        raise TypeError(declaration)
+
+    return step
+
+
+def _bind_connection(connection, namespace):
+    hive = namespace["hive"]
+    get_source = _path_getter(connection.source_path)
+    get_target = _path_getter(connection.target_path)
+
+    if connection.is_trigger:
+        is_pre_trigger = connection.is_pre_trigger
+
+        def step(i, ex, modifiers):
+            hive.trigger(get_source(i, ex), get_target(i, ex), pretrigger=is_pre_trigger)
+
+    else:
+        def step(i, ex, modifiers):
+            hive.connect(get_source(i, ex), get_target(i, ex))
+
+    return step
+
+
+def _bind_io_declaration(declaration, namespace):
+    wrapper = _resolve_name(namespace, declaration.reference_path)
+    get_target = _path_getter(declaration.target_path)
+    identifier = declaration.identifier
+
+    def step(i, ex, modifiers):
+        setattr(ex, identifier, wrapper(get_target(i, ex)))
+
+    return step
+
+
+def plan_to_builder(plan, namespace=None, builder_name="builder", file_name="<hivemap>"):
+    """Build Hive builder function from HivemapPlan, without generating and parsing Python source.
+
+    Imports of the plan are written to the namespace.
+
+    :param plan: HivemapPlan instance
+    :param namespace: global namespace of the builder (e.g module dict)
+    :param builder_name: name of builder function
+    :param file_name: file name used for tracebacks
+    """
+    if namespace is None:
+        namespace = {}
+
+    for import_path in plan.imports:
+        namespace[import_path.split(".", 1)[0]] = __import__(import_path)
+
+    if plan.modifiers:
+        define_modifiers = _compile_modifier_factory(plan.modifiers, namespace, builder_name, file_name)
+
+    else:
+        define_modifiers = None
+
+    steps = [_bind_declaration(d, namespace, file_name) for d in plan.declarations]
+    steps.extend([_bind_connection(c, namespace) for c in plan.connections])
+    steps.extend([_bind_io_declaration(d, namespace) for d in plan.io_declarations])
+
+    def builder(i, ex, args):
+        if define_modifiers is not None:
+            modifiers = define_modifiers(i, ex, args)
+
+        else:
+            modifiers = None
+
+        for step in steps:
+            step(i, ex, modifiers)
+
+    builder.__name__ = builder.__qualname__ = builder_name
+
+    # Match the docstring of the (indented) generated source
+    if plan.docstring:
+        builder.__doc__ = "\n    ".join(_get_builder_docstring(plan.docstring).split("\n"))
+
+    return builder
+
+
+def hivemap_to_hive_class(hivemap, class_name, builder_name="builder", namespace=None, file_name="<hivemap>",
+                          source_dump_path=None, prune_unreachable=False):
+    """Build Hive class from Hivemap, without generating and parsing Python source
+
+    :param hivemap: Hivemap instance
+    :param class_name: name of class
+    :param builder_name: name of builder function
+    :param namespace: global namespace of the builder (e.g module dict). Builder and class are written to it
+    :param file_name: file name used for tracebacks
+    :param source_dump_path: optional path to write equivalent Python source to, for debugging
+    :param prune_unreachable: remove nodes which are not connected to the hive IO or behaviour
+    (see prune_unreachable_nodes)
+    """
+    _validate_names(class_name, builder_name)
+
+    if namespace is None:
+        namespace = {}
+
+    plan = plan_hivemap(hivemap)
+    if prune_unreachable:
+        plan = _prune_plan(plan, class_name)
+
+    if source_dump_path is not None:
+        with open(source_dump_path, "w") as f:
+            f.write(plan_to_python_source(plan, class_name, builder_name))
 
-    declaration_statement = ("{imports}\n\ndef {builder_name}(i, ex, args):\n    {builder_body}\n"
-                             "{class_name} = hive.hive('{class_name}', builder={builder_name})"
-                             .format(imports=import_statement, builder_name=builder_name, builder_body=builder_body,
-                                     class_name=class_name))
-    return declaration_statement
\ No newline at end of file
+    builder = namespace[builder_name] = plan_to_builder(plan, namespace, builder_name, file_name)
+    hive_cls = namespace[class_name] = namespace["hive"].hive(class_name, builder=builder)
+    return hive_cls
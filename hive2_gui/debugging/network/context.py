@@ -14,8 +14,8 @@ from hive.interfaces import Nameable
 from .utils import pack_pascal_string, unpack_pascal_string
 from .network import Server, Client
 
+from ...hivemap_io import HivemapRecordReader
 from ...importer import get_hook
-from ...models import model
 from ...observer import Observable
 
 HivemapConnection = namedtuple("Connection", "from_node from_name to_node to_name")
@@ -265,24 +265,25 @@ class NetworkDebugContext(ReportedDebugContextBase):
 
         :param file_path: file path of hivemap
         """
-        hivemap = model.Hivemap.fromfile(file_path)
-        name_to_hive = {n.identifier: n for n in hivemap.nodes if n.family == "HIVE"}
-
         connections = set()
 
-        for connection in hivemap.connections:
-            from_identifier = connection.from_node
-            to_identifier = connection.to_node
+        with HivemapRecordReader(file_path) as reader:
+            # Node parameters are not required
+            hive_identifiers = {i for i, family in reader.iter_node_families() if family == "HIVE"}
 
-            if from_identifier not in name_to_hive:
-                continue
+            for connection in reader.iter_connections():
+                from_identifier = connection.from_node
+                to_identifier = connection.to_node
 
-            if to_identifier not in name_to_hive:
-                continue
+                if from_identifier not in hive_identifiers:
+                    continue
+
+                if to_identifier not in hive_identifiers:
+                    continue
 
-            connection = HivemapConnection(from_identifier, connection.output_name,
-                                           to_identifier, connection.input_name)
-            connections.add(connection)
+                connection = HivemapConnection(from_identifier, connection.output_name,
+                                               to_identifier, connection.input_name)
+                connections.add(connection)
 
         return connections
 
@@ -1,7 +1,12 @@
+from collections import namedtuple
+from logging import getLogger
+
 from hive import matchmaker_validation_enabled_as
 
+from .cache import pin_layout_cache
 from .node import Node, NodeTypes, MimicFlags
-from .utils import hive_object_instance_from_import_result, hive_import_from_path, get_io_info
+from .utils import (hive_object_instance_from_import_result, hive_object_class_from_import_result,
+                    hive_import_from_path, hive_pins_are_declared_on_class, get_io_info)
 
 
 class BeeNodeFactory:
@@ -108,47 +113,91 @@ class BeeNodeFactory:
         return node
 
 
+PinLayout = namedtuple("PinLayout", "io_info docstring")
+
+
 class HiveNodeFactory:
     """Create Hive nodes from reference paths"""
 
-    @classmethod
-    def new(cls, name, reference_path, params, param_info):
+    def __init__(self, instantiate_hives=False, logger=None):
+        """Hive node factory initialiser
+
+        :param instantiate_hives: always discover pins from a hive instance, rather than from the external bees
+        declared on the HiveObject class (which does not invoke the initialisers of the bind classes). Hives whose pins
+        are not declared on their class (dyna hives) are always instantiated
+        :param logger: optional logger
+        """
+        if logger is None:
+            logger = getLogger(__name__)
+
+        self._logger = logger
+        self._instantiate_hives = instantiate_hives
+
+    def new(self, name, reference_path, params, param_info):
+        # The pin-out only depends upon the hive class built from the meta args
+        meta_args = params.get("meta_args", {})
+
         try:
-            import_result = hive_import_from_path(reference_path)
+            pin_layout = pin_layout_cache.get(reference_path, meta_args)
 
-        except (ImportError, AttributeError):
-            raise ValueError("Invalid reference path: {}".format(reference_path))
+        except KeyError:
+            try:
+                import_result = hive_import_from_path(reference_path)
 
-        return cls._node_from_import_result(import_result, name, reference_path, params, param_info)
+            except (ImportError, AttributeError):
+                raise ValueError("Invalid reference path: {}".format(reference_path))
 
-    @staticmethod
-    def _node_from_import_result(import_result, name, reference_path, params, param_info):
-        # Allow GUI to instantiate hives without connectivity validation
+            pin_layout = self._pin_layout_from_import_result(import_result, params)
+            pin_layout_cache.set(reference_path, meta_args, pin_layout)
+
+        return self._node_from_pin_layout(pin_layout, name, reference_path, params, param_info)
+
+    def _pin_layout_from_import_result(self, import_result, params):
+        # Allow GUI to build hives without connectivity validation
         with matchmaker_validation_enabled_as(False):
+            if not self._instantiate_hives and hive_pins_are_declared_on_class(import_result):
+                try:
+                    hive_object_cls = hive_object_class_from_import_result(import_result,
+                                                                           params.get("meta_args", {}))
+                    io_info = get_io_info(hive_object_cls)
+
+                except Exception:
+                    self._logger.debug("Unable to discover pins of {} from class, instantiating hive"
+                                       .format(import_result.cls), exc_info=True)
+
+                else:
+                    return PinLayout(io_info, hive_object_cls.__doc__ or "")
+
             hive_object = hive_object_instance_from_import_result(import_result, params)
             io_info = get_io_info(hive_object)
 
-            # Warning later on, the args and cls_args of hive_object might not correspond to params
-            # Altering the params dict from the UI is safe as it won't affect the pin-out on the HiveObject,
-            # so these changes aren't mirrored to the args wrappers on this hive_object
-            # Use the params dict instead of re-scraping the hive_object if reading these values
+        return PinLayout(io_info, hive_object.__doc__ or "")
 
-            node = Node(name, NodeTypes.HIVE, reference_path, params, param_info)
+    @staticmethod
+    def _node_from_pin_layout(pin_layout, name, reference_path, params, param_info):
+        io_info = pin_layout.io_info
 
-            # Set tooltip as docstring
-            with node.make_writable():
-                node.tooltip = hive_object.__doc__ or ""
+        # Warning later on, the args and cls_args of hive_object might not correspond to params
+        # Altering the params dict from the UI is safe as it won't affect the pin-out on the HiveObject,
+        # so these changes aren't mirrored to the args wrappers on this hive_object
+        # Use the params dict instead of re-scraping the hive_object if reading these values
 
-            inputs = io_info['inputs']
-            outputs = io_info['outputs']
+        node = Node(name, NodeTypes.HIVE, reference_path, params, param_info)
 
-            for pin_name in io_info['pin_order']:
-                try:
-                    info = inputs[pin_name]
-                    node.add_input(pin_name, info['data_type'], info['mode'])
+        # Set tooltip as docstring
+        with node.make_writable():
+            node.tooltip = pin_layout.docstring
+
+        inputs = io_info['inputs']
+        outputs = io_info['outputs']
 
-                except KeyError:
-                    info = outputs[pin_name]
-                    node.add_output(pin_name, info['data_type'], info['mode'])
+        for pin_name in io_info['pin_order']:
+            try:
+                info = inputs[pin_name]
+                node.add_input(pin_name, info['data_type'], info['mode'])
 
-            return node
+            except KeyError:
+                info = outputs[pin_name]
+                node.add_output(pin_name, info['data_type'], info['mode'])
+
+        return node
@@ -1,27 +1,275 @@
+import ast
+import json
 import os
-from collections import namedtuple
+import sys
+from ast import literal_eval
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from fnmatch import filter
 from inspect import isclass, getmembers
+from itertools import chain
 from importlib import import_module
+from logging import getLogger
 
 import dragonfly
 import hive
 
+from ..cache import inspection_cache, pin_layout_cache
+from ..factory import PinLayout
+from ..hivemap_io import HIVEMAP_EXTENSIONS, is_hivemap_path
+from ..importer import dependency_stamps_are_current, get_dependency_stamps, get_hook, get_module_dependencies
+from ..inspector import InspectorOption
+from ..utils import underscore_to_camel_case
+
+
+logger = getLogger(__name__)
 
 _hive_lib_dir = os.path.dirname(dragonfly.__path__[0])
 GUI_CONF_FILENAME = "robots.txt"
+DEFAULT_CATALOGUE_PATH = os.path.join(os.path.expanduser("~"), ".hive2_gui", "hive_catalogue.json")
+CATALOGUE_VERSION = 3
 FinderPathElement = namedtuple("FinderPathElement", "name file_path")
+ModuleCandidate = namedtuple("ModuleCandidate", "file_path import_path is_directory mtime size")
+HiveFinderUpdate = namedtuple("HiveFinderUpdate", "added removed changed")
+
+
+class ScanModes:
+    IMPORT, AST = "import", "ast"
+
+
+# Names of hive factory functions that define a new hive class
+_HIVE_FACTORY_NAMES = {"hive", "dyna_hive", "meta_hive"}
+# Base classes that define a new hive class
+_HIVE_BASE_NAMES = {"HiveBuilder", "MetaHivePrimitive"}
+
+
+def _get_file_stamp(file_path, is_directory):
+    """Return (mtime, size) pair used to determine if a module has changed since it was catalogued.
+
+    Packages are stamped by their __init__.py file, if it exists
+
+    :param file_path: path of module file or package directory
+    :param is_directory: True if file path is a package directory
+    """
+    if is_directory:
+        init_file_path = os.path.join(file_path, "__init__.py")
+        if os.path.exists(init_file_path):
+            file_path = init_file_path
+
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_class_key(cls):
+    """Return a string uniquely identifying a class by its definition"""
+    return "{}.{}".format(cls.__module__, cls.__qualname__)
+
+
+def _encode_literal(value):
+    """Return repr of a literal value, for JSON. Raise ValueError if the value cannot be decoded from it
+
+    :param value: value to encode
+    """
+    text = repr(value)
+
+    try:
+        is_literal = literal_eval(text) == value
+
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        is_literal = False
+
+    if not is_literal:
+        raise ValueError("Unable to encode value: {}".format(text))
+
+    return text
+
+
+def _encode_pin_layout(pin_layout):
+    io_info = pin_layout.io_info
+    return _encode_literal([dict(io_info['inputs']), dict(io_info['outputs']), list(io_info['pin_order']),
+                            pin_layout.docstring])
+
+
+def _decode_pin_layout(text):
+    inputs, outputs, pin_order, docstring = literal_eval(text)
+    return PinLayout(dict(inputs=OrderedDict(inputs), outputs=OrderedDict(outputs), pin_order=pin_order), docstring)
+
+
+def _encode_options(param_info):
+    stages = []
+
+    for stage_name, stage_options in param_info.items():
+        options = []
+
+        for name, option in stage_options.items():
+            if option.default is InspectorOption.NoValue:
+                options.append((name, option.data_type, option.options))
+
+            else:
+                options.append((name, option.data_type, option.options, option.default))
+
+        stages.append((stage_name, options))
+
+    return _encode_literal(stages)
+
+
+def _decode_options(text):
+    param_info = {}
+
+    for stage_name, options in literal_eval(text):
+        param_info[stage_name] = stage_options = OrderedDict()
+
+        for name, data_type, choices, *default in options:
+            stage_options[name] = InspectorOption(data_type, *default, options=choices)
+
+    return param_info
+
+
+# Inspection caches persisted in the catalogue, with their encoders and decoders
+_persisted_caches = (("pin_layouts", pin_layout_cache, _encode_pin_layout, _decode_pin_layout),
+                     ("options", inspection_cache, _encode_options, _decode_options))
+
+
+def _is_hive_factory_call(node, hive_module_names, hive_factory_names):
+    """Return True if AST node is a call to a function which defines a new hive class
+
+    E.g hive.hive(...), hive.meta_hive(...) or SomeHive.extend(...)
+    """
+    if not isinstance(node, ast.Call):
+        return False
+
+    func = node.func
+
+    if isinstance(func, ast.Name):
+        return func.id in hive_factory_names
+
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+        if func.value.id in hive_module_names:
+            return func.attr in _HIVE_FACTORY_NAMES
+
+        return func.attr == "extend"
+
+    return False
+
+
+def scan_module_source(source):
+    """Return names of hive classes defined at module level of Python source code, without executing it.
+
+    Recognises hive factory calls (hive.hive, hive.dyna_hive, hive.meta_hive and SomeHive.extend), and classes
+    deriving from HiveBuilder / MetaHivePrimitive or other hives defined in the module.
+    Re-exported (imported) hives are not reported.
+
+    :param source: Python source code
+    """
+    tree = ast.parse(source)
+
+    hive_module_names = {"hive"}
+    hive_factory_names = set()
+    hive_names = []
+
+    for statement in tree.body:
+        if isinstance(statement, ast.Import):
+            for alias in statement.names:
+                if alias.name == "hive":
+                    hive_module_names.add(alias.asname or alias.name)
+
+        elif isinstance(statement, ast.ImportFrom):
+            if statement.module == "hive":
+                for alias in statement.names:
+                    if alias.name in _HIVE_FACTORY_NAMES:
+                        hive_factory_names.add(alias.asname or alias.name)
+
+        elif isinstance(statement, ast.Assign):
+            if not _is_hive_factory_call(statement.value, hive_module_names, hive_factory_names):
+                continue
+
+            for target in statement.targets:
+                if isinstance(target, ast.Name):
+                    hive_names.append(target.id)
+
+        elif isinstance(statement, ast.ClassDef):
+            for base in statement.bases:
+                if isinstance(base, ast.Attribute):
+                    base_name = base.attr
+
+                elif isinstance(base, ast.Name):
+                    base_name = base.id
+
+                else:
+                    continue
+
+                if base_name in _HIVE_BASE_NAMES or base_name in hive_names:
+                    hive_names.append(statement.name)
+                    break
+
+    return hive_names
+
+
+def scan_module_file(candidate):
+    """Return list of [reference path, class key] pairs for each hive class defined in a module, without importing it
+
+    :param candidate: ModuleCandidate instance
+    """
+    import_path = candidate.import_path
+    file_path = candidate.file_path
+
+    # Hivemaps define a single hive, named after the file
+    if is_hivemap_path(file_path):
+        class_name = underscore_to_camel_case(os.path.splitext(os.path.basename(file_path))[0])
+        reference_path = "{}.{}".format(import_path, class_name)
+        return [[reference_path, reference_path]]
+
+    if candidate.is_directory:
+        file_path = os.path.join(file_path, "__init__.py")
+
+        if not os.path.exists(file_path):
+            return []
+
+    with open(file_path, "rb") as f:
+        source = f.read()
+
+    module_hives = []
+    for name in sorted(set(scan_module_source(source))):
+        if name.startswith('_'):
+            continue
+
+        reference_path = "{}.{}".format(import_path, name)
+        module_hives.append([reference_path, reference_path])
+
+    return module_hives
 
 
 class HiveFinder:
     """Search utility to find Hive classes in a filesystem"""
 
-    def __init__(self, *additional_paths):
+    # Smallest number of modules to scan in worker processes
+    min_parallel_scan_count = 32
+
+    def __init__(self, *additional_paths, catalogue_path=DEFAULT_CATALOGUE_PATH, scan_mode=ScanModes.IMPORT,
+                 max_workers=None):
+        """Hive finder initialiser
+
+        :param additional_paths: directories to search in addition to the hive library
+        :param catalogue_path: path of the file used to persist found hives between sessions (None to disable)
+        :param scan_mode: ScanModes.IMPORT to import modules to find hives, or ScanModes.AST to statically analyse
+        their source in worker processes
+        :param max_workers: maximum number of worker processes used by ScanModes.AST (default to CPU count)
+        """
+        if scan_mode not in {ScanModes.IMPORT, ScanModes.AST}:
+            raise ValueError("Invalid scan mode: {}".format(scan_mode))
+
         self._root_paths = {_hive_lib_dir, }
         self.additional_paths = set(additional_paths)
 
         self._path_to_hives = None
         self._all_hives = None
+        self._path_to_candidates = {}
+
+        self._catalogue_path = catalogue_path
+        self._catalogue = None
+
+        self._scan_mode = scan_mode
+        self._max_workers = max_workers
 
     @staticmethod
     def create_initial_search_path(path):
@@ -35,27 +283,162 @@ class HiveFinder:
     def hives_by_path(self):
         return self._path_to_hives.copy()
 
-    def _recurse(self, search_path, results=None, _tracked_classes=None):
-        """Recursively find hive names from module path.
+    def _load_catalogue(self):
+        """Read the persisted catalogue of found hives, keyed by module file path"""
+        if self._catalogue_path is None:
+            return {}
+
+        try:
+            with open(self._catalogue_path) as f:
+                data = json.load(f)
+
+        except (OSError, ValueError):
+            return {}
+
+        if data.get("version") != CATALOGUE_VERSION:
+            return {}
+
+        return data["modules"]
+
+    @staticmethod
+    def _restore_inspections(entry):
+        """Restore the persisted inspection results of the hives of a catalogue entry to the inspection caches.
+
+        Inspection results are discarded if any of the modules which the module depended upon have changed
+
+        :param entry: catalogue entry of an unchanged module
+        """
+        if not dependency_stamps_are_current(entry.get('dependencies', ())):
+            entry['inspections'] = {}
+            entry['dependencies'] = []
+            return
+
+        for reference_path, inspections in entry.get('inspections', {}).items():
+            for key, cache, _, decode in _persisted_caches:
+                for meta_args_text, value_text in inspections.get(key, ()):
+                    try:
+                        meta_args = literal_eval(meta_args_text)
+                        value = decode(value_text)
+
+                    except (ValueError, SyntaxError, TypeError):
+                        continue
+
+                    # Results of this session are newer
+                    try:
+                        cache.get(reference_path, meta_args)
+
+                    except KeyError:
+                        cache.set(reference_path, meta_args, value)
+
+    @staticmethod
+    def _store_inspections(entry):
+        """Write the cached inspection results of the hives of a catalogue entry to the entry, with the stamps of the
+        modules which the module depends upon (if it was imported)
+
+        :param entry: catalogue entry
+        """
+        persisted = entry.get('inspections', {})
+        stored = {}
+
+        for reference_path, _ in entry['hives']:
+            inspections = {}
+
+            for key, cache, encode, _ in _persisted_caches:
+                text_pairs = OrderedDict(persisted.get(reference_path, {}).get(key, ()))
+
+                for meta_args, value in cache.get_entries(reference_path):
+                    try:
+                        text_pairs[_encode_literal(meta_args)] = encode(value)
+
+                    except ValueError:
+                        continue
+
+                if text_pairs:
+                    inspections[key] = list(text_pairs.items())
+
+            if inspections:
+                stored[reference_path] = inspections
 
-        Write to dict the qualified name of the package, with a set of Hive class names.
-        Root values (Hives) are identified by None values.
+        # Otherwise, the module was not imported this session, so the persisted stamps still apply
+        module = sys.modules.get(entry['import_path'])
 
-        E.g "dragonfly/std/buffer/Buffer" -> {"dragonfly": {"std": {"Buffer": None}}}
+        if stored and module is not None:
+            try:
+                entry['dependencies'] = get_dependency_stamps(get_module_dependencies(module))
+
+            except Exception:
+                # Inspection results cannot be validated without their dependencies
+                logger.debug("Unable to stamp dependencies of {}".format(entry['import_path']), exc_info=True)
+                stored = {}
+
+        if not stored:
+            entry['dependencies'] = []
+
+        entry['inspections'] = stored
+
+    def save_catalogue(self):
+        """Persist the catalogue of found hives, with the inspection results of their hives"""
+        if self._catalogue_path is None or self._catalogue is None:
+            return
+
+        for entry in self._catalogue.values():
+            self._store_inspections(entry)
+
+        data = {"version": CATALOGUE_VERSION, "modules": self._catalogue}
+        temporary_path = "{}.tmp".format(self._catalogue_path)
+
+        try:
+            os.makedirs(os.path.dirname(self._catalogue_path), exist_ok=True)
+
+            with open(temporary_path, "w") as f:
+                json.dump(data, f)
+
+            os.replace(temporary_path, self._catalogue_path)
+
+        except OSError:
+            logger.exception("Unable to write hive catalogue {}".format(self._catalogue_path))
+
+    @staticmethod
+    def _find_module_hives(module, import_path):
+        """Return list of [reference path, class key] pairs for each hive class in module
+
+        :param module: module object
+        :param import_path: import path of module
+        """
+        module_hives = []
+
+        for name, value in sorted(getmembers(module)):
+            if not isclass(value):
+                continue
+
+            if name.startswith('_'):
+                continue
+
+            if not ((issubclass(value, hive.HiveBuilder) and value is not hive.HiveBuilder) or
+                    (issubclass(value, hive.MetaHivePrimitive) and value is not hive.MetaHivePrimitive)):
+                continue
+
+            hive_reference_path = '{}.{}'.format(import_path, name)
+            module_hives.append([hive_reference_path, _get_class_key(value)])
+
+        return module_hives
+
+    def _recurse(self, search_path, candidates=None):
+        """Recursively find candidate hive modules from module path.
+
+        Write to list a ModuleCandidate for each module or package, in search order
+
+        E.g "dragonfly/std/buffer.py" -> ModuleCandidate(".../dragonfly/std/buffer.py", "dragonfly.std.buffer", ...)
 
         :param search_path: tuple of FinderPathEntry items (first element is root, name unused)
-        :param results: dictionary of modules to write to
-        :param _tracked_classes: set of found classes (to avoid revisiting)
+        :param candidates: list of candidates to write to
         """
         assert search_path, "Invalid start path"
         assert isinstance(search_path, tuple), "Search path must be immutable"
 
         # Initialise data
-        if results is None:
-            results = []
-
-        if _tracked_classes is None:
-            _tracked_classes = set()
+        if candidates is None:
+            candidates = []
 
         current_entry = search_path[-1]
         current_module_path = current_entry.file_path
@@ -66,98 +449,441 @@ class HiveFinder:
 
         names_from_root = tuple(p.name for p in following_root)
 
-        print("Searching {}".format(current_module_path))
-        all_file_names = os.listdir(current_module_path)
+        logger.debug("Searching {}".format(current_module_path))
+        all_file_names = self._filter_file_names(current_module_path, os.listdir(current_module_path))
+        all_file_names.sort()
+
+        # Find all members
+        for file_name in all_file_names:
+            candidate = self._create_candidate(current_module_path, file_name, names_from_root)
+            if candidate is None:
+                continue
+
+            candidates.append(candidate)
 
+            # Recurse to child directory
+            if candidate.is_directory:
+                new_path_entry = FinderPathElement(file_name, candidate.file_path)
+                new_search_path = search_path + (new_path_entry,)
+                self._recurse(new_search_path, candidates)
+
+        return candidates
+
+    @staticmethod
+    def _filter_file_names(directory_path, file_names):
+        """Return list of the file names in a directory which are not hidden from the GUI by its robots.txt file
+
+        :param directory_path: directory path
+        :param file_names: names of files in directory
+        """
         # Allow hiding of files from HIVE GUI
         try:
-            with open(os.path.join(current_module_path, GUI_CONF_FILENAME)) as robots:
+            with open(os.path.join(directory_path, GUI_CONF_FILENAME)) as robots:
                 lines = [l.strip() for l in robots]
 
-            all_file_names = [filename for pattern in lines for filename in filter(all_file_names, pattern)]
-            print("Restricted search to {}".format(all_file_names))
-
         except FileNotFoundError:
-            pass
+            return list(file_names)
 
-        all_file_names.sort()
+        file_names = [filename for pattern in lines for filename in filter(file_names, pattern)]
+        logger.debug("Restricted search to {}".format(file_names))
+        return file_names
 
-        # Find all members
-        for file_name in all_file_names:
-            if file_name.startswith("_"):
-                continue
+    @staticmethod
+    def _create_candidate(directory_path, file_name, names_from_root):
+        """Return ModuleCandidate for a file in a searched directory, or None if it cannot be a hive module
 
-            current_file_path = os.path.join(current_module_path, file_name)
-            name, extension = os.path.splitext(file_name)
+        :param directory_path: path of directory containing file
+        :param file_name: name of file
+        :param names_from_root: names of packages from root directory to directory
+        """
+        if file_name.startswith("_"):
+            return None
 
-            # Ignore hidden directories
-            is_directory = os.path.isdir(current_file_path)
-            if is_directory:
-                if name.startswith('.'):
-                    continue
+        current_file_path = os.path.join(directory_path, file_name)
+        name, extension = os.path.splitext(file_name)
 
-            elif extension not in {".py", ".hivemap"}:
-                continue
+        # Ignore hidden directories
+        is_directory = os.path.isdir(current_file_path)
+        if is_directory:
+            if name.startswith('.'):
+                return None
+
+        elif extension != ".py" and extension not in HIVEMAP_EXTENSIONS:
+            return None
+
+        names_to_module = names_from_root + (name,)
+        import_path = '.'.join(names_to_module)
+
+        # Although modules can be imported using __import__ or importlib.import_module with non-identifier names
+        # It is not safe and breaks the code generator
+        if not all(x.isidentifier() for x in names_to_module):
+            logger.warning("Invalid identifier for module: {}".format(import_path))
+            return None
+
+        mtime, size = _get_file_stamp(current_file_path, is_directory)
+        return ModuleCandidate(current_file_path, import_path, is_directory, mtime, size)
+
+    def _find_candidates_of_path(self, base_directory_path, file_path):
+        """Return list of ModuleCandidates for the module of a file, and the packages containing it, in search order.
+
+        Return None if the file is not (or is no longer) a hive module in the root directory
+
+        :param base_directory_path: root directory path
+        :param file_path: path of module file (or of a package __init__.py file)
+        """
+        names = os.path.relpath(file_path, base_directory_path).split(os.sep)
+
+        # Packages are the modules of their __init__.py files
+        if names[-1] == "__init__.py":
+            names.pop()
+
+        if not names or names[0] in (os.curdir, os.pardir):
+            return None
+
+        candidates = []
+        directory_path = base_directory_path
+        names_from_root = ()
+
+        for index, file_name in enumerate(names):
+            if not self._filter_file_names(directory_path, [file_name]):
+                return None
+
+            try:
+                candidate = self._create_candidate(directory_path, file_name, names_from_root)
+
+            except OSError:
+                return None
+
+            if candidate is None:
+                return None
+
+            # Parents must be packages
+            if index < len(names) - 1 and not candidate.is_directory:
+                return None
+
+            candidates.append(candidate)
+            directory_path = candidate.file_path
+            names_from_root += (file_name,)
 
-            names_to_module = names_from_root + (name,)
-            import_path = '.'.join(names_to_module)
+        return candidates
 
-            # Although modules can be imported using __import__ or importlib.import_module with non-identifier names
-            # It is not safe and breaks the code generator
-            if not all(x.isidentifier() for x in names_to_module):
-                print("Invalid identifier for module: {}".format(import_path))
+    def _is_catalogue_entry_valid(self, entry, candidate):
+        """Return True if catalogue entry was produced from the current version of the candidate module"""
+        return (entry['import_path'] == candidate.import_path and entry['mtime'] == candidate.mtime and
+                entry['size'] == candidate.size and entry.get('scan_mode', ScanModes.IMPORT) == self._scan_mode)
+
+    def _import_candidates(self, candidates):
+        """Import candidate modules in order, and find their hives.
+
+        Return dictionary of file path to hive list for modules that could be imported
+
+        :param candidates: list of ModuleCandidate instances
+        """
+        file_path_to_hives = {}
+        failed_packages = []
+
+        for candidate in candidates:
+            import_path = candidate.import_path
+
+            # Don't import modules of packages which failed to import
+            if any(import_path.startswith(p) for p in failed_packages):
                 continue
 
-            # Import the module
             try:
                 module = import_module(import_path)
 
-            except Exception as err:
-                print("Couldn't import {}".format(import_path))
-                import traceback
+            except Exception:
+                logger.exception("Couldn't import {}".format(import_path))
+
+                if candidate.is_directory:
+                    failed_packages.append(import_path + ".")
 
-                traceback.print_exc()
                 continue
 
-            # Search module members
-            for name, value in sorted(getmembers(module)):
-                if not isclass(value):
-                    continue
+            file_path_to_hives[candidate.file_path] = self._find_module_hives(module, import_path)
 
-                if name.startswith('_'):
-                    continue
+        return file_path_to_hives
 
-                if value in _tracked_classes:
-                    continue
+    def _scan_candidates(self, candidates):
+        """Statically analyse candidate modules to find their hives, in parallel worker processes.
+
+        Return dictionary of file path to hive list for modules that could be analysed
+
+        :param candidates: list of ModuleCandidate instances
+        """
+        if len(candidates) < self.min_parallel_scan_count:
+            results = self._scan_candidates_serial(candidates)
+
+        else:
+            max_workers = self._max_workers or os.cpu_count() or 1
+            chunk_size = max(1, len(candidates) // (4 * max_workers))
+
+            with ProcessPoolExecutor(max_workers) as executor:
+                results = list(executor.map(_try_scan_module_file, candidates, chunksize=chunk_size))
+
+        file_path_to_hives = {}
+        for candidate, (module_hives, error) in zip(candidates, results):
+            if error is not None:
+                logger.error("Couldn't scan {}: {}".format(candidate.import_path, error))
+                continue
+
+            file_path_to_hives[candidate.file_path] = module_hives
+
+        return file_path_to_hives
+
+    @staticmethod
+    def _scan_candidates_serial(candidates):
+        return [_try_scan_module_file(c) for c in candidates]
+
+    def _analyse_candidates(self, candidates, catalogue, previous_catalogue):
+        """Find hives from candidate modules, re-using catalogue entries (and their inspection results) for unchanged
+        modules.
+
+        :param candidates: list of ModuleCandidate instances
+        :param catalogue: dictionary of module file path to catalogue entry, to write found modules to
+        :param previous_catalogue: dictionary of module file path to catalogue entry, from a previous search
+        """
+        changed_candidates = []
+
+        for candidate in candidates:
+            entry = previous_catalogue.get(candidate.file_path)
+
+            if entry is None or not self._is_catalogue_entry_valid(entry, candidate):
+                changed_candidates.append(candidate)
+
+                # Inspection results of the previous version of the module must not be persisted
+                if entry is not None:
+                    for reference_path, _ in entry['hives']:
+                        pin_layout_cache.invalidate(reference_path)
+                        inspection_cache.invalidate(reference_path)
+
+            else:
+                catalogue[candidate.file_path] = entry
+                self._restore_inspections(entry)
+
+        if self._scan_mode == ScanModes.AST:
+            file_path_to_hives = self._scan_candidates(changed_candidates)
+
+        else:
+            file_path_to_hives = self._import_candidates(changed_candidates)
+
+        for candidate in changed_candidates:
+            try:
+                module_hives = file_path_to_hives[candidate.file_path]
+
+            except KeyError:
+                continue
 
-                if not ((issubclass(value, hive.HiveBuilder) and value is not hive.HiveBuilder) or
-                        (issubclass(value, hive.MetaHivePrimitive) and value is not hive.MetaHivePrimitive)):
+            catalogue[candidate.file_path] = dict(import_path=candidate.import_path, mtime=candidate.mtime,
+                                                  size=candidate.size, scan_mode=self._scan_mode, hives=module_hives)
+
+    @staticmethod
+    def _merge_hives(candidates, catalogue):
+        """Return list of hive reference paths of catalogued candidate modules in candidate order, ignoring hives
+        already found in other modules
+
+        :param candidates: list of ModuleCandidate instances
+        :param catalogue: dictionary of module file path to catalogue entry
+        """
+        results = []
+        tracked_classes = set()
+
+        for candidate in candidates:
+            try:
+                entry = catalogue[candidate.file_path]
+
+            except KeyError:
+                continue
+
+            for hive_reference_path, class_key in entry['hives']:
+                if class_key in tracked_classes:
                     continue
 
-                hive_reference_path = '{}.{}'.format(import_path, name)
                 results.append(hive_reference_path)
-                _tracked_classes.add(value)
-
-            # Recurse to child directory
-            if is_directory:
-                new_path_entry = FinderPathElement(file_name, current_file_path)
-                new_search_path = search_path + (new_path_entry,)
-                self._recurse(new_search_path, results, _tracked_classes)
+                tracked_classes.add(class_key)
 
         return results
 
+    def _search_root(self, base_directory_path):
+        """Find hives in a root directory, re-using catalogue entries for unchanged modules.
+
+        Return list of hive reference paths
+
+        :param base_directory_path: root directory path
+        """
+        # Only keep catalogue entries for this directory which are still found
+        directory_prefix = os.path.join(base_directory_path, "")
+        previous_catalogue = {p: e for p, e in self._catalogue.items() if p.startswith(directory_prefix)}
+        for file_path in previous_catalogue:
+            del self._catalogue[file_path]
+
+        search_path = self.create_initial_search_path(base_directory_path)
+        candidates = self._path_to_candidates[base_directory_path] = self._recurse(search_path)
+
+        self._analyse_candidates(candidates, self._catalogue, previous_catalogue)
+        return self._merge_hives(candidates, self._catalogue)
+
+    def _update_root(self, base_directory_path, changed_file_paths):
+        """Update hives of a root directory from changed files, only analysing the modules of these files.
+
+        Return list of hive reference paths, and set of file paths of modules which were (re)analysed
+
+        :param base_directory_path: root directory path
+        :param changed_file_paths: paths of created, modified or deleted files in the root directory
+        """
+        file_path_to_candidate = {c.file_path: c for c in self._path_to_candidates[base_directory_path]}
+        changed_candidates = OrderedDict()
+        removed_file_paths = set()
+
+        for file_path in changed_file_paths:
+            candidates = self._find_candidates_of_path(base_directory_path, file_path)
+
+            # Remove deleted modules, or packages
+            if candidates is None:
+                package_prefix = os.path.join(file_path, "")
+                removed_file_paths.update(p for p in file_path_to_candidate
+                                          if p == file_path or p.startswith(package_prefix))
+                continue
+
+            for candidate in candidates:
+                if file_path_to_candidate.get(candidate.file_path) != candidate:
+                    changed_candidates[candidate.file_path] = candidate
+
+        for file_path in removed_file_paths:
+            del file_path_to_candidate[file_path]
+
+        file_path_to_candidate.update(changed_candidates)
+
+        previous_catalogue = {p: self._catalogue.pop(p) for p in removed_file_paths.union(changed_candidates)
+                              if p in self._catalogue}
+
+        self._purge_stale_modules(changed_candidates.values(), previous_catalogue)
+        self._analyse_candidates(list(changed_candidates.values()), self._catalogue, previous_catalogue)
+
+        # Restore search order (depth first, in order of file name)
+        candidates = self._path_to_candidates[base_directory_path] = sorted(
+            file_path_to_candidate.values(),
+            key=lambda c: os.path.relpath(c.file_path, base_directory_path).split(os.sep))
+
+        hives = self._merge_hives(candidates, self._catalogue)
+        analysed_file_paths = {p for p in changed_candidates if self._catalogue.get(p) is not previous_catalogue.get(p)}
+
+        return hives, analysed_file_paths
+
+    def _purge_stale_modules(self, candidates, previous_catalogue):
+        """Remove modules which were changed or deleted since they were catalogued from sys.modules, so that they are
+        re-imported
+
+        :param candidates: list of ModuleCandidate instances
+        :param previous_catalogue: dictionary of module file path to catalogue entry, from a previous search
+        """
+        file_path_to_candidate = {c.file_path: c for c in candidates}
+
+        for file_path, entry in previous_catalogue.items():
+            candidate = file_path_to_candidate.get(file_path)
+
+            if candidate is not None and self._is_catalogue_entry_valid(entry, candidate):
+                continue
+
+            sys.modules.pop(entry['import_path'], None)
+
+        # Allow new files to be found by path finders.
+        # importlib.invalidate_caches would also reset the hivemap loaders of unchanged modules
+        for finder in sys.path_importer_cache.values():
+            if hasattr(finder, "invalidate_caches"):
+                finder.invalidate_caches()
+
+        hook = get_hook()
+        if hook is not None:
+            hook.invalidate_listings()
+
     def reload(self):
         path_to_hives = {}
         all_hives = []
 
+        if self._catalogue is None:
+            self._catalogue = self._load_catalogue()
+
         # Import stdlib modules
         for base_directory_path in self._root_paths | self.additional_paths:
-            path_to_hives[base_directory_path] = path_hives = []
-            search_path = self.create_initial_search_path(base_directory_path)
-            self._recurse(search_path, results=path_hives)
+            path_to_hives[base_directory_path] = path_hives = self._search_root(base_directory_path)
 
             # Update total hives too
             all_hives.extend(path_hives)
 
         self._path_to_hives = path_to_hives
         self._all_hives = all_hives
+
+        self.save_catalogue()
+
+    def update(self, changed_file_paths):
+        """Incrementally update found hives from changed files (e.g reported by a watcher).
+
+        Only the modules of the changed files (and packages containing them) are stamped, and only those which changed
+        since the last search are re-imported. Inspection results of changed hives are invalidated.
+        Changes to robots.txt files are only found by reload
+
+        Return HiveFinderUpdate of added, removed and changed hive reference paths.
+
+        :param changed_file_paths: iterable of paths of created, modified or deleted files
+        """
+        if self._path_to_hives is None:
+            raise RuntimeError("HiveFinder must be reloaded before it can be updated")
+
+        changed_file_paths = list(changed_file_paths)
+        root_paths = self._root_paths | self.additional_paths
+
+        added = []
+        removed = []
+        changed = []
+
+        for base_directory_path in root_paths:
+            directory_prefix = os.path.join(base_directory_path, "")
+
+            root_file_paths = [p for p in changed_file_paths if p.startswith(directory_prefix)]
+            if not root_file_paths:
+                continue
+
+            previous_hives = self._path_to_hives.get(base_directory_path, [])
+
+            # Roots added since the last reload must be searched
+            if base_directory_path not in self._path_to_candidates:
+                hives = self._search_root(base_directory_path)
+                analysed_file_paths = set()
+
+            else:
+                hives, analysed_file_paths = self._update_root(base_directory_path, root_file_paths)
+
+            self._path_to_hives[base_directory_path] = hives
+
+            previous_hive_set = set(previous_hives)
+            hive_set = set(hives)
+
+            added.extend(p for p in hives if p not in previous_hive_set)
+            removed.extend(p for p in previous_hives if p not in hive_set)
+
+            for file_path in analysed_file_paths:
+                changed.extend(p for p, _ in self._catalogue[file_path]['hives'] if p in previous_hive_set)
+
+        if not (added or removed or changed):
+            return HiveFinderUpdate(added, removed, changed)
+
+        self._all_hives = [p for r in root_paths for p in self._path_to_hives.get(r, ())]
+
+        # Pin layouts of modified hives may have changed
+        for reference_path in chain(removed, changed):
+            pin_layout_cache.invalidate(reference_path)
+            inspection_cache.invalidate(reference_path)
+
+        self.save_catalogue()
+
+        return HiveFinderUpdate(added, removed, changed)
+
+
+def _try_scan_module_file(candidate):
+    """Scan module file in worker process, returning (hives, error message) pair"""
+    try:
+        return scan_module_file(candidate), None
+
+    except Exception as err:
+        return None, "{}: {}".format(err.__class__.__name__, err)
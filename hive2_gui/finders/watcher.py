@@ -0,0 +1,274 @@
+import os
+from collections import namedtuple
+from logging import getLogger
+from queue import Queue, Empty
+from threading import Event, Lock, Thread
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+except ImportError:
+    FileSystemEventHandler = Observer = None
+
+from ..hivemap_io import HIVEMAP_EXTENSIONS
+
+
+logger = getLogger(__name__)
+
+FileChange = namedtuple("FileChange", "kind file_path")
+MODULE_EXTENSIONS = {".py"}.union(HIVEMAP_EXTENSIONS)
+
+
+class ChangeKinds:
+    CREATED, MODIFIED, DELETED = "created", "modified", "deleted"
+
+
+def _is_watched_file(file_path):
+    return os.path.splitext(file_path)[1] in MODULE_EXTENSIONS
+
+
+def _is_watched_directory(directory_name):
+    return not (directory_name.startswith('.') or directory_name == "__pycache__")
+
+
+class PollingWatcher:
+    """Watch directories for changes to hive modules, by periodically comparing file stamps.
+
+    Directory trees are walked in a daemon thread, so that polling does not block the caller (e.g. the GUI thread)
+    """
+
+    def __init__(self, *paths, interval=1.0):
+        """Polling watcher initialiser
+
+        :param paths: directory paths to watch
+        :param interval: seconds between comparisons in the watcher thread, or None to compare file stamps when
+        polled instead
+        """
+        self._path_to_snapshot = {}
+        self._lock = Lock()
+        self._queue = Queue()
+        self._closed = Event()
+
+        for path in paths:
+            self.add_path(path)
+
+        self._interval = interval
+        self._thread = None
+
+        if interval is not None:
+            self._thread = Thread(target=self._run, name="PollingWatcher", daemon=True)
+            self._thread.start()
+
+    @property
+    def paths(self):
+        with self._lock:
+            return set(self._path_to_snapshot)
+
+    def add_path(self, path):
+        """Watch directory for changes
+
+        :param path: directory path
+        """
+        snapshot = self._take_snapshot(path)
+
+        with self._lock:
+            self._path_to_snapshot[path] = snapshot
+
+    def remove_path(self, path):
+        """Stop watching directory for changes
+
+        :param path: directory path
+        """
+        with self._lock:
+            del self._path_to_snapshot[path]
+
+    def close(self):
+        self._closed.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        with self._lock:
+            self._path_to_snapshot.clear()
+
+    def _run(self):
+        while not self._closed.wait(self._interval):
+            for change in self._compare_snapshots():
+                self._queue.put(change)
+
+    @staticmethod
+    def _take_snapshot(root_path):
+        """Return dictionary of file path to (mtime, size) stamp for all watched files in a directory tree"""
+        snapshot = {}
+
+        for directory_path, directory_names, file_names in os.walk(root_path):
+            directory_names[:] = [n for n in directory_names if _is_watched_directory(n)]
+
+            for file_name in file_names:
+                file_path = os.path.join(directory_path, file_name)
+
+                if not _is_watched_file(file_path):
+                    continue
+
+                try:
+                    stat = os.stat(file_path)
+
+                except OSError:
+                    continue
+
+                snapshot[file_path] = stat.st_mtime_ns, stat.st_size
+
+        return snapshot
+
+    def _compare_snapshots(self):
+        """Take new snapshots of the watched directories, and return list of FileChange instances for changes since
+        the previous snapshots
+        """
+        changes = []
+
+        for path in self.paths:
+            snapshot = self._take_snapshot(path)
+
+            with self._lock:
+                # Path was removed whilst taking snapshot
+                if path not in self._path_to_snapshot:
+                    continue
+
+                previous_snapshot = self._path_to_snapshot[path]
+                self._path_to_snapshot[path] = snapshot
+
+            for file_path, stamp in snapshot.items():
+                previous_stamp = previous_snapshot.get(file_path)
+
+                if previous_stamp is None:
+                    changes.append(FileChange(ChangeKinds.CREATED, file_path))
+
+                elif previous_stamp != stamp:
+                    changes.append(FileChange(ChangeKinds.MODIFIED, file_path))
+
+            for file_path in previous_snapshot.keys() - snapshot.keys():
+                changes.append(FileChange(ChangeKinds.DELETED, file_path))
+
+        return changes
+
+    def poll(self):
+        """Return list of FileChange instances for changes since the last poll"""
+        if self._thread is None:
+            return self._compare_snapshots()
+
+        changes = []
+
+        while True:
+            try:
+                changes.append(self._queue.get_nowait())
+
+            except Empty:
+                break
+
+        return changes
+
+
+if FileSystemEventHandler is not None:
+    class _QueueEventHandler(FileSystemEventHandler):
+        """Forward watchdog events to a queue, from the observer thread"""
+
+        def __init__(self, queue):
+            self._queue = queue
+
+        def on_created(self, event):
+            if not event.is_directory:
+                self._queue.put(FileChange(ChangeKinds.CREATED, event.src_path))
+
+        def on_modified(self, event):
+            if not event.is_directory:
+                self._queue.put(FileChange(ChangeKinds.MODIFIED, event.src_path))
+
+        def on_deleted(self, event):
+            if not event.is_directory:
+                self._queue.put(FileChange(ChangeKinds.DELETED, event.src_path))
+
+        def on_moved(self, event):
+            if not event.is_directory:
+                self._queue.put(FileChange(ChangeKinds.DELETED, event.src_path))
+                self._queue.put(FileChange(ChangeKinds.CREATED, event.dest_path))
+
+
+class NotifyingWatcher:
+    """Watch directories for changes to hive modules, using the native filesystem notification API (e.g inotify).
+
+    Requires the watchdog package
+    """
+
+    def __init__(self, *paths):
+        if Observer is None:
+            raise RuntimeError("watchdog package is required for NotifyingWatcher")
+
+        self._queue = Queue()
+        self._handler = _QueueEventHandler(self._queue)
+        self._path_to_watch = {}
+
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._observer.start()
+
+        for path in paths:
+            self.add_path(path)
+
+    @property
+    def paths(self):
+        return set(self._path_to_watch)
+
+    def add_path(self, path):
+        """Watch directory for changes
+
+        :param path: directory path
+        """
+        self._path_to_watch[path] = self._observer.schedule(self._handler, path, recursive=True)
+
+    def remove_path(self, path):
+        """Stop watching directory for changes
+
+        :param path: directory path
+        """
+        watch = self._path_to_watch.pop(path)
+        self._observer.unschedule(watch)
+
+    def close(self):
+        self._observer.stop()
+        self._observer.join()
+        self._path_to_watch.clear()
+
+    def poll(self):
+        """Return list of FileChange instances for changes since the last poll"""
+        changes = []
+
+        while True:
+            try:
+                change = self._queue.get_nowait()
+
+            except Empty:
+                break
+
+            if _is_watched_file(change.file_path):
+                changes.append(change)
+
+        return changes
+
+
+def create_watcher(*paths):
+    """Create the best available watcher for the given directories.
+
+    Uses native filesystem notifications if watchdog is installed, otherwise falls back to polling
+
+    :param paths: directory paths to watch
+    """
+    if Observer is not None:
+        try:
+            return NotifyingWatcher(*paths)
+
+        except Exception:
+            logger.exception("Unable to create notifying watcher, falling back to polling")
+
+    return PollingWatcher(*paths)
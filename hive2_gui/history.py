@@ -1,7 +1,11 @@
+import sys
 from contextlib import contextmanager
 from logging import getLogger
 from enum import auto, IntEnum
+from itertools import chain, count
+from time import monotonic
 
+from .data_views import ListView
 from .observer import Observable
 
 
@@ -14,22 +18,99 @@ class CommandStates(IntEnum):
     un_execute = auto()
 
 
+# Unique identifiers of commands, as merged commands replace those which they merge
+_command_ids = count()
+
+_plain_types = (str, bytes, int, float, complex, bool, type(None))
+
+
+def get_retained_size(obj, seen=None, follow_objects=True):
+    """Return approximate size in bytes of an object and the data it owns.
+
+    Builtin containers are measured recursively. Other objects are measured with their attribute dictionary, but the
+    objects referenced by their attributes are only measured shallowly, as they are generally shared with the model
+
+    :param obj: object to measure
+    :param seen: set of ids of objects already measured
+    :param follow_objects: measure the attributes of non-builtin objects
+    """
+    if seen is None:
+        seen = set()
+
+    if id(obj) in seen:
+        return 0
+
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, _plain_types):
+        return size
+
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        return size + sum(get_retained_size(item, seen, follow_objects) for item in obj)
+
+    if isinstance(obj, dict):
+        return size + sum(get_retained_size(key, seen, follow_objects) + get_retained_size(value, seen, follow_objects)
+                          for key, value in obj.items())
+
+    if follow_objects:
+        attributes = getattr(obj, "__dict__", None)
+
+        if attributes is not None:
+            size += get_retained_size(attributes, seen, follow_objects=False)
+
+    return size
+
+
 class Command:
 
-    def __init__(self, execute, un_execute):
+    # Consecutive commands with the same (not None) merge key may be merged into one command
+    merge_key = None
+
+    def __init__(self, execute, un_execute, cost=None, is_executed=True):
         """Command object initialiser
         
         :param execute: execution callback
         :param un_execute: un-execution callback
+        :param cost: optional size in bytes retained by the command, otherwise estimated from the callbacks
+        :param is_executed: if the command has been executed, so that it may be un-executed
         """
         self._execute = execute
         self._un_execute = un_execute
 
-        self._allowed_state = CommandStates.un_execute
+        self._allowed_state = CommandStates.un_execute if is_executed else CommandStates.execute
+        self.id = next(_command_ids)
+
+        if cost is None:
+            cost = self._estimate_cost()
+
+        self.cost = cost
 
     def __repr__(self):
         return "<Command>\n\t{}\n\t{}".format(self._execute, self._un_execute)
 
+    def _estimate_cost(self):
+        """Estimate size in bytes retained by the callbacks.
+
+        Objects captured by closures are measured shallowly
+        """
+        seen = set()
+        size = sys.getsizeof(self) + get_retained_size(self.__dict__, seen, follow_objects=False)
+
+        for callback in (self._execute, self._un_execute):
+            for cell in getattr(callback, "__closure__", None) or ():
+                size += sys.getsizeof(cell) + get_retained_size(cell.cell_contents, seen, follow_objects=False)
+
+        return size
+
+    def merge(self, command):
+        """Return a new command equivalent to executing this command followed by another, or None if they cannot be
+        merged
+
+        :param command: executed command, recorded after this command
+        """
+        return None
+
     def execute(self):
         """Execute command in forward direction"""
         if self._allowed_state != CommandStates.execute:
@@ -47,6 +128,154 @@ class Command:
         self._un_execute()
 
 
+class DeltaCommand(Command):
+    """Command which stores the arguments of its callbacks, rather than closures over them.
+
+    Arguments should be compact data (e.g. names and values) rather than model objects, so that the command does not
+    keep deleted objects alive
+    """
+
+    def __init__(self, execute, execute_args, un_execute, un_execute_args, merge_key=None, data=None,
+                 is_executed=True):
+        """Delta command initialiser
+
+        :param execute: execution callback
+        :param execute_args: tuple of arguments of execution callback
+        :param un_execute: un-execution callback
+        :param un_execute_args: tuple of arguments of un-execution callback
+        :param merge_key: optional key of the target of the command. Consecutive commands with the same key are merged
+        by keeping the un-execution arguments of the first command, and the execution arguments of the last
+        :param data: optional (execute name, execute arguments, un-execute name, un-execute arguments) tuple which
+        describes the command, so that it may be serialised (see command_to_data)
+        :param is_executed: if the command has been executed, so that it may be un-executed
+        """
+        self._execute_args = execute_args
+        self._un_execute_args = un_execute_args
+        self.merge_key = merge_key
+        self.data = data
+
+        super().__init__(execute, un_execute, is_executed=is_executed)
+
+    def __repr__(self):
+        return "<DeltaCommand>\n\t{}{}\n\t{}{}".format(self._execute, self._execute_args, self._un_execute,
+                                                          self._un_execute_args)
+
+    def _estimate_cost(self):
+        # Serialisable data often shares the objects of the arguments, which are measured once
+        seen = set()
+        return sys.getsizeof(self) + sys.getsizeof(self.__dict__) + \
+            get_retained_size(self._execute_args, seen) + get_retained_size(self._un_execute_args, seen) + \
+            get_retained_size(self.data, seen)
+
+    def merge(self, command):
+        if self.merge_key is None or command.merge_key != self.merge_key:
+            return None
+
+        data = None
+        if self.data is not None and command.data is not None:
+            data = command.data[:2] + self.data[2:]
+
+        return DeltaCommand(command._execute, command._execute_args, self._un_execute, self._un_execute_args,
+                            self.merge_key, data)
+
+    def execute(self):
+        """Execute command in forward direction"""
+        if self._allowed_state != CommandStates.execute:
+            raise IllegalCommandError("Command has already been executed")
+
+        self._allowed_state = CommandStates.un_execute
+        self._execute(*self._execute_args)
+
+    def un_execute(self):
+        """Execute command in reverse direction"""
+        if self._allowed_state != CommandStates.un_execute:
+            raise IllegalCommandError("Command has already been un-executed")
+
+        self._allowed_state = CommandStates.execute
+        self._un_execute(*self._un_execute_args)
+
+
+class CompositeCommand(Command):
+    """Command which executes the commands of a CommandLog as one operation"""
+
+    def __init__(self, history, is_executed=True):
+        """Composite command initialiser
+
+        :param history: CommandLog of executed commands, or of un-executed commands if is_executed is False
+        :param is_executed: if the command has been executed, so that it may be un-executed
+        """
+        self._history = history
+
+        super().__init__(history.redo_all, history.undo_all, cost=history.cost, is_executed=is_executed)
+
+        # Composites of the same set of targets (e.g. moving the same nodes) may be merged
+        merge_keys = [c.merge_key for c in history.commands]
+        if None not in merge_keys and len(set(merge_keys)) == len(merge_keys):
+            self.merge_key = frozenset(merge_keys)
+
+    def merge(self, command):
+        if self.merge_key is None or command.merge_key != self.merge_key:
+            return None
+
+        key_to_command = {c.merge_key: c for c in command._history.commands}
+        history = CommandLog(self._history.logger, self._history.name, limit=None)
+
+        for first in self._history.commands:
+            history.add_command(first.merge(key_to_command[first.merge_key]))
+
+        return CompositeCommand(history)
+
+    @property
+    def name(self):
+        return self._history.name
+
+    @property
+    def commands(self):
+        return self._history.commands
+
+
+def command_to_data(command):
+    """Return nested tuples which describe a command, from the data of its delta commands.
+
+    Raise ValueError if the command cannot be described by data
+
+    :param command: DeltaCommand or CompositeCommand instance
+    """
+    if isinstance(command, CompositeCommand):
+        return "composite", command.name, [command_to_data(c) for c in command.commands]
+
+    if isinstance(command, DeltaCommand) and command.data is not None:
+        return "delta", command.data, command.merge_key
+
+    raise ValueError("Command cannot be described by data: {!r}".format(command))
+
+
+def command_from_data(data, get_callback, logger, is_executed=True):
+    """Return a command described by data from command_to_data
+
+    :param data: command data
+    :param get_callback: callable which returns a callback from its name
+    :param logger: logger of composite commands
+    :param is_executed: if the command has been executed, so that it may be un-executed
+    """
+    kind = data[0]
+
+    if kind == "delta":
+        _, delta_data, merge_key = data
+        execute_name, execute_args, un_execute_name, un_execute_args = delta_data
+        return DeltaCommand(get_callback(execute_name), execute_args, get_callback(un_execute_name), un_execute_args,
+                            merge_key, delta_data, is_executed)
+
+    if kind == "composite":
+        _, name, children = data
+        history = CommandLog(logger, name, limit=None)
+        history.reset([command_from_data(c, get_callback, logger, is_executed) for c in children],
+                      None if is_executed else -1)
+        return CompositeCommand(history, is_executed)
+
+    raise ValueError("Invalid command data kind '{}'".format(kind))
+
+
 class RecursionGuard:
     """Simple context manager to keep track of depth from initial caller"""
 
@@ -68,33 +297,135 @@ class CommandLogManager:
 
     on_updated = Observable()
 
-    def __init__(self, name='<root>', logger=None):
+    # Invoked when a command is added to the root log (with the command and whether it was merged with the current
+    # command), when the root log is undone or redone, and when it jumps to another command (see jump_to)
+    on_command_added = Observable()
+    on_undone = Observable()
+    on_redone = Observable()
+    on_jumped = Observable()
+
+    # Invoked when the outermost transaction (composite command, undo or redo) starts and finishes
+    on_transaction_started = Observable()
+    on_transaction_finished = Observable()
+
+    # Seconds within which consecutive commands with the same merge key are merged
+    merge_interval = 1.0
+
+    def __init__(self, name='<root>', logger=None, limit=200, byte_limit=None):
+        """Command log manager initialiser
+
+        :param name: name of root log
+        :param logger: optional logger
+        :param limit: maximum number of commands in the root log, or None for no limit
+        :param byte_limit: optional maximum size in bytes retained by the root log, including composite commands
+        """
         if logger is None:
             logger = getLogger("{}::{}".format(name, id(self)))
 
         self._logger = logger
-        self._current_history = CommandLog(self._logger, name)
+        self._current_history = self._root_history = CommandLog(self._logger, name, limit=limit,
+                                                                byte_limit=byte_limit)
         # Guards to stop updates being triggered during composite operations,
         # or commands being recorded during undo/redo operations
         self._update_guard = RecursionGuard()
         self._push_guard = RecursionGuard()
+        # Guard to merge commands regardless of time, during a gesture
+        self._merge_guard = RecursionGuard()
+        self._transaction_guard = RecursionGuard()
+
+        # Optional callable which returns data describing a delta command from the arguments of record_delta (see
+        # DeltaCommand), or None. It is called when the command is recorded, as its arguments may change afterwards
+        self.delta_encoder = None
 
     @property
     def command_id(self):
         return self._current_history.command_id
 
+    @property
+    def cost(self):
+        """Size in bytes retained by the current log"""
+        return self._current_history.cost
+
+    @property
+    def commands(self):
+        """Commands of the root log"""
+        return self._root_history.commands
+
+    @property
+    def index(self):
+        """Index of the current command of the root log"""
+        return self._root_history.index
+
+    @property
+    def in_transaction(self):
+        return bool(self._transaction_guard.depth)
+
+    @property
+    def is_recording(self):
+        """True if recorded commands are added to history, i.e. outside of undo, redo and unrecorded contexts"""
+        return not self._push_guard.depth
+
+    @contextmanager
+    def transaction(self):
+        """Group the changes made in this context, so that observers may defer their updates until the outermost
+        transaction finishes
+        """
+        is_outermost = not self._transaction_guard.depth
+
+        if is_outermost:
+            self.on_transaction_started()
+
+        try:
+            with self._transaction_guard:
+                yield self
+
+        finally:
+            if is_outermost:
+                self.on_transaction_finished()
+
     @contextmanager
     def command_context(self, name):
         composite_name = "{}.{}".format(self._current_history.name, name)
-        history = CommandLog(self._logger, name=composite_name)
+        # Composite commands must keep all of their commands, and are limited as one command by the parent log
+        history = CommandLog(self._logger, name=composite_name, limit=None)
 
-        self._current_history, old_history = history, self._current_history
-        yield self
-        self._current_history = old_history
+        with self.transaction():
+            self._current_history, old_history = history, self._current_history
 
-        # If anything useful was performed, record history object
-        if history.has_commands:
-            self.record_command(history.redo_all, history.undo_all)
+            try:
+                yield self
+
+            finally:
+                self._current_history = old_history
+
+                # If anything useful was performed, record history object (changes made before an error remain applied,
+                # so they must be undoable)
+                if history.has_commands:
+                    self._record(CompositeCommand(history))
+
+    @contextmanager
+    def unrecorded_context(self):
+        """Apply changes in this context without recording them"""
+        with self.transaction(), self._push_guard:
+            yield self
+
+    @contextmanager
+    def merge_context(self):
+        """Merge consecutive commands with the same merge key (e.g. moving the same node) which are recorded in this
+        context, regardless of the time between them. Commands are not merged with those outside of the context
+        """
+        if not self._merge_guard.depth:
+            self._current_history.reset_merge()
+
+        with self._merge_guard:
+            yield self
+
+        if not self._merge_guard.depth:
+            self._current_history.reset_merge()
+
+    def reset_merge(self):
+        """Prevent the next recorded command from being merged with the current command"""
+        self._current_history.reset_merge()
 
     def record_command(self, execute, un_execute):
         """Add reversable operation to history
@@ -103,19 +434,93 @@ class CommandLogManager:
         :param un_execute: callback to invoke when command is reversed
         """
         if not self._push_guard.depth:
-            self._current_history.record_command(execute, un_execute)
+            self._record(Command(execute, un_execute))
+
+    def record_delta(self, execute, execute_args, un_execute, un_execute_args, merge_key=None):
+        """Add reversable operation to history, as callbacks and their arguments (see DeltaCommand)
+
+        :param execute: callback to invoke when command is applied
+        :param execute_args: tuple of arguments of execute
+        :param un_execute: callback to invoke when command is reversed
+        :param un_execute_args: tuple of arguments of un_execute
+        :param merge_key: optional key of the target of the command, to merge consecutive commands
+        """
+        if self._push_guard.depth:
+            return
+
+        data = None
+        if self.delta_encoder is not None:
+            data = self.delta_encoder(execute, execute_args, un_execute, un_execute_args)
+
+        self._record(DeltaCommand(execute, execute_args, un_execute, un_execute_args, merge_key, data))
+
+    def _record(self, command):
+        # Commands within a composite command are always merged
+        if self._merge_guard.depth or self._current_history is not self._root_history:
+            merge_interval = float("inf")
+
+        else:
+            merge_interval = self.merge_interval
+
+        is_merged = self._current_history.add_command(command, merge_interval)
+
+        # Composite commands are reported once they are recorded
+        if self._current_history is self._root_history:
+            self.on_command_added(command, is_merged)
             self._on_updated()
 
+    def apply_command(self, command, merge=False):
+        """Execute an un-executed command and add it to the root log, e.g. to replay a command from its data
+
+        :param command: un-executed command
+        :param merge: merge the command with the current command, if possible
+        """
+        with self.transaction(), self._push_guard:
+            command.execute()
+
+        is_merged = self._root_history.add_command(command, float("inf") if merge else None)
+        self.on_command_added(command, is_merged)
+        self._on_updated()
+
+    def restore(self, commands, index=None):
+        """Replace the commands of the root log, without executing them
+
+        :param commands: commands, which are executed up to and including the current command
+        :param index: index of the current command, or None for the last command
+        """
+        self._root_history.reset(commands, index)
+        self._on_updated()
+
     def undo(self):
-        with self._push_guard:
+        with self.transaction(), self._push_guard:
             self._current_history.undo()
 
+        if self._current_history is self._root_history:
+            self.on_undone()
+
         self._on_updated()
 
     def redo(self):
-        with self._push_guard:
+        with self.transaction(), self._push_guard:
             self._current_history.redo()
 
+        if self._current_history is self._root_history:
+            self.on_redone()
+
+        self._on_updated()
+
+    def jump_to(self, command_id):
+        """Undo and redo commands of the current log to reach the state identified by a command id (see command_id),
+        which may be in another branch
+
+        :param command_id: id of command
+        """
+        with self.transaction(), self._push_guard:
+            self._current_history.jump_to(command_id)
+
+        if self._current_history is self._root_history:
+            self.on_jumped()
+
         self._on_updated()
 
     def _on_updated(self):
@@ -131,12 +536,34 @@ class CommandLogError(Exception):
 
 
 class CommandLog:
-    """Linear log of reversible operations"""
+    """Tree of reversible operations.
+
+    Recording a command after undoing others starts a new branch, rather than discarding the undone commands. Undo and
+    redo follow the current branch, and jump_to moves between branches
+    """
 
-    def __init__(self, logger, name="<main>", limit=200):
+    def __init__(self, logger, name="<main>", limit=200, byte_limit=None):
+        """Command log initialiser
+
+        :param logger: logger
+        :param name: name of log
+        :param limit: maximum number of commands (in all branches), or None for no limit
+        :param byte_limit: optional maximum size in bytes retained by the commands (in all branches)
+        """
+        # Commands of the current branch, from the first command
         self._commands = []
         self._index = -1
+
+        # Tree of all commands, as id to command, id to parent id (None for first commands), and parent id (or None) to
+        # ids of children, in the order they were added
+        self._id_to_command = {}
+        self._parent_ids = {}
+        self._child_ids = {None: []}
+
         self._limit = limit
+        self._byte_limit = byte_limit
+        self._cost = 0
+        self._last_added_time = None
 
         self._name = name
         self._logger = logger
@@ -149,6 +576,25 @@ class CommandLog:
     def index(self):
         return self._index
 
+    @property
+    def logger(self):
+        return self._logger
+
+    @property
+    def commands(self):
+        """Commands of the current branch"""
+        return ListView(self._commands)
+
+    @property
+    def command_count(self):
+        """Number of commands in all branches"""
+        return len(self._id_to_command)
+
+    @property
+    def cost(self):
+        """Size in bytes retained by the commands"""
+        return self._cost
+
     @property
     def has_commands(self):
         return bool(self._commands)
@@ -167,7 +613,14 @@ class CommandLog:
             return id(self)
 
         command = self._commands[self._index]
-        return id(command)
+        return command.id
+
+    def has_command_id(self, command_id):
+        """Return True if the state identified by a command id (see command_id) can be reached with jump_to
+
+        :param command_id: id of command, or id of log for the state before the first command
+        """
+        return command_id == id(self) or command_id in self._id_to_command
 
     def undo_all(self):
         while self.can_undo:
@@ -183,6 +636,7 @@ class CommandLog:
 
         command = self._commands[self._index]
         self._index -= 1
+        self.reset_merge()
 
         command.un_execute()
 
@@ -191,34 +645,212 @@ class CommandLog:
             raise CommandLogError("Cannot redo any more operations")
 
         self._index += 1
+        self.reset_merge()
         command = self._commands[self._index]
 
         command.execute()
 
+    def jump_to(self, command_id):
+        """Undo and redo commands to reach the state identified by a command id (see command_id), with the fewest
+        steps.
+
+        The current branch becomes the branch of the command, continuing with its most recent commands
+
+        :param command_id: id of command, or id of log for the state before the first command
+        """
+        if not self.has_command_id(command_id):
+            raise CommandLogError("Cannot find command {}".format(command_id))
+
+        # Path from first command to target
+        path = []
+        parent_id = None if command_id == id(self) else command_id
+
+        while parent_id is not None:
+            path.append(parent_id)
+            parent_id = self._parent_ids[parent_id]
+
+        path.reverse()
+
+        # Undo to the last state shared by both branches
+        shared_count = 0
+        for command, target_id in zip(self._commands[:self._index + 1], path):
+            if command.id != target_id:
+                break
+
+            shared_count += 1
+
+        while self._index >= shared_count:
+            self.undo()
+
+        # Follow the most recent commands after the target
+        target_index = len(path) - 1
+        child_ids = self._child_ids[path[-1] if path else None]
+
+        while child_ids:
+            path.append(child_ids[-1])
+            child_ids = self._child_ids[child_ids[-1]]
+
+        self._commands = [self._id_to_command[i] for i in path]
+
+        while self._index < target_index:
+            self.redo()
+
+    def reset_merge(self):
+        """Prevent the next added command from being merged with the current command"""
+        self._last_added_time = None
+
     def record_command(self, execute, unexecute):
         command = Command(execute, unexecute)
-        self._add_command(command)
+        self.add_command(command)
+
+    def _add_to_tree(self, command, parent_id):
+        self._id_to_command[command.id] = command
+        self._parent_ids[command.id] = parent_id
+        self._child_ids[parent_id].append(command.id)
+        self._child_ids[command.id] = []
+        self._cost += command.cost
+
+    def _remove_from_tree(self, command_id):
+        """Remove command and the commands after it from the tree, but not from the current branch
+
+        :param command_id: id of command
+        """
+        parent_id = self._parent_ids[command_id]
+        self._child_ids[parent_id].remove(command_id)
+
+        pending_ids = [command_id]
+        while pending_ids:
+            command_id = pending_ids.pop()
+            pending_ids.extend(self._child_ids.pop(command_id))
+
+            del self._parent_ids[command_id]
+            self._cost -= self._id_to_command.pop(command_id).cost
+
+    def reset(self, commands, index=None):
+        """Replace the commands of the log with one branch
+
+        :param commands: commands, which are executed up to and including the current command
+        :param index: index of the current command, or None for the last command
+        """
+        if index is None:
+            index = len(commands) - 1
+
+        self._commands = list(commands)
+        self._index = index
+
+        self._id_to_command.clear()
+        self._parent_ids.clear()
+        self._child_ids.clear()
+        self._child_ids[None] = []
+        self._cost = 0
+
+        parent_id = None
+        for command in self._commands:
+            self._add_to_tree(command, parent_id)
+            parent_id = command.id
+
+        self.reset_merge()
+        self._evict_commands()
 
-    def _add_command(self, command):
-        # If not at end of list, then later commands will be lost, as history must be contiguous in time
-        if self._index < len(self._commands) - 1:
+    def add_command(self, command, merge_interval=None):
+        """Add executed command to the log after the current command. If there are commands after the current command,
+        the command starts a new branch.
+
+        Return True if the command was merged with the current command
+
+        :param command: Command instance
+        :param merge_interval: optional time in seconds since the last added command within which the command may be
+        merged with the current command
+        """
+        last_added_time, self._last_added_time = self._last_added_time, monotonic()
+
+        # Only a command without any commands after it (in any branch) can be replaced
+        if merge_interval is not None and last_added_time is not None and not self.can_redo and self.can_undo and \
+                not self._child_ids[self._commands[-1].id] and \
+                self._last_added_time - last_added_time <= merge_interval:
+            last_command = self._commands[-1]
+            merged_command = last_command.merge(command)
+
+            if merged_command is not None:
+                parent_id = self._parent_ids[last_command.id]
+                sibling_ids = self._child_ids[parent_id]
+                sibling_index = sibling_ids.index(last_command.id)
+
+                self._remove_from_tree(last_command.id)
+                self._add_to_tree(merged_command, parent_id)
+
+                # Keep order of branches
+                sibling_ids.insert(sibling_index, sibling_ids.pop())
+                self._commands[-1] = merged_command
+
+                self._evict_commands()
+                return True
+
+        # If not at end of branch, the later commands are kept in their own branch
+        if self.can_redo:
+            self._logger.debug("Commands after {!r} are kept in another branch".format(self._commands[self._index]))
             del self._commands[self._index + 1:]
-            latest_command = self._commands[-1]
 
-            self._logger.info("Commands after {} have been lost due to an add command:\n{!r}"
-                              .format(latest_command, command))
+        parent_id = self._commands[-1].id if self._commands else None
+        self._add_to_tree(command, parent_id)
 
         self._commands.append(command)
         self._index += 1
 
-        # Limit length to a maximum number of operations
-        if len(self._commands) > self._limit:
-            # Assume everything atomic, hence only one command to displace
-            # Index must be at end, if command list has grown
-            self._index -= 1
-            del self._commands[0]
+        self._evict_commands()
+        return False
 
-    def __repr__(self):
-        return "<CommandLog ({})>".format(self.name)
+    def _evict_commands(self):
+        """Remove the oldest commands until the log is within its limits.
 
+        Branches other than the current branch are removed first, from the oldest branch. Then the first commands of
+        the current branch are removed. The latest command is always kept
+        """
+        def is_over_limit(count, cost):
+            return (self._limit is not None and count > self._limit) or \
+                   (self._byte_limit is not None and cost > self._byte_limit)
+
+        if not is_over_limit(len(self._id_to_command), self._cost):
+            return
 
+        # Other branches, as the first command of each branch
+        branch_ids = {c.id for c in self._commands}
+        other_branch_ids = sorted(child_id for parent_id in chain((None,), branch_ids)
+                                  for child_id in self._child_ids[parent_id] if child_id not in branch_ids)
+
+        for command_id in other_branch_ids:
+            if not is_over_limit(len(self._id_to_command), self._cost):
+                return
+
+            self._remove_from_tree(command_id)
+
+        evict_count = 0
+        evicted_cost = 0
+
+        # Commands which can be redone are kept
+        while evict_count < min(len(self._commands) - 1, self._index + 1) and \
+                is_over_limit(len(self._commands) - evict_count, self._cost - evicted_cost):
+            evicted_cost += self._commands[evict_count].cost
+            evict_count += 1
+
+        if not evict_count:
+            return
+
+        for command in self._commands[:evict_count]:
+            del self._id_to_command[command.id]
+            del self._parent_ids[command.id]
+            del self._child_ids[command.id]
+
+        del self._commands[:evict_count]
+        self._index -= evict_count
+        self._cost -= evicted_cost
+
+        # First remaining command follows the initial state
+        first_id = self._commands[0].id
+        self._parent_ids[first_id] = None
+        self._child_ids[None] = [first_id]
+
+        self._logger.debug("Evicted {} commands ({} bytes) from {}".format(evict_count, evicted_cost, self.name))
+
+    def __repr__(self):
+        return "<CommandLog ({})>".format(self.name)
@@ -0,0 +1,808 @@
+"""Reading and writing of hivemap files.
+
+Hivemaps are stored either in the Spyder text format (.hivemap), or in a compact binary format (.hivemapb).
+
+Binary format (little endian):
+    header: magic (4s), version (H), flags (H), docstring string index (I), nodes section offset (I),
+            connections section offset (I), string table offset (I)
+    nodes section: node count, then for each node;
+        identifier, family (B), reference path, position (dd), parameter group count, then for each group;
+            identifier, parameter count, then for each parameter; identifier, data type, encoded value
+        folded pin count, folded pin names
+    connections section: connection count, then for each connection;
+        from node, output name, to node, input name, is trigger (B)
+    string table: string count, then for each string; byte length, UTF-8 bytes
+
+Counts, lengths and string indices are unsigned LEB128 varints (except in the header).
+Parameter values are stored as typed values if they are simple literals which round-trip through repr, otherwise as
+their repr string.
+
+Other data (e.g. the undo journal) may be serialised with the same value encoding by dump_literal, which also supports
+bytes and namedtuples of known record types, but never arbitrary objects.
+
+HivemapRecordReader reads node and connection records incrementally. Binary hivemaps are memory mapped, and only the
+sections which are iterated are decoded. Text hivemaps are parsed in full before iteration.
+"""
+import ast
+import os
+from collections import namedtuple
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from weakref import WeakSet
+
+from .models import model
+
+
+TEXT_HIVEMAP_EXTENSION = ".hivemap"
+BINARY_HIVEMAP_EXTENSION = ".hivemapb"
+HIVEMAP_EXTENSIONS = (TEXT_HIVEMAP_EXTENSION, BINARY_HIVEMAP_EXTENSION)
+
+# Hivemaps with at least this many nodes are saved in the binary format by default, as only it can be read lazily
+LARGE_HIVEMAP_NODE_COUNT = 500
+
+BINARY_MAGIC = b"HVMB"
+BINARY_VERSION = 1
+
+_header = Struct("<4sHHIIII")
+_position = Struct("<dd")
+_double = Struct("<d")
+
+_families = ("BEE", "HIVE")
+
+# Lightweight records, with the same attributes as the corresponding Spyder model types
+Position = namedtuple("Position", "x y")
+ParameterRecord = namedtuple("ParameterRecord", "identifier data_type value")
+ParameterGroupRecord = namedtuple("ParameterGroupRecord", "identifier params")
+NodeRecord = namedtuple("NodeRecord", "identifier family reference_path position parameter_groups folded_pins")
+ConnectionRecord = namedtuple("ConnectionRecord", "from_node output_name to_node input_name is_trigger")
+HivemapRecords = namedtuple("HivemapRecords", "docstring nodes connections")
+
+
+class ValueTags:
+    NONE, TRUE, FALSE, INT, NEGATIVE_INT, FLOAT, STR, TUPLE, LIST, DICT, REPR, BYTES, RECORD = range(13)
+
+
+class BinaryHivemapError(ValueError):
+    pass
+
+
+class _Writer:
+
+    def __init__(self, record_types=None):
+        """Binary writer initialiser
+
+        :param record_types: optional namedtuple classes which may be written, with bytes, by write_literal. Hivemaps
+        do not permit either
+        """
+        self.buffer = bytearray()
+        self._strings = []
+        self._string_to_index = {}
+        self._record_types = None if record_types is None else frozenset(record_types)
+
+    def write_varint(self, value):
+        buffer = self.buffer
+
+        while value >= 0x80:
+            buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+
+        buffer.append(value)
+
+    def intern(self, value):
+        """Return index of string in interned string table"""
+        try:
+            return self._string_to_index[value]
+
+        except KeyError:
+            index = self._string_to_index[value] = len(self._strings)
+            self._strings.append(value)
+            return index
+
+    def write_string(self, value):
+        self.write_varint(self.intern(value))
+
+    def write_string_table(self):
+        self.write_varint(len(self._strings))
+
+        for string in self._strings:
+            data = string.encode("utf-8")
+            self.write_varint(len(data))
+            self.buffer += data
+
+    def write_literal(self, value):
+        """Write typed value, return False if it cannot be encoded"""
+        if value is None:
+            self.buffer.append(ValueTags.NONE)
+
+        elif value is True:
+            self.buffer.append(ValueTags.TRUE)
+
+        elif value is False:
+            self.buffer.append(ValueTags.FALSE)
+
+        elif type(value) is int:
+            if value >= 0:
+                self.buffer.append(ValueTags.INT)
+                self.write_varint(value)
+
+            else:
+                self.buffer.append(ValueTags.NEGATIVE_INT)
+                self.write_varint(-value)
+
+        elif type(value) is float:
+            self.buffer.append(ValueTags.FLOAT)
+            self.buffer += _double.pack(value)
+
+        elif type(value) is str:
+            self.buffer.append(ValueTags.STR)
+            self.write_string(value)
+
+        elif type(value) in (tuple, list):
+            self.buffer.append(ValueTags.TUPLE if type(value) is tuple else ValueTags.LIST)
+            self.write_varint(len(value))
+
+            for item in value:
+                if not self.write_literal(item):
+                    return False
+
+        elif type(value) is dict:
+            self.buffer.append(ValueTags.DICT)
+            self.write_varint(len(value))
+
+            for key, item in value.items():
+                if not (self.write_literal(key) and self.write_literal(item)):
+                    return False
+
+        elif self._record_types is None:
+            return False
+
+        elif type(value) is bytes:
+            self.buffer.append(ValueTags.BYTES)
+            self.write_varint(len(value))
+            self.buffer += value
+
+        elif type(value) in self._record_types:
+            self.buffer.append(ValueTags.RECORD)
+            self.write_string(type(value).__name__)
+            self.write_varint(len(value))
+
+            for item in value:
+                if not self.write_literal(item):
+                    return False
+
+        else:
+            return False
+
+        return True
+
+    def write_parameter_value(self, data_type, value):
+        """Write parameter value (repr string) as a typed value if it round-trips exactly, otherwise as a string
+
+        :param data_type: name of parameter type
+        :param value: parameter value string
+        """
+        # Strings are stored verbatim (see code_generator.decode_parameter_value)
+        if data_type != "str":
+            try:
+                literal = ast.literal_eval(value)
+
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                pass
+
+            else:
+                if repr(literal) == value:
+                    start = len(self.buffer)
+
+                    if self.write_literal(literal):
+                        return
+
+                    del self.buffer[start:]
+
+        self.buffer.append(ValueTags.REPR)
+        self.write_string(value)
+
+
+class _Reader:
+
+    def __init__(self, data, strings=None, record_types=None):
+        """Binary reader initialiser
+
+        :param data: bytes-like object
+        :param strings: optional string table
+        :param record_types: optional namedtuple classes which may be read, with bytes, by read_literal
+        """
+        self.data = memoryview(data)
+        self.offset = 0
+        self.strings = strings if strings is not None else []
+        self._name_to_record_type = None if record_types is None else {t.__name__: t for t in record_types}
+
+    def read_varint(self):
+        data = self.data
+        result = shift = 0
+
+        try:
+            while True:
+                byte = data[self.offset]
+                self.offset += 1
+
+                result |= (byte & 0x7F) << shift
+                if not byte & 0x80:
+                    return result
+
+                shift += 7
+
+        except IndexError:
+            raise BinaryHivemapError("Unexpected end of data")
+
+    def read_byte(self):
+        try:
+            byte = self.data[self.offset]
+
+        except IndexError:
+            raise BinaryHivemapError("Unexpected end of data")
+
+        self.offset += 1
+        return byte
+
+    def read_struct(self, struct):
+        end = self.offset + struct.size
+        if end > len(self.data):
+            raise BinaryHivemapError("Unexpected end of data")
+
+        values = struct.unpack_from(self.data, self.offset)
+        self.offset = end
+        return values
+
+    def read_string(self):
+        try:
+            return self.strings[self.read_varint()]
+
+        except IndexError:
+            raise BinaryHivemapError("Invalid string index")
+
+    def read_string_table(self):
+        data = self.data
+        strings = []
+
+        for _ in range(self.read_varint()):
+            length = self.read_varint()
+            end = self.offset + length
+
+            if end > len(data):
+                raise BinaryHivemapError("Unexpected end of data")
+
+            strings.append(str(data[self.offset:end], "utf-8"))
+            self.offset = end
+
+        self.strings = strings
+
+    def read_literal(self):
+        tag = self.read_byte()
+
+        if tag == ValueTags.NONE:
+            return None
+
+        if tag == ValueTags.TRUE:
+            return True
+
+        if tag == ValueTags.FALSE:
+            return False
+
+        if tag == ValueTags.INT:
+            return self.read_varint()
+
+        if tag == ValueTags.NEGATIVE_INT:
+            return -self.read_varint()
+
+        if tag == ValueTags.FLOAT:
+            return self.read_struct(_double)[0]
+
+        if tag == ValueTags.STR:
+            return self.read_string()
+
+        if tag == ValueTags.TUPLE:
+            return tuple([self.read_literal() for _ in range(self.read_varint())])
+
+        if tag == ValueTags.LIST:
+            return [self.read_literal() for _ in range(self.read_varint())]
+
+        if tag == ValueTags.DICT:
+            result = {}
+            for _ in range(self.read_varint()):
+                key = self.read_literal()
+                result[key] = self.read_literal()
+
+            return result
+
+        if self._name_to_record_type is not None:
+            if tag == ValueTags.BYTES:
+                length = self.read_varint()
+                end = self.offset + length
+
+                if end > len(self.data):
+                    raise BinaryHivemapError("Unexpected end of data")
+
+                value = bytes(self.data[self.offset:end])
+                self.offset = end
+                return value
+
+            if tag == ValueTags.RECORD:
+                type_name = self.read_string()
+
+                try:
+                    record_type = self._name_to_record_type[type_name]
+
+                except KeyError:
+                    raise BinaryHivemapError("Unknown record type: {}".format(type_name))
+
+                fields = [self.read_literal() for _ in range(self.read_varint())]
+
+                try:
+                    return record_type(*fields)
+
+                except TypeError:
+                    raise BinaryHivemapError("Invalid fields of record type: {}".format(type_name))
+
+        raise BinaryHivemapError("Invalid value tag: {}".format(tag))
+
+    def skip_literal(self):
+        tag = self.read_byte()
+
+        if tag in (ValueTags.INT, ValueTags.NEGATIVE_INT, ValueTags.STR, ValueTags.REPR):
+            self.read_varint()
+
+        elif tag == ValueTags.FLOAT:
+            self.offset += _double.size
+
+        elif tag in (ValueTags.TUPLE, ValueTags.LIST):
+            for _ in range(self.read_varint()):
+                self.skip_literal()
+
+        elif tag == ValueTags.DICT:
+            for _ in range(self.read_varint() * 2):
+                self.skip_literal()
+
+        elif tag == ValueTags.BYTES:
+            self.offset += self.read_varint()
+
+        elif tag == ValueTags.RECORD:
+            self.read_varint()
+
+            for _ in range(self.read_varint()):
+                self.skip_literal()
+
+        elif tag not in (ValueTags.NONE, ValueTags.TRUE, ValueTags.FALSE):
+            raise BinaryHivemapError("Invalid value tag: {}".format(tag))
+
+    def read_parameter_value(self):
+        """Read parameter value as repr string"""
+        if self.offset < len(self.data) and self.data[self.offset] == ValueTags.REPR:
+            self.offset += 1
+            return self.read_string()
+
+        return repr(self.read_literal())
+
+
+def dump_binary(hivemap):
+    """Serialise Hivemap to binary format
+
+    :param hivemap: Hivemap instance
+    """
+    writer = _Writer()
+    writer.buffer += bytes(_header.size)
+
+    # Nodes
+    nodes_offset = len(writer.buffer)
+    writer.write_varint(len(hivemap.nodes))
+
+    for node in hivemap.nodes:
+        writer.write_string(node.identifier)
+        writer.buffer.append(_families.index(node.family))
+        writer.write_string(node.reference_path)
+        writer.buffer += _position.pack(node.position.x, node.position.y)
+
+        writer.write_varint(len(node.parameter_groups))
+        for group in node.parameter_groups:
+            writer.write_string(group.identifier)
+            writer.write_varint(len(group.params))
+
+            for parameter in group.params:
+                writer.write_string(parameter.identifier)
+                writer.write_string(parameter.data_type)
+                writer.write_parameter_value(parameter.data_type, parameter.value)
+
+        writer.write_varint(len(node.folded_pins))
+        for pin_name in node.folded_pins:
+            writer.write_string(pin_name)
+
+    # Connections
+    connections_offset = len(writer.buffer)
+    writer.write_varint(len(hivemap.connections))
+
+    for connection in hivemap.connections:
+        writer.write_string(connection.from_node)
+        writer.write_string(connection.output_name)
+        writer.write_string(connection.to_node)
+        writer.write_string(connection.input_name)
+        writer.buffer.append(bool(connection.is_trigger))
+
+    docstring_index = writer.intern(hivemap.docstring)
+
+    strings_offset = len(writer.buffer)
+    writer.write_string_table()
+
+    _header.pack_into(writer.buffer, 0, BINARY_MAGIC, BINARY_VERSION, 0, docstring_index, nodes_offset,
+                      connections_offset, strings_offset)
+    return bytes(writer.buffer)
+
+
+def dump_literal(value, record_types=()):
+    """Serialise a value with the encoding of parameter values, followed by its string table.
+
+    Values may be None, bool, int, float, str, bytes, and tuples, lists and dicts of values, including namedtuples of
+    the given record types. Raise ValueError if the value cannot be serialised
+
+    :param value: value to serialise
+    :param record_types: namedtuple classes which may be serialised
+    """
+    writer = _Writer(record_types)
+
+    if not writer.write_literal(value):
+        raise ValueError("Unable to serialise value: {!r}".format(value))
+
+    body = writer.buffer
+    writer.buffer = bytearray()
+    writer.write_string_table()
+
+    return bytes(writer.buffer + body)
+
+
+def load_literal(data, record_types=()):
+    """Deserialise a value serialised by dump_literal
+
+    :param data: bytes-like object
+    :param record_types: namedtuple classes which may be deserialised
+    """
+    reader = _Reader(data, record_types=record_types)
+    reader.read_string_table()
+
+    value = reader.read_literal()
+    if reader.offset != len(reader.data):
+        raise BinaryHivemapError("Unexpected data after value")
+
+    return value
+
+
+def _read_binary_header(reader):
+    """Read header and string table, return (docstring, nodes offset, connections offset)"""
+    magic, version, flags, docstring_index, nodes_offset, connections_offset, strings_offset = \
+        reader.read_struct(_header)
+
+    if magic != BINARY_MAGIC:
+        raise BinaryHivemapError("Not a binary hivemap")
+
+    if version != BINARY_VERSION:
+        raise BinaryHivemapError("Unsupported binary hivemap version: {}".format(version))
+
+    reader.offset = strings_offset
+    reader.read_string_table()
+
+    try:
+        docstring = reader.strings[docstring_index]
+
+    except IndexError:
+        raise BinaryHivemapError("Invalid string index")
+
+    return docstring, nodes_offset, connections_offset
+
+
+def _read_binary_node_family(reader):
+    try:
+        return _families[reader.read_byte()]
+
+    except IndexError:
+        raise BinaryHivemapError("Invalid node family")
+
+
+def _read_binary_node(reader):
+    identifier = reader.read_string()
+    family = _read_binary_node_family(reader)
+    reference_path = reader.read_string()
+    position = Position(*reader.read_struct(_position))
+
+    parameter_groups = []
+    for _ in range(reader.read_varint()):
+        group_identifier = reader.read_string()
+
+        params = []
+        for _ in range(reader.read_varint()):
+            parameter_identifier = reader.read_string()
+            data_type = reader.read_string()
+            value = reader.read_parameter_value()
+            params.append(ParameterRecord(parameter_identifier, data_type, value))
+
+        parameter_groups.append(ParameterGroupRecord(group_identifier, params))
+
+    folded_pins = [reader.read_string() for _ in range(reader.read_varint())]
+
+    return NodeRecord(identifier, family, reference_path, position, parameter_groups, folded_pins)
+
+
+def _skip_binary_node(reader):
+    """Read node without decoding its parameters, return (identifier, family) pair"""
+    identifier = reader.read_string()
+    family = _read_binary_node_family(reader)
+    reader.read_varint()
+    reader.offset += _position.size
+
+    for _ in range(reader.read_varint()):
+        reader.read_varint()
+
+        for _ in range(reader.read_varint()):
+            reader.read_varint()
+            reader.read_varint()
+            reader.skip_literal()
+
+    for _ in range(reader.read_varint()):
+        reader.read_varint()
+
+    return identifier, family
+
+
+def _read_binary_connection(reader):
+    from_node = reader.read_string()
+    output_name = reader.read_string()
+    to_node = reader.read_string()
+    input_name = reader.read_string()
+    is_trigger = bool(reader.read_byte())
+
+    return ConnectionRecord(from_node, output_name, to_node, input_name, is_trigger)
+
+
+def _node_from_record(record):
+    parameter_groups = [model.InstanceParameterGroup(g.identifier, [model.InstanceParameter(*p) for p in g.params])
+                        for g in record.parameter_groups]
+
+    return model.Node(identifier=record.identifier, family=record.family, reference_path=record.reference_path,
+                      position=tuple(record.position), parameter_groups=parameter_groups,
+                      folded_pins=record.folded_pins)
+
+
+def node_to_record(node):
+    """Return NodeRecord which describes a hivemap node
+
+    :param node: Spyder model Node or NodeRecord instance
+    """
+    if isinstance(node, NodeRecord):
+        return node
+
+    parameter_groups = [ParameterGroupRecord(g.identifier,
+                                             [ParameterRecord(p.identifier, p.data_type, p.value) for p in g.params])
+                        for g in node.parameter_groups]
+
+    return NodeRecord(node.identifier, node.family, node.reference_path, Position(node.position.x, node.position.y),
+                      parameter_groups, list(node.folded_pins))
+
+
+def _connection_to_record(connection):
+    return ConnectionRecord(connection.from_node, connection.output_name, connection.to_node, connection.input_name,
+                            bool(connection.is_trigger))
+
+
+def load_binary_records(data):
+    """Deserialise HivemapRecords (with lists of node and connection records) from binary format, without creating
+    Spyder model instances
+
+    :param data: bytes-like object
+    """
+    reader = _Reader(data)
+    docstring, nodes_offset, connections_offset = _read_binary_header(reader)
+
+    reader.offset = nodes_offset
+    nodes = [_read_binary_node(reader) for _ in range(reader.read_varint())]
+
+    reader.offset = connections_offset
+    connections = [_read_binary_connection(reader) for _ in range(reader.read_varint())]
+
+    return HivemapRecords(docstring, nodes, connections)
+
+
+def load_binary(data):
+    """Deserialise Hivemap from binary format
+
+    :param data: bytes-like object
+    """
+    records = load_binary_records(data)
+
+    hivemap = model.Hivemap()
+    hivemap.docstring = records.docstring
+
+    for record in records.nodes:
+        hivemap.nodes.append(_node_from_record(record))
+
+    for record in records.connections:
+        hivemap.connections.append(model.Connection(*record))
+
+    return hivemap
+
+
+class HivemapRecordReader:
+    """Read node and connection records from a hivemap file, as they are required.
+
+    Records have the same attributes as the Spyder model types, so the result of records() can be used in place of a
+    Hivemap by consumers which iterate over its nodes and connections once.
+
+    Only binary hivemaps are read lazily, from a memory mapping of the file. Spyder has no incremental parser for the
+    text format, so text hivemaps are parsed in full when they are opened, and their records are created as they are
+    iterated. Large hivemaps should therefore be saved in the binary format (see get_default_hivemap_extension).
+    """
+
+    def __init__(self, file_path):
+        """Open hivemap file for reading
+
+        :param file_path: path of hivemap file
+        """
+        self.file_path = file_path
+
+        self._mapping = None
+        self._data = None
+        self._strings = None
+        self._hivemap = None
+        self._iterators = WeakSet()
+
+        with open(file_path, "rb") as f:
+            if not is_binary_hivemap_path(file_path):
+                self._hivemap = model.Hivemap(f.read().decode("utf-8"))
+                self.docstring = self._hivemap.docstring
+                return
+
+            try:
+                self._mapping = mmap(f.fileno(), 0, access=ACCESS_READ)
+
+            except ValueError:
+                raise BinaryHivemapError("Not a binary hivemap")
+
+        try:
+            reader = _Reader(self._mapping)
+            self.docstring, self._nodes_offset, self._connections_offset = _read_binary_header(reader)
+
+        except Exception:
+            reader.data.release()
+            self.close()
+            raise
+
+        self._data = reader.data
+        self._strings = reader.strings
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        # Release views of the mapping held by unfinished iterators
+        for iterator in list(self._iterators):
+            iterator.close()
+
+        if self._data is not None:
+            self._data.release()
+            self._data = None
+
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+    def _read_section(self, offset, read_record):
+        reader = _Reader(self._data, self._strings)
+        reader.offset = offset
+
+        try:
+            for _ in range(reader.read_varint()):
+                yield read_record(reader)
+
+        finally:
+            reader.data.release()
+
+    def _iter_section(self, offset, read_record):
+        if self._mapping is None:
+            raise ValueError("I/O operation on closed hivemap reader")
+
+        iterator = self._read_section(offset, read_record)
+        self._iterators.add(iterator)
+        return iterator
+
+    def iter_nodes(self):
+        """Yield NodeRecord for each node"""
+        if self._hivemap is not None:
+            return map(node_to_record, self._hivemap.nodes)
+
+        return self._iter_section(self._nodes_offset, _read_binary_node)
+
+    def iter_node_families(self):
+        """Yield (identifier, family) pair for each node, without decoding parameters"""
+        if self._hivemap is not None:
+            return ((n.identifier, n.family) for n in self._hivemap.nodes)
+
+        return self._iter_section(self._nodes_offset, _skip_binary_node)
+
+    def iter_connections(self):
+        """Yield ConnectionRecord for each connection"""
+        if self._hivemap is not None:
+            return map(_connection_to_record, self._hivemap.connections)
+
+        return self._iter_section(self._connections_offset, _read_binary_connection)
+
+    def records(self):
+        """Return HivemapRecords, with iterators over node and connection records"""
+        return HivemapRecords(self.docstring, self.iter_nodes(), self.iter_connections())
+
+
+def get_default_hivemap_extension(node_count):
+    """Return file extension with which a hivemap should be saved by default
+
+    :param node_count: number of nodes in hivemap
+    """
+    if node_count >= LARGE_HIVEMAP_NODE_COUNT:
+        return BINARY_HIVEMAP_EXTENSION
+
+    return TEXT_HIVEMAP_EXTENSION
+
+
+def is_binary_hivemap_path(file_path):
+    return file_path.endswith(BINARY_HIVEMAP_EXTENSION)
+
+
+def is_hivemap_path(file_path):
+    return file_path.endswith(HIVEMAP_EXTENSIONS)
+
+
+def hivemap_from_bytes(data, file_path):
+    """Deserialise Hivemap from file data, using the format selected by the file extension
+
+    :param data: file contents
+    :param file_path: path of hivemap file
+    """
+    if is_binary_hivemap_path(file_path):
+        return load_binary(data)
+
+    return model.Hivemap(data.decode("utf-8"))
+
+
+def read_hivemap(file_path):
+    """Read Hivemap from file, using the format selected by the file extension
+
+    :param file_path: path of hivemap file
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+
+    return hivemap_from_bytes(data, file_path)
+
+
+def write_hivemap(file_path, hivemap):
+    """Write Hivemap to file, using the format selected by the file extension
+
+    :param file_path: path of hivemap file
+    :param hivemap: Hivemap instance
+    """
+    if is_binary_hivemap_path(file_path):
+        with open(file_path, "wb") as f:
+            f.write(dump_binary(hivemap))
+
+    else:
+        with open(file_path, "w") as f:
+            f.write(str(hivemap))
+
+
+def get_hivemap_module_name(file_name):
+    """Return module name of hivemap file name, or None if it is not a hivemap
+
+    :param file_name: name of file
+    """
+    name, extension = os.path.splitext(file_name)
+
+    if extension in HIVEMAP_EXTENSIONS:
+        return name
+
+    return None
@@ -1,57 +1,270 @@
 import sys
 from contextlib import contextmanager
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
+from hashlib import sha256
+from importlib import import_module
 from importlib.machinery import ModuleSpec
 from importlib.abc import MetaPathFinder, FileLoader
-from os.path import basename, splitext, join, isdir
-from os import listdir
+from importlib.util import MAGIC_NUMBER
+from inspect import isclass, ismodule
+from os.path import basename, splitext, join, dirname
+from os import listdir, makedirs, replace, stat
 
+import hive
 
-from .code_generator import hivemap_to_python_source
+from .cache import clear_caches
+from .code_generator import plan_hivemap, plan_record_types, plan_to_builder, plan_to_python_source, HivemapPlan
 from .data_views import ListView
+from .hivemap_io import dump_literal, hivemap_from_bytes, get_hivemap_module_name, load_literal
 from .utils import underscore_to_camel_case
-from .models import model
 
 
 HivemapLoaderResult = namedtuple("HivemapLoaderResult", "module cls class_name")
 
+# Increment when the generated plan or source for a hivemap may change
+HIVEMAP_CACHE_VERSION = 5
+_HIVEMAP_CACHE_HEADER = MAGIC_NUMBER + HIVEMAP_CACHE_VERSION.to_bytes(4, "little")
+
+
+def get_hivemap_cache_path(file_path):
+    """Return path of the plan cache file for a hivemap, in the __pycache__ directory alongside it
+
+    :param file_path: path of hivemap file
+    """
+    file_name = "{}.{}.pyc".format(basename(file_path), sys.implementation.cache_tag)
+    return join(dirname(file_path), "__pycache__", file_name)
+
+
+def get_module_dependencies(module):
+    """Return sorted list of import paths of the modules which a module depends upon.
+
+    Hivemap modules depend upon the modules imported by their plan. Python modules depend upon the modules, and the
+    modules of the hive classes, bound in their namespace
+
+    :param module: module object
+    """
+    if module_is_hivemap(module):
+        plan = module.__loader__.plan
+        return [] if plan is None else sorted(set(plan.imports))
+
+    import_paths = set()
+
+    for value in vars(module).values():
+        if ismodule(value):
+            import_paths.add(value.__name__)
+
+        elif isclass(value) and issubclass(value, (hive.HiveBuilder, hive.MetaHivePrimitive)):
+            import_paths.add(value.__module__)
+
+    import_paths.discard(module.__name__)
+    return sorted(import_paths)
+
+
+def get_dependency_stamps(import_paths):
+    """Return sorted list of (file path, mtime, size) stamps of the files of imported modules.
+
+    Like SourceFileLoader, files are compared by stamp rather than by content. The dependencies of hivemap modules are
+    stamped transitively, whilst Python modules are only stamped by their own file (changes to the modules which they
+    import are not detected). Modules without files are ignored
+
+    :param import_paths: absolute import paths of modules
+    """
+    pending = list(import_paths)
+    visited = set()
+    stamps = []
+
+    while pending:
+        import_path = pending.pop()
+        if import_path in visited:
+            continue
+
+        visited.add(import_path)
+        module = import_module(import_path)
+
+        file_path = getattr(module, "__file__", None)
+        if file_path is None:
+            continue
+
+        file_stat = stat(file_path)
+        stamps.append((file_path, file_stat.st_mtime_ns, file_stat.st_size))
+
+        if module_is_hivemap(module):
+            pending.extend(get_module_dependencies(module))
+
+    stamps.sort()
+    return stamps
+
+
+def dependency_stamps_are_current(stamps):
+    """Return True if the files of a list of stamps (see get_dependency_stamps) are unchanged
+
+    :param stamps: iterable of (file path, mtime, size) stamps
+    """
+    for file_path, mtime, size in stamps:
+        try:
+            file_stat = stat(file_path)
+
+        except OSError:
+            return False
+
+        if (file_stat.st_mtime_ns, file_stat.st_size) != (mtime, size):
+            return False
+
+    return True
+
 
 class HivemapModuleLoader(FileLoader):
     """Loader for hivemaps"""
 
-    def __init__(self, fullname, path):
+    def __init__(self, fullname, path, on_loaded=None):
+        """Hivemap loader initialiser
+
+        :param fullname: module name
+        :param path: path of hivemap file
+        :param on_loaded: optional callback invoked with each HivemapLoaderResult
+        """
         super().__init__(fullname, path)
 
         self._source = None
+        self._plan = None
+        self._on_loaded = on_loaded
         self.results = []
 
     def clear_cache(self):
         self.results.clear()
 
+    @property
+    def plan(self):
+        """HivemapPlan of the last executed module, or None"""
+        return self._plan
+
     @staticmethod
     def _class_name_from_file_path(file_path):
         file_name = splitext(basename(file_path))[0]
         return underscore_to_camel_case(file_name)
 
-    def get_source(self, fullname):
-        return self._source
+    @staticmethod
+    def _read_cache(cache_path, digest):
+        """Return HivemapPlan from the cache file, or None if it is missing or stale.
 
-    def exec_module(self, module):
-        name = module.__spec__.name
+        Plans are stale if the hivemap, or the file of any module which it depends upon (see get_dependency_stamps),
+        has changed since they were cached. Dependencies are compared by stamp, without importing them
+
+        :param cache_path: path of cache file
+        :param digest: SHA-256 digest of hivemap data
+        """
+        try:
+            with open(cache_path, "rb") as f:
+                data = f.read()
+
+        except OSError:
+            return None
+
+        header_length = len(_HIVEMAP_CACHE_HEADER)
+        if data[:header_length] != _HIVEMAP_CACHE_HEADER:
+            return None
+
+        if data[header_length:header_length + len(digest)] != digest:
+            return None
+
+        try:
+            dependency_stamps, plan = load_literal(data[header_length + len(digest):], plan_record_types)
+
+            if not dependency_stamps_are_current(dependency_stamps):
+                return None
+
+        except (ValueError, TypeError, RecursionError):
+            return None
+
+        if not isinstance(plan, HivemapPlan):
+            return None
+
+        return plan
+
+    @staticmethod
+    def _write_cache(cache_path, digest, plan):
+        """Write plan to the cache file
 
-        # Load hivemap
+        :param cache_path: path of cache file
+        :param digest: SHA-256 digest of hivemap data
+        :param plan: HivemapPlan instance
+        """
+        if sys.dont_write_bytecode:
+            return
+
+        # Plans with arguments that cannot be serialised are not cached
+        try:
+            data = _HIVEMAP_CACHE_HEADER + digest + dump_literal((get_dependency_stamps(plan.imports), plan),
+                                                                 plan_record_types)
+
+        except (ValueError, ImportError, OSError):
+            return
+
+        temporary_path = "{}.tmp".format(cache_path)
+
+        try:
+            makedirs(dirname(cache_path), exist_ok=True)
+
+            with open(temporary_path, "wb") as f:
+                f.write(data)
+
+            replace(temporary_path, cache_path)
+
+        except OSError:
+            pass
+
+    def _read_hivemap_data(self):
+        try:
+            with open(self.path, "rb") as f:
+                return f.read()
+
+        except OSError as err:
+            print("Unable to load {}".format(self.path))
+            raise ImportError from err
+
+    def _load_hivemap(self, hivemap_data):
         try:
-            hivemap = model.Hivemap.fromfile(self.path)
+            return hivemap_from_bytes(hivemap_data, self.path)
 
         except Exception as err:
             print("Unable to load {}".format(self.path))
             raise ImportError from err
 
+    def get_source(self, fullname):
+        # Hives are built directly from their plans, so source is only generated on demand
+        if self._source is None and self._plan is not None:
+            class_name = self._class_name_from_file_path(self.path)
+            self._source = plan_to_python_source(self._plan, class_name)
+
+        return self._source
+
+    def exec_module(self, module):
+        name = module.__spec__.name
         class_name = self._class_name_from_file_path(self.path)
-        python_source = self._source = hivemap_to_python_source(hivemap, class_name=class_name)
 
+        hivemap_data = self._read_hivemap_data()
+        digest = sha256(hivemap_data).digest()
+        cache_path = get_hivemap_cache_path(self.path)
+
+        self._source = None
+        self._plan = self._read_cache(cache_path, digest)
+
+        # Plan and cache hivemap
+        if self._plan is None:
+            hivemap = self._load_hivemap(hivemap_data)
+
+            try:
+                self._plan = plan_hivemap(hivemap)
+
+            except Exception as exc:
+                raise ImportError(name) from exc
+
+            self._write_cache(cache_path, digest, self._plan)
+
+        # Build hive directly from the plan, without generating and parsing Python source
         try:
-            exec(python_source, module.__dict__)
+            builder = module.builder = plan_to_builder(self._plan, module.__dict__, file_name=self.path)
+            setattr(module, class_name, hive.hive(class_name, builder=builder))
 
         except Exception as exc:
             raise ImportError(name) from exc
@@ -59,33 +272,97 @@ class HivemapModuleLoader(FileLoader):
         loader_result = HivemapLoaderResult(module, getattr(module, class_name), class_name)
         self.results.append(loader_result)
 
+        if self._on_loaded is not None:
+            self._on_loaded(loader_result)
+
         return module
 
 
 class HivemapModuleFinder(MetaPathFinder):
     """MetaPathFinder for hivemaps"""
 
+    # Largest number of directory listings to cache
+    max_listings = 256
+
     def __init__(self):
         self._loaders = []
+        self._spec_key_to_loader = {}
+        self._class_to_loader_result = {}
+        self._directory_to_listing = OrderedDict()
 
     def invalidate_caches(self):
         for loader in self._loaders:
             loader.clear_cache()
 
         self._loaders.clear()
+        self._spec_key_to_loader.clear()
+        self._class_to_loader_result.clear()
+        self.invalidate_listings()
+
+    def invalidate_listings(self):
+        """Forget the hivemap files found in each directory, so that created and deleted hivemaps are found"""
+        self._directory_to_listing.clear()
 
     @property
     def loaders(self):
         return ListView(self._loaders)
 
+    def _on_loaded(self, loader_result):
+        self._class_to_loader_result[loader_result.cls] = loader_result
+
     def find_loader_result_for_class(self, cls):
-        for loader in self._loaders:
+        try:
+            return self._class_to_loader_result[cls]
+
+        except (KeyError, TypeError):
+            raise ValueError("Couldn't find class: {}".format(cls))
 
-            for result in loader.results:
-                if result.cls is cls:
-                    return result
+    def _get_hivemap_names(self, directory):
+        """Return dictionary of hivemap module name to file name in a directory.
 
-        raise ValueError("Couldn't find class: {}".format(cls))
+        Like FileFinder, listings are cached until the mtime of the directory changes (or the listings are
+        invalidated). The least recently used listings are discarded beyond max_listings
+
+        :param directory: directory path
+        """
+        try:
+            mtime = stat(directory).st_mtime_ns
+
+        except (OSError, ValueError):
+            mtime = -1
+
+        try:
+            listing_mtime, names = self._directory_to_listing[directory]
+
+        except KeyError:
+            pass
+
+        else:
+            if listing_mtime == mtime:
+                self._directory_to_listing.move_to_end(directory)
+                return names
+
+        try:
+            file_names = listdir(directory)
+
+        except (OSError, ValueError):
+            file_names = []
+
+        names = {}
+        for file_name in sorted(file_names, reverse=True):
+            module_name = get_hivemap_module_name(file_name)
+
+            # Text hivemaps take precedence over binary hivemaps
+            if module_name is not None:
+                names[module_name] = file_name
+
+        self._directory_to_listing[directory] = mtime, names
+        self._directory_to_listing.move_to_end(directory)
+
+        while len(self._directory_to_listing) > self.max_listings:
+            self._directory_to_listing.popitem(last=False)
+
+        return names
 
     def find_spec(self, fullname, path, target=None):
         if path is None:
@@ -96,24 +373,30 @@ class HivemapModuleFinder(MetaPathFinder):
             import_path = fullname.split('.')[-1]
 
         split_path = import_path.split('.')
-        file_name = "{}.hivemap".format(split_path[-1])
+        module_name = split_path[-1]
 
         # Search all paths to find hivemap
         for root in path:
             directory = join(root, *split_path[:-1])
 
-            if not isdir(directory):
-                continue
+            file_name = self._get_hivemap_names(directory).get(module_name)
 
-            if file_name in listdir(directory):
+            if file_name is not None:
                 file_path = join(directory, file_name)
                 break
 
         else:
             return None
 
-        loader = HivemapModuleLoader(fullname, file_path)
-        self._loaders.append(loader)
+        # Re-use loader for the same module
+        spec_key = fullname, file_path
+
+        try:
+            loader = self._spec_key_to_loader[spec_key]
+
+        except KeyError:
+            loader = self._spec_key_to_loader[spec_key] = HivemapModuleLoader(fullname, file_path, self._on_loaded)
+            self._loaders.append(loader)
 
         spec = ModuleSpec(fullname, loader, origin=file_path, loader_state=None, is_package=False)
         spec.has_location = True
@@ -166,6 +449,9 @@ def clear_imported_hivemaps():
     for name in to_remove:
         del sys.modules[name]
 
+    # Inspection results may refer to the removed hivemap classes
+    clear_caches()
+
 
 def module_is_hivemap(module):
     """Return True if module is a generated module for a hivemap"""
@@ -1,6 +1,8 @@
 from collections import OrderedDict
+from copy import deepcopy
 
 from hive import matchmaker_validation_enabled_as
+from .cache import inspection_cache
 from .utils import hive_import_from_path, get_bind_class_args
 
 
@@ -140,6 +142,16 @@ class HiveNodeInspector:
         :param reference_path: reference path of Hive class
         :param params: assigned parameters for each inspection stage
         """
+        # Options of later stages only depend upon the meta args
+        meta_args = params.get("meta_args", {})
+
+        # Options are copied, so that changing the options of one node does not change those of other nodes
+        try:
+            return deepcopy(inspection_cache.get(reference_path, meta_args))
+
+        except KeyError:
+            pass
+
         inspector = self.inspect(reference_path)
         param_info = {}
 
@@ -155,6 +167,7 @@ class HiveNodeInspector:
             param_info[stage_name] = stage_options
             previous_values = params[stage_name]
 
+        inspection_cache.set(reference_path, meta_args, deepcopy(param_info))
         return param_info
 
     def _scrape_wrapper(self, wrapper):
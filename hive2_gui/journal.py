@@ -0,0 +1,377 @@
+"""Append-only journal of the history of a node manager, from which an editing session can be recovered after a crash.
+
+The journal begins with a snapshot of the model and its undo history, followed by an entry for each command which is
+recorded, undone or redone. Commands are described by data (see NodeManager.encode_delta) when they are recorded, and
+are written to disk by a background thread, so that editing is not blocked by the file system.
+
+Entries are serialised with the value encoding of binary hivemaps (see hivemap_io.dump_literal), which only permits
+plain values and the record types of the node manager, so that reading a journal never executes code. Each entry is
+framed by its length and checksum, so that an entry which was only partially written ends the journal.
+"""
+import os
+from collections import namedtuple
+from enum import auto, IntEnum
+from logging import getLogger
+from queue import Queue
+from struct import Struct
+from threading import Thread
+from zlib import crc32
+
+from .history import command_from_data, command_to_data
+from .hivemap_io import dump_binary, dump_literal, load_binary_records, load_literal
+
+
+JOURNAL_EXTENSION = ".journal"
+
+logger = getLogger(__name__)
+
+# Length and CRC32 of entry payload
+_frame_header = Struct("<II")
+
+
+class JournalEntryKinds(IntEnum):
+    snapshot = auto()
+    command = auto()
+    merged_command = auto()
+    undo = auto()
+    redo = auto()
+
+
+JournalEntry = namedtuple("JournalEntry", "kind data")
+
+
+def get_journal_path(file_path):
+    """Return path of journal of a hivemap file
+
+    :param file_path: path of hivemap file
+    """
+    return file_path + JOURNAL_EXTENSION
+
+
+def _frame_entry(payload):
+    return _frame_header.pack(len(payload), crc32(payload)) + payload
+
+
+class _JournalWriter:
+    """Serialise and write journal entries from a background thread"""
+
+    def __init__(self, file_path, sync=True):
+        """Journal writer initialiser
+
+        :param file_path: path of journal file
+        :param sync: wait for each entry to reach the disk before writing the next
+        """
+        self._file_path = file_path
+        self._sync = sync
+        self._queue = Queue()
+
+        self._thread = Thread(target=self._run_threaded)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, payload, replace=False):
+        """Append entry to journal
+
+        :param payload: serialised entry
+        :param replace: replace the existing entries of the journal
+        """
+        self._queue.put((payload, replace))
+
+    def flush(self):
+        """Wait until all written entries are on disk"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _write_file(self, file, frame):
+        file.write(frame)
+        file.flush()
+
+        if self._sync:
+            os.fsync(file.fileno())
+
+    def _run_threaded(self):
+        file = None
+
+        try:
+            while True:
+                item = self._queue.get()
+
+                try:
+                    if item is None:
+                        break
+
+                    payload, replace = item
+                    frame = _frame_entry(payload)
+
+                    if replace:
+                        if file is not None:
+                            file.close()
+                            file = None
+
+                        # Replace the journal atomically, so that a crash does not lose the previous journal
+                        temporary_path = "{}.tmp".format(self._file_path)
+
+                        with open(temporary_path, "wb") as temporary_file:
+                            self._write_file(temporary_file, frame)
+
+                        os.replace(temporary_path, self._file_path)
+                        file = open(self._file_path, "ab")
+
+                    elif file is not None:
+                        self._write_file(file, frame)
+
+                except Exception:
+                    logger.exception("Unable to write journal {}".format(self._file_path))
+
+                finally:
+                    self._queue.task_done()
+
+        finally:
+            if file is not None:
+                file.close()
+
+
+class HistoryJournal:
+    """Journal of the history of a node manager, written to a file"""
+
+    def __init__(self, file_path, node_manager, compact_interval=1000, sync=True):
+        """History journal initialiser
+
+        :param file_path: path of journal file
+        :param node_manager: NodeManager instance
+        :param compact_interval: number of entries after which the journal is replaced by a snapshot, or None
+        :param sync: wait for each entry to reach the disk before writing the next
+        """
+        self._file_path = file_path
+        self._node_manager = node_manager
+        self._compact_interval = compact_interval
+        self._sync = sync
+
+        self._entry_count = 0
+        self._writer = None
+        self._record_types = node_manager.delta_record_types
+
+        # Ids of the commands which can be recovered from the journal
+        self._journaled_ids = set()
+
+    @property
+    def file_path(self):
+        return self._file_path
+
+    @property
+    def is_open(self):
+        return self._writer is not None
+
+    def open(self):
+        """Start writing the journal, beginning with a snapshot of the current model and history"""
+        if self._writer is not None:
+            raise RuntimeError("Journal is already open")
+
+        history = self._node_manager.history
+        history.delta_encoder = self._node_manager.encode_delta
+        history.on_command_added.subscribe(self._on_command_added)
+        history.on_undone.subscribe(self._on_undone)
+        history.on_redone.subscribe(self._on_redone)
+        history.on_jumped.subscribe(self._on_jumped)
+
+        self._writer = _JournalWriter(self._file_path, self._sync)
+        self.compact()
+
+    def close(self, discard=False):
+        """Stop writing the journal, once the pending entries are written
+
+        :param discard: delete the journal file, e.g. if the session ended normally
+        """
+        if self._writer is None:
+            raise RuntimeError("Journal is not open")
+
+        history = self._node_manager.history
+        history.delta_encoder = None
+        history.on_command_added.unsubscribe(self._on_command_added)
+        history.on_undone.unsubscribe(self._on_undone)
+        history.on_redone.unsubscribe(self._on_redone)
+        history.on_jumped.unsubscribe(self._on_jumped)
+
+        self._writer.close()
+        self._writer = None
+
+        if discard:
+            try:
+                os.remove(self._file_path)
+
+            except FileNotFoundError:
+                pass
+
+    def flush(self):
+        """Wait until all entries are written"""
+        self._writer.flush()
+
+    def compact(self):
+        """Replace the journal with a snapshot of the current model and history"""
+        node_manager = self._node_manager
+        history = node_manager.history
+        commands = history.commands
+        index = history.index
+
+        # Commands which cannot be serialised (e.g. those recorded before the journal was opened) are omitted, with
+        # all of the commands before them
+        commands_data = []
+
+        for command in reversed(commands):
+            try:
+                commands_data.append(dump_literal(command_to_data(command), self._record_types))
+
+            except ValueError:
+                break
+
+        commands_data.reverse()
+        first_index = len(commands) - len(commands_data)
+
+        # The current command must be recovered to redo any later commands
+        if index < first_index - 1:
+            commands_data = []
+            first_index = index + 1
+
+        # Snapshots do not depend upon the time at which the current command was recorded
+        history.reset_merge()
+
+        snapshot = dump_binary(node_manager.to_hivemap()), commands_data, index - first_index
+        self._writer.write(self._serialise(JournalEntryKinds.snapshot, snapshot), replace=True)
+        self._entry_count = 0
+        self._journaled_ids = {command.id for command in commands[first_index:first_index + len(commands_data)]}
+
+    def _serialise(self, kind, data=None):
+        return dump_literal((int(kind), data), self._record_types)
+
+    def _append(self, payload):
+        self._entry_count += 1
+
+        if self._compact_interval is not None and self._entry_count >= self._compact_interval:
+            self.compact()
+
+        else:
+            self._writer.write(payload)
+
+    def _on_command_added(self, command, is_merged):
+        kind = JournalEntryKinds.merged_command if is_merged else JournalEntryKinds.command
+
+        try:
+            payload = self._serialise(kind, command_to_data(command))
+
+        except ValueError:
+            logger.debug("Command cannot be journaled, journal is replaced by a snapshot: {!r}".format(command))
+            self.compact()
+            return
+
+        history = self._node_manager.history
+        self._journaled_ids.add(history.commands[history.index].id)
+
+        self._append(payload)
+
+    def _on_undone(self):
+        history = self._node_manager.history
+
+        if history.commands[history.index + 1].id in self._journaled_ids:
+            self._append(self._serialise(JournalEntryKinds.undo))
+
+        else:
+            self.compact()
+
+    def _on_redone(self):
+        history = self._node_manager.history
+
+        if history.commands[history.index].id in self._journaled_ids:
+            self._append(self._serialise(JournalEntryKinds.redo))
+
+        else:
+            self.compact()
+
+    def _on_jumped(self):
+        # Only the current branch of the history is journaled
+        self.compact()
+
+
+def read_journal(file_path, record_types=()):
+    """Return list of JournalEntry instances read from a journal file, up to the first incomplete or corrupt entry
+
+    :param file_path: path of journal file
+    :param record_types: namedtuple classes which may be read (see NodeManager.delta_record_types)
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+
+    entries = []
+    offset = 0
+
+    while offset < len(data):
+        if offset + _frame_header.size > len(data):
+            logger.warning("Journal {} ends with an incomplete entry".format(file_path))
+            break
+
+        length, checksum = _frame_header.unpack_from(data, offset)
+        start = offset + _frame_header.size
+        payload = data[start: start + length]
+
+        if len(payload) < length or crc32(payload) != checksum:
+            logger.warning("Journal {} ends with an incomplete or corrupt entry".format(file_path))
+            break
+
+        try:
+            kind, entry_data = load_literal(payload, record_types)
+            kind = JournalEntryKinds(kind)
+
+            if kind == JournalEntryKinds.snapshot:
+                hivemap_data, commands_data, index = entry_data
+                entry_data = hivemap_data, [load_literal(d, record_types) for d in commands_data], index
+
+        except (ValueError, TypeError, RecursionError):
+            logger.warning("Journal {} ends with an invalid entry".format(file_path))
+            break
+
+        entries.append(JournalEntry(kind, entry_data))
+        offset = start + length
+
+    return entries
+
+
+def recover_journal(file_path, node_manager):
+    """Restore the model and history of a node manager from a journal file.
+
+    Return number of entries which were replayed
+
+    :param file_path: path of journal file
+    :param node_manager: NodeManager instance
+    """
+    entries = read_journal(file_path, node_manager.delta_record_types)
+
+    if not entries or entries[0].kind != JournalEntryKinds.snapshot:
+        raise ValueError("Journal {} does not begin with a snapshot".format(file_path))
+
+    history = node_manager.history
+    get_callback = node_manager.get_delta_callback
+
+    for kind, data in entries:
+        if kind == JournalEntryKinds.snapshot:
+            hivemap_data, commands_data, index = data
+
+            with history.unrecorded_context():
+                node_manager.load_hivemap(load_binary_records(hivemap_data))
+
+            commands = [command_from_data(command_data, get_callback, logger, is_executed=i <= index)
+                        for i, command_data in enumerate(commands_data)]
+            history.restore(commands, index)
+
+        elif kind in (JournalEntryKinds.command, JournalEntryKinds.merged_command):
+            command = command_from_data(data, get_callback, logger, is_executed=False)
+            history.apply_command(command, merge=kind == JournalEntryKinds.merged_command)
+
+        elif kind == JournalEntryKinds.undo:
+            history.undo()
+
+        elif kind == JournalEntryKinds.redo:
+            history.redo()
+
+    return len(entries)
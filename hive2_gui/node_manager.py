@@ -1,10 +1,16 @@
 import logging
+from collections import ChainMap, defaultdict, namedtuple
+from itertools import chain
 from keyword import iskeyword
+from math import floor
+from operator import attrgetter
+from weakref import WeakKeyDictionary
 
-from .code_generator import parameter_group_array_to_dict, parameter_group_dict_to_array
+from .code_generator import io_reference_path, parameter_group_array_to_dict, parameter_group_dict_to_array
 from .connection import Connection, ConnectionType
 from .factory import BeeNodeFactory, HiveNodeFactory
 from .history import CommandLogManager
+from .hivemap_io import NodeRecord, ParameterGroupRecord, ParameterRecord, Position, node_to_record
 from .inspector import HiveNodeInspector, BeeNodeInspector
 from .models import model
 from .node import FOLD_NODE_REFERENCE_PATH, NodeTypes
@@ -67,6 +73,337 @@ class NodeConnectionError(Exception):
     pass
 
 
+# IO and attribute nodes are inspected by the editor, so they are never dormant
+_always_hydrated_reference_paths = io_reference_path | {"hive.attribute"}
+
+
+def _spyder_node_from_record(name, record):
+    """Create hivemap node from a dormant node record
+
+    :param name: name of dormant node
+    :param record: hivemap node record
+    """
+    parameter_groups = [model.InstanceParameterGroup(g.identifier,
+                                                     [model.InstanceParameter(p.identifier, p.data_type, p.value)
+                                                      for p in g.params])
+                        for g in record.parameter_groups]
+
+    return model.Node(identifier=name, family=record.family, reference_path=record.reference_path,
+                      position=(record.position.x, record.position.y), parameter_groups=parameter_groups,
+                      folded_pins=list(record.folded_pins))
+
+
+def _get_parameter_strings(spyder_node):
+    """Return list of (group identifier, [(identifier, data type, value string), ...]) pairs of a hivemap node
+
+    :param spyder_node: hivemap node or NodeRecord
+    """
+    return [(g.identifier, [(p.identifier, p.data_type, p.value) for p in g.params])
+            for g in spyder_node.parameter_groups]
+
+
+def _merge_dormant_connections(graph, node_name, pin_name, connections):
+    """Return list of the connections of an output pin, with its dormant connections inserted in hivemap order
+
+    :param graph: dormant graph
+    :param node_name: name of node
+    :param pin_name: name of output pin
+    :param connections: connections of output pin
+    """
+    dormant_connections = sorted(c for c in graph.name_to_connections.get(node_name, ())
+                                 if c.from_node == node_name and c.output_name == pin_name)
+    if not dormant_connections:
+        return connections
+
+    merged = []
+    index = 0
+
+    for connection in connections:
+        sequence = graph.get_sequence(connection)
+
+        while index < len(dormant_connections) and dormant_connections[index].sequence < sequence:
+            merged.append(dormant_connections[index])
+            index += 1
+
+        merged.append(connection)
+
+    merged.extend(dormant_connections[index:])
+    return merged
+
+
+def _get_connection_key(connection):
+    """Return (source node name, output name, target node name, input name) tuple of connection"""
+    output_pin = connection.output_pin
+    input_pin = connection.input_pin
+    return output_pin.node.name, output_pin.name, input_pin.node.name, input_pin.name
+
+
+# Description of a node by data, from which it can be rebuilt
+NodeData = namedtuple("NodeData", "name node_type reference_path params position")
+# Description of a graph by data: list of NodeData, connection keys in pin order, (node name, pin name) pairs of
+# folded pins, and DormantGraphData of the dormant part of the graph (or None)
+GraphData = namedtuple("GraphData", "nodes connections folded_pins dormant_graph")
+# Description of a dormant graph by data: (name, NodeRecord) pairs of dormant nodes, DormantConnection records, and
+# the hivemap index of each connection of the GraphData
+DormantGraphData = namedtuple("DormantGraphData", "records connections sequences")
+
+# Connection with at least one dormant node, with the index of the connection in the hivemap
+DormantConnection = namedtuple("DormantConnection", "sequence from_node output_name to_node input_name is_trigger")
+
+
+class _DormantGraph:
+    """Part of a loaded graph which is kept as hivemap records until it is hydrated.
+
+    Dormant nodes reserve their names, but have no Node instance. Connections with a dormant node are kept as
+    DormantConnection records. Nodes which are dormant, or have dormant connections, are indexed by position.
+    """
+
+    cell_size = 1000.0
+
+    def __init__(self):
+        self.name_to_record = {}
+        self.name_to_connections = defaultdict(set)
+
+        # Hivemap order of created connections, so that connection order is restored when they are re-created
+        self._connection_to_sequence = WeakKeyDictionary()
+
+        self._cell_to_names = defaultdict(set)
+        self._name_to_position = {}
+
+    def _get_cell(self, position):
+        return floor(position[0] / self.cell_size), floor(position[1] / self.cell_size)
+
+    def track(self, name, position):
+        self._name_to_position[name] = position
+        self._cell_to_names[self._get_cell(position)].add(name)
+
+    def untrack(self, name):
+        position = self._name_to_position.pop(name)
+        cell = self._get_cell(position)
+
+        names = self._cell_to_names[cell]
+        names.discard(name)
+
+        if not names:
+            del self._cell_to_names[cell]
+
+    def update_tracking(self, name):
+        """Stop tracking name if it is neither dormant nor has dormant connections"""
+        if name in self.name_to_record or name not in self._name_to_position:
+            return
+
+        if self.name_to_connections.get(name):
+            return
+
+        self.name_to_connections.pop(name, None)
+        self.untrack(name)
+
+    @property
+    def tracked_names(self):
+        return self._name_to_position.keys()
+
+    def find_in_rect(self, x, y, width, height):
+        """Return list of tracked names with positions inside a rectangle"""
+        min_x, min_y = self._get_cell((x, y))
+        max_x, max_y = self._get_cell((x + width, y + height))
+
+        names = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                for name in self._cell_to_names.get((cell_x, cell_y), ()):
+                    position_x, position_y = self._name_to_position[name]
+
+                    if x <= position_x <= x + width and y <= position_y <= y + height:
+                        names.append(name)
+
+        return names
+
+    def add_node(self, name, record):
+        self.name_to_record[name] = record
+        self.track(name, (record.position.x, record.position.y))
+
+    def add_dormant_connection(self, connection):
+        self.name_to_connections[connection.from_node].add(connection)
+        self.name_to_connections[connection.to_node].add(connection)
+
+    def remove_dormant_connection(self, connection):
+        self.name_to_connections[connection.from_node].discard(connection)
+        self.name_to_connections[connection.to_node].discard(connection)
+
+    def get_sequence(self, connection):
+        """Return hivemap index of connection, or infinity if it was not loaded from the hivemap"""
+        return self._connection_to_sequence.get(connection, float("inf"))
+
+    def add_connection(self, connection, sequence):
+        """Add created connection to the graph, with its hivemap order
+
+        :param connection: Connection instance
+        :param sequence: index of connection in the hivemap
+        """
+        self._connection_to_sequence[connection] = sequence
+
+    def get_dormant_connections(self):
+        """Return list of all dormant connections, in hivemap order"""
+        return sorted({c for connections in self.name_to_connections.values() for c in connections})
+
+
+class _EventBatch:
+    """Model events queued during a history transaction, to be delivered as their net effect.
+
+    Nodes and connections which were created or destroyed are delivered as one graph unload and one graph load.
+    Nodes whose pins were folded or unfolded are reloaded. Moves, renames and connection order are delivered from the
+    final state of the model
+    """
+
+    def __init__(self):
+        # Object to [is created by first event, is created by last event]
+        self._node_to_lifecycle = {}
+        self._connection_to_lifecycle = {}
+
+        # Ordered sets
+        self._moved_nodes = {}
+        self._renamed_nodes = {}
+        self._refolded_nodes = {}
+        self._reordered_pins = {}
+
+    @staticmethod
+    def _add_lifecycle_event(object_to_lifecycle, obj, is_created):
+        try:
+            object_to_lifecycle[obj][1] = is_created
+
+        except KeyError:
+            object_to_lifecycle[obj] = [is_created, is_created]
+
+    def node_created(self, node):
+        self._add_lifecycle_event(self._node_to_lifecycle, node, True)
+
+    def node_destroyed(self, node):
+        self._add_lifecycle_event(self._node_to_lifecycle, node, False)
+
+    def node_moved(self, node, position):
+        self._moved_nodes[node] = None
+
+    def node_renamed(self, node, name):
+        self._renamed_nodes[node] = None
+
+    def connection_created(self, connection):
+        self._add_lifecycle_event(self._connection_to_lifecycle, connection, True)
+        self._reordered_pins[connection.output_pin] = None
+
+    def connection_destroyed(self, connection):
+        self._add_lifecycle_event(self._connection_to_lifecycle, connection, False)
+        self._reordered_pins[connection.output_pin] = None
+
+    def connection_reordered(self, connection, index):
+        self._reordered_pins[connection.output_pin] = None
+
+    def _pin_refolded(self, pin):
+        # Both the node and its folded variable are displayed differently
+        variable_node = next(iter(pin.connections)).output_pin.node
+
+        self._refolded_nodes[pin.node] = None
+        self._refolded_nodes[variable_node] = None
+
+    pin_folded = pin_unfolded = _pin_refolded
+
+    def graph_loaded(self, nodes, connections):
+        for node in nodes:
+            self.node_created(node)
+
+        for connection in connections:
+            self.connection_created(connection)
+
+    def graph_unloaded(self, nodes, connections):
+        for connection in connections:
+            self.connection_destroyed(connection)
+
+        for node in nodes:
+            self.node_destroyed(node)
+
+    def flush(self, node_manager):
+        """Deliver the net effect of the queued events to the observers of a node manager
+
+        :param node_manager: NodeManager instance
+        """
+        node_to_lifecycle = self._node_to_lifecycle
+        connection_to_lifecycle = self._connection_to_lifecycle
+
+        def was_alive(obj, object_to_lifecycle):
+            lifecycle = object_to_lifecycle.get(obj)
+            return lifecycle is None or not lifecycle[0]
+
+        def is_alive(obj, object_to_lifecycle):
+            lifecycle = object_to_lifecycle.get(obj)
+            return lifecycle is None or lifecycle[1]
+
+        # Nodes which are reloaded
+        refolded_nodes = [n for n in self._refolded_nodes if was_alive(n, node_to_lifecycle) and
+                          is_alive(n, node_to_lifecycle)]
+
+        unloaded_nodes = [n for n, (is_created, _) in node_to_lifecycle.items() if not is_created]
+        unloaded_nodes.extend(n for n in refolded_nodes if n not in node_to_lifecycle)
+
+        loaded_nodes = [n for n, (_, is_created) in node_to_lifecycle.items() if is_created]
+        loaded_nodes.extend(n for n in refolded_nodes if n not in node_to_lifecycle)
+        loaded_node_set = set(loaded_nodes)
+
+        unloaded_connections = [c for c, (is_created, _) in connection_to_lifecycle.items() if not is_created]
+        loaded_connections = [c for c, (_, is_created) in connection_to_lifecycle.items() if is_created]
+
+        # Reloaded nodes must also reload their unchanged connections
+        for node in refolded_nodes:
+            for pin in chain(node.inputs.values(), node.outputs.values()):
+                for connection in pin.connections:
+                    if connection in connection_to_lifecycle:
+                        continue
+
+                    unloaded_connections.append(connection)
+                    loaded_connections.append(connection)
+                    connection_to_lifecycle[connection] = [False, True]
+                    self._reordered_pins[connection.output_pin] = None
+
+        # Load connections in pin order, so that only pins with existing connections need to be reordered
+        pin_to_connection_indices = {}
+
+        def get_connection_index(connection):
+            output_pin = connection.output_pin
+
+            try:
+                connection_indices = pin_to_connection_indices[output_pin]
+
+            except KeyError:
+                connection_indices = pin_to_connection_indices[output_pin] = {c: i for i, c in
+                                                                              enumerate(output_pin.connections)}
+            return connection_indices[connection]
+
+        loaded_connections.sort(key=get_connection_index)
+        loaded_connection_set = set(loaded_connections)
+
+        if unloaded_nodes or unloaded_connections:
+            node_manager.on_graph_unloaded(unloaded_nodes, unloaded_connections)
+
+        if loaded_nodes or loaded_connections:
+            node_manager.on_graph_loaded(loaded_nodes, loaded_connections)
+
+        for pin in self._reordered_pins:
+            if not is_alive(pin.node, node_to_lifecycle):
+                continue
+
+            if all(c in loaded_connection_set for c in pin.connections):
+                continue
+
+            for index, connection in enumerate(pin.connections):
+                node_manager.on_connection_reordered(connection, index)
+
+        for node in self._moved_nodes:
+            if node not in loaded_node_set and is_alive(node, node_to_lifecycle):
+                node_manager.on_node_moved(node, node.position)
+
+        for node in self._renamed_nodes:
+            if node not in loaded_node_set and is_alive(node, node_to_lifecycle):
+                node_manager.on_node_renamed(node, node.name)
+
+
 class NodeManager(object):
 
     on_node_created = Observable()
@@ -81,12 +418,20 @@ class NodeManager(object):
     on_pin_folded = Observable()
     on_pin_unfolded = Observable()
 
+    on_graph_loaded = Observable()
+    on_graph_unloaded = Observable()
+
     def __init__(self, history, logger=None):
         if history is None:
             history = CommandLogManager()
 
         self.history = history
 
+        # Model events are delivered once the outermost history transaction finishes
+        self._event_batch = None
+        history.on_transaction_started.subscribe(self._begin_event_batch)
+        history.on_transaction_finished.subscribe(self._end_event_batch)
+
         self._bee_node_factory = BeeNodeFactory()
         self._hive_node_factory = HiveNodeFactory()
 
@@ -96,6 +441,12 @@ class NodeManager(object):
         self.docstring = ""
         self.nodes = {}
 
+        # Nodes of the loaded hivemap which have not yet been hydrated
+        self._dormant_graph = None
+
+        # Secondary index of reference path to {name: node} for fast lookup by node type
+        self._reference_path_to_nodes = {}
+
         if logger is None:
             logger = logging.getLogger(repr(self))
             handler = logging.StreamHandler()
@@ -106,43 +457,142 @@ class NodeManager(object):
 
         self._logger = logger
 
+    def _begin_event_batch(self):
+        self._event_batch = _EventBatch()
+
+    def _end_event_batch(self):
+        event_batch, self._event_batch = self._event_batch, None
+        event_batch.flush(self)
+
+    def _notify(self, event_name, *args):
+        """Notify observers of a model event, or queue it if a history transaction is in progress
+
+        :param event_name: name of event observable, without the 'on_' prefix
+        """
+        if self._event_batch is not None:
+            getattr(self._event_batch, event_name)(*args)
+
+        else:
+            getattr(self, "on_{}".format(event_name))(*args)
+
+    def _get_used_names(self):
+        """Return mapping whose keys are the names of all nodes, including dormant nodes"""
+        if self._dormant_graph is None:
+            return self.nodes
+
+        return ChainMap(self.nodes, self._dormant_graph.name_to_record)
+
     def _unique_name_from_reference_path(self, reference_path):
         obj_name = reference_path.split(".")[-1]
         identifier = camelcase_to_underscores(obj_name)
         identifier = _sanitise_node_name(identifier)
-        return _get_unique_name(self.nodes, identifier)
+        return _get_unique_name(self._get_used_names(), identifier)
+
+    @property
+    def dormant_names(self):
+        """Return view of the names of dormant nodes"""
+        if self._dormant_graph is None:
+            return {}.keys()
+
+        return self._dormant_graph.name_to_record.keys()
+
+    def get_bounding_box(self):
+        """Return (x, y, width, height) of the positions of all nodes, including dormant nodes, or None if there are no
+        nodes
+        """
+        positions = [node.position for node in self.nodes.values()]
+
+        if self._dormant_graph is not None:
+            positions.extend((r.position.x, r.position.y) for r in self._dormant_graph.name_to_record.values())
+
+        if not positions:
+            return None
+
+        x_positions, y_positions = zip(*positions)
+        min_x, min_y = min(x_positions), min(y_positions)
+        return min_x, min_y, max(x_positions) - min_x, max(y_positions) - min_y
 
     def find_by_reference_path(self, reference_path):
-        """Return dict of nodes with the given reference path
+        """Return dict of nodes with the given reference path, keyed by name
+
+        :param reference_path: reference path of node
+        """
+        return dict(self._reference_path_to_nodes.get(reference_path, ()))
+
+    def count_by_reference_path(self, reference_path):
+        """Return number of nodes with the given reference path
 
         :param reference_path: reference path of node
         """
-        return {name: node for name, node in self.nodes.items() if node.reference_path == reference_path}
+        return len(self._reference_path_to_nodes.get(reference_path, ()))
+
+    @property
+    def reference_paths(self):
+        """Return view of the reference paths of all nodes"""
+        return self._reference_path_to_nodes.keys()
+
+    def _index_node(self, node):
+        """Add node to the reference path index
+
+        :param node: node to index
+        """
+        try:
+            named_nodes = self._reference_path_to_nodes[node.reference_path]
+
+        except KeyError:
+            named_nodes = self._reference_path_to_nodes[node.reference_path] = {}
+
+        named_nodes[node.name] = node
+
+    def _unindex_node(self, node):
+        """Remove node from the reference path index
+
+        :param node: node to remove
+        """
+        reference_path = node.reference_path
+        named_nodes = self._reference_path_to_nodes[reference_path]
+        del named_nodes[node.name]
+
+        if not named_nodes:
+            del self._reference_path_to_nodes[reference_path]
 
-    def _add_connection(self, connection):
+    def _add_connection(self, connection, index=None):
         """Connect connection and push to history.
 
         :param connection: connection to connect
+        :param index: optional index of the connection in the connections of its output pin, otherwise it is appended
         """
         connection.connect()
 
         # Ask GUI to perform connection
-        self.on_connection_created(connection)
+        self._notify("connection_created", connection)
 
         output_pin = connection.output_pin
         input_pin = connection.input_pin
 
+        if index is None:
+            index = len(output_pin.connections) - 1
+
+        else:
+            output_pin.reorder_target(connection, index)
+            self._notify("connection_reordered", connection, index)
+
         self._logger.info("Created connection between {}.{} and {}.{}"
                           .format(output_pin.node, output_pin.name, input_pin.node, input_pin.name))
-        self.history.record_command(lambda: self._add_connection(connection),
-                                    lambda: self.delete_connection(connection))
 
-    def create_connection(self, output_pin, input_pin):
+        key = _get_connection_key(connection)
+        self.history.record_delta(self._connect_by_key, (key, index), self._disconnect_by_key, (key,))
+
+    def create_connection(self, output_pin, input_pin, index=None):
         """Create connection between two pins.
 
         :param output_pin: output pin from which the connection originates
         :param input_pin: input pin at which the connection is completed
+        :param index: optional index of the connection in the connections of the output pin, otherwise it is appended
         """
+        self._hydrate_neighbours(output_pin.node)
+        self._hydrate_neighbours(input_pin.node)
+
         # Check pin isn't folded
         if input_pin.is_folded:
             raise NodeConnectionError("Cannot connect to a folded pin")
@@ -156,22 +606,28 @@ class NodeManager(object):
         connection = Connection(output_pin, input_pin, is_trigger=(result == ConnectionType.TRIGGER))
 
         # Must call connection.connect()
-        self._add_connection(connection)
+        self._add_connection(connection, index)
 
     def delete_connection(self, connection):
         """Delete connection and write to history.
 
         :param connection: connection object
         """
+        self._hydrate_neighbours(connection.output_pin.node)
+        self._hydrate_neighbours(connection.input_pin.node)
+
+        # Restore connection to its original place
+        index = connection.output_pin.connections.index(connection)
+
         # Ask GUI to perform connection
-        self.on_connection_destroyed(connection)
+        self._notify("connection_destroyed", connection)
 
         connection.delete()
 
         self._logger.info("Deleted Connection: {}".format(connection))
 
-        self.history.record_command(lambda: self.delete_connection(connection),
-                                    lambda: self._add_connection(connection))
+        key = _get_connection_key(connection)
+        self.history.record_delta(self._disconnect_by_key, (key,), self._connect_by_key, (key, index))
 
     def delete_connections(self, connections):
         """Remove multiple connections from the model (as a composite operation)
@@ -189,15 +645,18 @@ class NodeManager(object):
         :param index: new connection index
         """
         output_pin = connection.output_pin
+        self._hydrate_neighbours(output_pin.node)
+
         old_index = output_pin.connections.index(connection)
 
         output_pin.reorder_target(connection, index)
 
         # Ask GUI to reorder connection
-        self.on_connection_reordered(connection, index)
+        self._notify("connection_reordered", connection, index)
 
-        self.history.record_command(lambda: self.reorder_connection(connection, index),
-                                    lambda: self.reorder_connection(connection, old_index))
+        key = _get_connection_key(connection)
+        self.history.record_delta(self._reorder_connection_by_key, (key, index),
+                                  self._reorder_connection_by_key, (key, old_index))
 
     def get_inspector_for(self, node_type):
         if node_type == NodeTypes.HIVE:
@@ -214,16 +673,18 @@ class NodeManager(object):
         :param node: node to add
         """
         self.nodes[node.name] = node
+        self._index_node(node)
 
-        self.on_node_created(node)
+        self._notify("node_created", node)
 
         for pin in node.inputs.values():
             assert not pin.is_folded, (pin.name, pin.node)
 
         # Ensure node restored to original place
-        self.on_node_moved(node, node.position)
+        self._notify("node_moved", node, node.position)
 
-        self.history.record_command(lambda: self._add_node(node), lambda: self.delete_node(node))
+        self.history.record_delta(self._add_node_from_data, (self._node_to_data(node),), self._delete_node_by_name,
+                                  (node.name,))
 
     def create_node(self, node_type, reference_path, params=None):
         print("CREATE", reference_path)
@@ -241,8 +702,7 @@ class NodeManager(object):
             params = {}
 
         name = self._unique_name_from_reference_path(reference_path)
-        param_info = self._bee_node_inspector.inspect_configured(reference_path, params)
-        node = self._bee_node_factory.new(name, reference_path, params, param_info)
+        node = self._new_bee(name, reference_path, params)
 
         self._add_node(node)
         return node
@@ -254,7 +714,18 @@ class NodeManager(object):
             params = {}
 
         name = self._unique_name_from_reference_path(reference_path)
+        node = self._new_hive(name, reference_path, params)
+
+        self._add_node(node)
+        return node
+
+    def _new_bee(self, name, reference_path, params):
+        """Instantiate a bee node without adding it to the model"""
+        param_info = self._bee_node_inspector.inspect_configured(reference_path, params)
+        return self._bee_node_factory.new(name, reference_path, params, param_info)
 
+    def _new_hive(self, name, reference_path, params):
+        """Instantiate a hive node without adding it to the model"""
         try:
             param_info = self._hive_node_inspector.inspect_configured(reference_path, params)
 
@@ -263,15 +734,12 @@ class NodeManager(object):
             raise
 
         try:
-            node = self._hive_node_factory.new(name, reference_path, params, param_info)
+            return self._hive_node_factory.new(name, reference_path, params, param_info)
 
         except Exception:
             self._logger.error("Failed to instantiate '{}'".format(reference_path))
             raise
 
-        self._add_node(node)
-        return node
-
     def delete_node(self, node):
         """Remove node and its connections from the model
 
@@ -283,6 +751,8 @@ class NodeManager(object):
         if node.is_folded:
             raise RuntimeError("Can't delete folded nodes")
 
+        self._hydrate_neighbours(node)
+
         # Remove connections
         for input_pin in node.inputs.values():
             is_folded = input_pin.is_folded
@@ -302,11 +772,13 @@ class NodeManager(object):
         for output_pin in node.outputs.values():
             self.delete_connections(list(output_pin.connections))
 
+        self._unindex_node(node)
         self.nodes.pop(node.name)
 
-        self.on_node_destroyed(node)
+        self._notify("node_destroyed", node)
 
-        self.history.record_command(lambda: self.delete_node(node), lambda: self._add_node(node))
+        self.history.record_delta(self._delete_node_by_name, (node.name,), self._add_node_from_data,
+                                  (self._node_to_data(node),))
 
     def delete_nodes(self, nodes):
         """Remove multiple nodes and their connections from the model (as a composite operation)
@@ -322,21 +794,17 @@ class NodeManager(object):
                     continue
 
     def delete_all_nodes(self):
-        nodes_to_delete = set(self.nodes.values())
-
-        # Ignore folded nodes (handled)
-        for node in self.nodes.values():
-            for pin in node.inputs.values():
-                if pin.is_folded:
-                    target_connection = next(iter(pin.connections))
-                    target_pin = target_connection.output_pin
-                    folded_node = target_pin.node
+        """Remove all nodes (including dormant nodes) and their connections from the model, as one command.
 
-                    nodes_to_delete.remove(folded_node)
-
-        self.delete_nodes(nodes_to_delete)
+        The model is removed as one graph, rather than node by node, so that it is restored in one step from its data
+        (see _add_graph_from_data)
+        """
+        if self.nodes or self._dormant_graph is not None:
+            self._remove_graph(list(self.nodes.values()), self._dormant_graph)
 
     def morph_node(self, node, params):
+        self._hydrate_neighbours(node)
+
         with self.history.command_context("morph-node"):
             # Record the connected target pins for each IO pin by name
             input_name_to_pins = {n: [c.output_pin for c in p.connections] for n, p in node.inputs.items()}
@@ -425,8 +893,9 @@ class NodeManager(object):
         original_value = params_dict[name]
         params_dict[name] = value
 
-        self.history.record_command(lambda: self.set_param_value(node, param_type, name, value),
-                                    lambda: self.set_param_value(node, param_type, name, original_value))
+        self.history.record_delta(self._set_param_value_by_name, (node.name, param_type, name, value),
+                                  self._set_param_value_by_name, (node.name, param_type, name, original_value),
+                                  merge_key=("set-param", node.name, param_type, name))
 
     def rename_node(self, node, name, attempt_till_success=False):
         """Rename node with a new identifier
@@ -435,10 +904,12 @@ class NodeManager(object):
         :param name: new name of node
         :param attempt_till_success: if name is not available, find a valid name based upon it
         """
-        if self.nodes.get(name, node) is not node:
+        self._hydrate_neighbours(node)
+
+        if self.nodes.get(name, node) is not node or name in self.dormant_names:
             # Try till we succeed
             if attempt_till_success:
-                name = _get_unique_name(self.nodes, name)
+                name = _get_unique_name(self._get_used_names(), name)
 
             else:
                 raise ValueError("Can't rename {} to {}".format(node, name))
@@ -448,6 +919,7 @@ class NodeManager(object):
         # Change key
         old_name = node.name
 
+        self._unindex_node(node)
         self.nodes.pop(old_name)
         self.nodes[name] = node
 
@@ -455,10 +927,12 @@ class NodeManager(object):
         with node.make_writable():
             node.name = name
 
-        self.on_node_renamed(node, name)
+        self._index_node(node)
 
-        self.history.record_command(lambda: self.rename_node(node, name),
-                                    lambda: self.rename_node(node, old_name))
+        self._notify("node_renamed", node, name)
+
+        self.history.record_delta(self._rename_node_by_name, (old_name, name),
+                                  self._rename_node_by_name, (name, old_name))
 
     def reposition_node(self, node, position):
         """Re-position node in the model
@@ -466,28 +940,40 @@ class NodeManager(object):
         :param node: Node object
         :param position: new x, y position
         """
-        old_position = node.position
-
-        with node.make_writable():
-            node.position = position
+        self._hydrate_neighbours(node)
 
         # Move folded nodes too
-        dx = position[0] - old_position[0]
-        dy = position[1] - old_position[1]
+        dx = position[0] - node.position[0]
+        dy = position[1] - node.position[1]
 
-        for pin in node.inputs.values():
-            if pin.is_folded:
-                target_connection = next(iter(pin.connections))
-                target_pin = target_connection.output_pin
-                other_node = target_pin.node
+        folded_nodes = [next(iter(pin.connections)).output_pin.node for pin in node.inputs.values() if pin.is_folded]
+
+        if not folded_nodes:
+            self._move_node(node, position)
+            return
+
+        with self.history.command_context("reposition"):
+            for other_node in folded_nodes:
+                self.reposition_node(other_node, (other_node.position[0] + dx, other_node.position[1] + dy))
 
-                new_position = other_node.position[0] + dx, other_node.position[1] + dy
-                self.reposition_node(other_node, new_position)
+            self._move_node(node, position)
 
-        self.on_node_moved(node, position)
+    def _move_node(self, node, position):
+        """Re-position node without moving its folded nodes, and write to history
 
-        self.history.record_command(lambda: self.reposition_node(node, position),
-                                    lambda: self.reposition_node(node, old_position))
+        :param node: Node object
+        :param position: new x, y position
+        """
+        old_position = node.position
+
+        with node.make_writable():
+            node.position = position
+
+        self._notify("node_moved", node, position)
+
+        self.history.record_delta(self._reposition_node_by_name, (node.name, position),
+                                  self._reposition_node_by_name, (node.name, old_position),
+                                  merge_key=("reposition", node.name))
 
     def reposition_nodes(self, node_to_position):
         """Re-position multiple nodes in the model (as a composite operation)
@@ -504,6 +990,7 @@ class NodeManager(object):
         :param pin: IOPin object
         """
         assert pin.is_foldable
+        self._hydrate_neighbours(pin.node)
 
         # Create variable
         if not pin.connections:
@@ -522,9 +1009,10 @@ class NodeManager(object):
         with pin.make_writable():
             pin.is_folded = True
 
-        self.on_pin_folded(pin)
+        self._notify("pin_folded", pin)
 
-        self.history.record_command(lambda: self.fold_pin(pin), lambda: self.unfold_pin(pin))
+        pin_key = pin.node.name, pin.name
+        self.history.record_delta(self._fold_pin_by_name, pin_key, self._unfold_pin_by_name, pin_key)
 
     def unfold_pin(self, pin):
         """Expose pin to node UI, as well as possible connected variable. If no variable, create, connect and show.
@@ -533,134 +1021,717 @@ class NodeManager(object):
         """
         assert pin.is_folded
         assert pin.connections
+        self._hydrate_neighbours(pin.node)
 
         # Set input pin as folded
         with pin.make_writable():
             pin.is_folded = False
 
-        self.on_pin_unfolded(pin)
+        self._notify("pin_unfolded", pin)
 
-        self.history.record_command(lambda: self.unfold_pin(pin), lambda: self.fold_pin(pin))
+        pin_key = pin.node.name, pin.name
+        self.history.record_delta(self._unfold_pin_by_name, pin_key, self._fold_pin_by_name, pin_key)
 
-    def to_string(self):
-        hivemap = self.to_hivemap()
-        return str(hivemap)
+    def _get_node(self, name):
+        """Return node with the given name, hydrating it if it is dormant
 
-    def load_string(self, data):
-        # Validate type
-        if not isinstance(data, str):
-            raise TypeError("Loaded data should be a string type, not {}".format(type(data)))
+        :param name: name of node
+        """
+        try:
+            return self.nodes[name]
 
-        # Read hivemap
-        hivemap = model.Hivemap(data)
-        self.load_hivemap(hivemap)
+        except KeyError:
+            self.hydrate_nodes([name])
+            return self.nodes[name]
 
-    def to_hivemap(self):
-        return self._export_to_hivemap(docstring=self.docstring)
+    def _find_connection(self, key):
+        """Return connection with the given key, hydrating its nodes if they are dormant
 
-    def load_hivemap(self, hivemap):
-        with self.history.command_context("load"):
-            # Clear nodes first
-            self.delete_all_nodes()
-            data = self._import_from_hivemap(hivemap)
-            self.docstring = data['docstring']
+        :param key: (source node name, output name, target node name, input name) tuple
+        """
+        from_name, output_name, to_name, input_name = key
+        from_node = self._get_node(from_name)
+        self._hydrate_neighbours(from_node)
 
-    def cut(self, nodes):
-        """Cut nodes to clipboard
+        return next(c for c in from_node.outputs[output_name].connections
+                    if c.input_pin.name == input_name and c.input_pin.node.name == to_name)
 
-        :param nodes: nodes to cut
-        """
-        with self.history.command_context("cut"):
-            clipboard = self.copy(nodes)
+    # History callbacks, which refer to nodes by name so that commands stay compact, and remain valid for nodes which
+    # are rebuilt (see _add_node_from_data)
+    def _connect_by_key(self, key, index):
+        from_name, output_name, to_name, input_name = key
+        self.create_connection(self._get_node(from_name).outputs[output_name],
+                               self._get_node(to_name).inputs[input_name], index)
 
-            # Delete nodes
-            self.delete_nodes(nodes)
+    def _disconnect_by_key(self, key):
+        self.delete_connection(self._find_connection(key))
 
-        return clipboard
+    def _reorder_connection_by_key(self, key, index):
+        self.reorder_connection(self._find_connection(key), index)
 
-    def copy(self, nodes):
-        """Copy nodes to clipboard
+    def _delete_node_by_name(self, name):
+        self.delete_node(self._get_node(name))
 
-        :param nodes: nodes to copy
-        """
-        with_folded_nodes = set(nodes)
+    def _add_node_from_data(self, node_data):
+        self._add_node(self._build_node_from_data(node_data))
 
-        # Find nodes that are internally folded
-        for node in nodes:
-            for pin in node.inputs.values():
-                if pin.is_folded:
-                    target_connection = next(iter(pin.connections))
-                    target_pin = target_connection.output_pin
-                    target_node = target_pin.node
-                    with_folded_nodes.add(target_node)
+    def _add_graph_from_data(self, graph_data):
+        nodes = [self._build_node_from_data(node_data) for node_data in graph_data.nodes]
+        name_to_node = {node.name: node for node in nodes}
 
-        return self._export_to_hivemap(with_folded_nodes)
+        dormant_data = graph_data.dormant_graph
+        dormant_graph = None if dormant_data is None else self._dormant_graph_from_data(dormant_data, name_to_node)
 
-    def paste(self, clipboard, position):
-        """Paste nodes from clipboard
+        # Connections to the graph from other nodes are restored with it
+        connections = []
+        for index, key in enumerate(graph_data.connections):
+            connection = self._connect_by_name(ChainMap(name_to_node, self.nodes), *key)
 
-        :param position: position of target center of mass of nodes
-        """
-        with self.history.command_context("paste"):
-            data = self._import_from_hivemap(clipboard)
-            node_map = data['nodes']
+            if connection is None:
+                continue
 
-            if not node_map:
-                return
+            connections.append(connection)
 
-            names, nodes = zip(*node_map.items())
+            if dormant_graph is not None:
+                dormant_graph.add_connection(connection, dormant_data.sequences[index])
 
-            # Find midpoint
-            average_x = 0.0
-            average_y = 0.0
+        # Pins are folded once they are connected
+        for node_name, pin_name in graph_data.folded_pins:
+            pin = name_to_node[node_name].inputs[pin_name]
 
-            for node in nodes:
-                average_x += node.position[0]
-                average_y += node.position[1]
+            with pin.make_writable():
+                pin.is_folded = True
 
-            average_x /= len(nodes)
-            average_y /= len(nodes)
+        self._insert_graph(nodes, connections, dormant_graph)
 
-            # Displacement to the center
-            offset_x = position[0] - average_x
-            offset_y = position[1] - average_y
+    @staticmethod
+    def _dormant_graph_from_data(dormant_data, name_to_node):
+        """Create dormant graph described by DormantGraphData
 
-            # Move nodes to mouse position
-            for node in nodes:
-                position = node.position[0] + offset_x, node.position[1] + offset_y
-                self.reposition_node(node, position)
+        :param dormant_data: DormantGraphData instance
+        :param name_to_node: mapping of name to node for the hydrated nodes of the graph
+        """
+        graph = _DormantGraph()
 
-    def _export_to_hivemap(self, nodes=None, docstring=""):
-        if nodes is None:
-            nodes = self.nodes.values()
+        for name, record in dormant_data.records:
+            graph.add_node(name, record)
 
-        hivemap = model.Hivemap()
-        hivemap.docstring = docstring
+        for connection in dormant_data.connections:
+            graph.add_dormant_connection(connection)
 
-        for node in nodes:
-            # Create parameter groups
-            parameter_groups = parameter_group_dict_to_array(node.params)
-            folded_pins = [pin_name for pin_name, pin in node.inputs.items() if pin.is_folded]
+            # Hydrated nodes with dormant connections are tracked by position
+            for name in (connection.from_node, connection.to_node):
+                if name not in graph.name_to_record and name not in graph.tracked_names and name in name_to_node:
+                    graph.track(name, name_to_node[name].position)
 
-            # Serialise HiveNode instance
-            if node.node_type == NodeTypes.HIVE:
-                family = "HIVE"
+        return graph
 
-            else:
-                assert node.node_type == NodeTypes.BEE
-                family = "BEE"
+    def _remove_graph_by_names(self, names, with_dormant_graph=False):
+        # Dormant graphs are only loaded as the whole model (see load_hivemap), so they are removed with all nodes,
+        # including those hydrated since
+        if with_dormant_graph:
+            self._remove_graph(list(self.nodes.values()), self._dormant_graph)
 
-            spyder_node = model.Node(identifier=node.name, family=family, reference_path=node.reference_path,
-                                     position=node.position, parameter_groups=parameter_groups,
-                                     folded_pins=folded_pins)
+        else:
+            self._remove_graph([self.nodes[name] for name in names])
 
-            hivemap.nodes.append(spyder_node)
+    # Record types of the arguments of data callbacks, which may be serialised (see hivemap_io.dump_literal)
+    delta_record_types = (NodeData, GraphData, DormantGraphData, DormantConnection, NodeRecord, ParameterGroupRecord,
+                          ParameterRecord, Position)
+
+    # History callbacks whose arguments are data, so that their commands are compact and may be serialised
+    _data_callback_names = frozenset(("_connect_by_key", "_disconnect_by_key", "_reorder_connection_by_key",
+                                      "_delete_node_by_name", "_add_node_from_data", "_add_graph_from_data",
+                                      "_remove_graph_by_names", "_set_param_value_by_name", "_rename_node_by_name",
+                                      "_reposition_node_by_name", "_fold_pin_by_name", "_unfold_pin_by_name"))
+
+    def _build_node_from_data(self, node_data):
+        """Instantiate and position a node described by NodeData, without adding it to the model
+
+        :param node_data: NodeData instance
+        """
+        params = {group: dict(values) for group, values in node_data.params.items()}
+
+        if node_data.node_type == NodeTypes.HIVE:
+            node = self._new_hive(node_data.name, node_data.reference_path, params)
+
+        else:
+            node = self._new_bee(node_data.name, node_data.reference_path, params)
+
+        with node.make_writable():
+            node.position = node_data.position
+
+        return node
+
+    @staticmethod
+    def _node_to_data(node):
+        params = {group: dict(values) for group, values in node.params.items()}
+        return NodeData(node.name, node.node_type, node.reference_path, params, tuple(node.position))
+
+    @staticmethod
+    def _get_graph_connections(nodes):
+        """Return list of the connections of a graph of nodes, in the order of their output pins, followed by the
+        connections to the graph from other nodes
+
+        :param nodes: nodes of graph
+        """
+        connections = [c for node in nodes for pin in node.outputs.values() for c in pin.connections]
+        connection_set = set(connections)
+
+        for node in nodes:
+            for pin in node.inputs.values():
+                for connection in pin.connections:
+                    if connection not in connection_set:
+                        connection_set.add(connection)
+                        connections.append(connection)
+
+        return connections
+
+    def _graph_to_data(self, nodes, connections, dormant_graph=None):
+        """Return GraphData which describes a graph of nodes
+
+        :param nodes: nodes of graph
+        :param connections: connections of graph, as returned by _get_graph_connections
+        :param dormant_graph: optional dormant part of the graph
+        """
+        folded_pins = [(node.name, pin_name) for node in nodes for pin_name, pin in node.inputs.items()
+                       if pin.is_folded]
+
+        dormant_data = None
+        if dormant_graph is not None:
+            dormant_data = DormantGraphData(list(dormant_graph.name_to_record.items()),
+                                            dormant_graph.get_dormant_connections(),
+                                            [dormant_graph.get_sequence(c) for c in connections])
+
+        return GraphData([self._node_to_data(node) for node in nodes],
+                         [_get_connection_key(connection) for connection in connections], folded_pins, dormant_data)
+
+    def _encode_callback(self, callback, args):
+        """Return (name, arguments) of a history callback whose arguments are data, or None if it is not one
+
+        :param callback: history callback
+        :param args: tuple of arguments of callback
+        """
+        if getattr(callback, "__self__", None) is not self:
+            return None
+
+        name = callback.__name__
+
+        if name not in self._data_callback_names:
+            return None
+
+        return name, args
+
+    def encode_delta(self, execute, execute_args, un_execute, un_execute_args):
+        """Return (execute name, execute arguments, un-execute name, un-execute arguments) data which describes a
+        delta command recorded by this node manager, or None if it cannot be described by data.
+
+        The data refers to nodes by name, and its callbacks are found with get_delta_callback. It must be encoded when
+        the command is recorded, as the nodes may change afterwards (see CommandLogManager.delta_encoder)
+
+        :param execute: execution callback
+        :param execute_args: tuple of arguments of execution callback
+        :param un_execute: un-execution callback
+        :param un_execute_args: tuple of arguments of un-execution callback
+        """
+        execute_data = self._encode_callback(execute, execute_args)
+        un_execute_data = self._encode_callback(un_execute, un_execute_args)
+
+        if execute_data is None or un_execute_data is None:
+            return None
+
+        return execute_data + un_execute_data
+
+    def get_delta_callback(self, name):
+        """Return history callback of the given name, from data returned by encode_delta
+
+        :param name: name of callback
+        """
+        if name not in self._data_callback_names:
+            raise ValueError("Unknown history callback '{}'".format(name))
+
+        return getattr(self, name)
+
+    def _set_param_value_by_name(self, node_name, param_type, name, value):
+        self.set_param_value(self._get_node(node_name), param_type, name, value)
+
+    def _rename_node_by_name(self, node_name, name):
+        self.rename_node(self._get_node(node_name), name)
+
+    def _reposition_node_by_name(self, node_name, position):
+        # Folded nodes are moved by their own commands
+        self._move_node(self._get_node(node_name), position)
+
+    def _fold_pin_by_name(self, node_name, pin_name):
+        self.fold_pin(self._get_node(node_name).inputs[pin_name])
+
+    def _unfold_pin_by_name(self, node_name, pin_name):
+        self.unfold_pin(self._get_node(node_name).inputs[pin_name])
+
+    def to_string(self):
+        hivemap = self.to_hivemap()
+        return str(hivemap)
+
+    def load_string(self, data):
+        # Validate type
+        if not isinstance(data, str):
+            raise TypeError("Loaded data should be a string type, not {}".format(type(data)))
+
+        # Read hivemap
+        hivemap = model.Hivemap(data)
+        self.load_hivemap(hivemap)
+
+    def to_hivemap(self):
+        return self._export_to_hivemap(docstring=self.docstring)
+
+    def load_hivemap(self, hivemap, is_dormant=None):
+        """Replace all nodes with those of a hivemap
+
+        :param hivemap: Hivemap or HivemapRecords instance
+        :param is_dormant: optional predicate of a hivemap node, if True the node is kept as a record until it is
+        hydrated (see hydrate_nodes)
+        """
+        with self.history.command_context("load"):
+            # Clear nodes first
+            self.delete_all_nodes()
+            data = self._import_from_hivemap(hivemap, is_dormant=is_dormant)
+            self.docstring = data['docstring']
+
+    def patch_hivemap(self, hivemap):
+        """Update the model to match a hivemap, using the fewest node and connection operations, as one command.
+
+        Nodes are matched by name, and are only re-created if their type or parameters (other than args) change.
+        Dormant nodes are compared by their records, and are only hydrated if they are changed.
+        Return dictionary of operation counts
+
+        :param hivemap: Hivemap or HivemapRecords instance
+        """
+        nodes = self.nodes
+        name_to_spyder_node = {n.identifier: n for n in hivemap.nodes}
+
+        target_connections = []
+        for spyder_connection in hivemap.connections:
+            key = (spyder_connection.from_node, spyder_connection.output_name, spyder_connection.to_node,
+                   spyder_connection.input_name)
+
+            if key[0] in name_to_spyder_node and key[2] in name_to_spyder_node:
+                target_connections.append(key)
+
+            else:
+                self._logger.error("Unable to find all nodes in connection: {}, {}".format(key[0], key[2]))
+
+        target_connection_set = set(target_connections)
+        target_folded_pins = {(n, p) for n, s in name_to_spyder_node.items() for p in s.folded_pins}
+
+        # Dormant nodes which remain dormant are unchanged, as are their connections
+        self.hydrate_nodes(self._find_patched_dormant_names(name_to_spyder_node, target_connections))
+        dormant_names = self.dormant_names
+
+        # Find nodes to remove (or re-create), and argument changes
+        removed_names = set()
+        argument_changes = []
+
+        for name, node in nodes.items():
+            spyder_node = name_to_spyder_node.get(name)
+
+            if spyder_node is None or spyder_node.reference_path != node.reference_path or \
+                    spyder_node.family != ("HIVE" if node.node_type == NodeTypes.HIVE else "BEE"):
+                removed_names.add(name)
+                continue
+
+            params = parameter_group_array_to_dict(spyder_node.parameter_groups)
+            current_params = {k: dict(v) for k, v in node.params.items()}
+
+            if params == current_params:
+                continue
+
+            # Only args can be changed in place
+            current_args = current_params.pop("args", {})
+            args = params.pop("args", {})
+
+            if params != current_params or args.keys() != current_args.keys():
+                removed_names.add(name)
+                continue
+
+            argument_changes.extend((node, k, v) for k, v in args.items() if current_args[k] != v)
+
+        added_names = [n for n in name_to_spyder_node
+                       if (n not in nodes and n not in dormant_names) or n in removed_names]
+
+        counts = dict(added=0, removed=len(removed_names), connected=0, disconnected=0, changed=0)
+
+        with self.history.command_context("patch"):
+            # Unfold pins whose folded variable is changed, so that it may be edited
+            for name, node in nodes.items():
+                for pin_name, pin in node.inputs.items():
+                    if not pin.is_folded:
+                        continue
+
+                    connection = next(iter(pin.connections))
+                    source_name = connection.output_pin.node.name
+
+                    if name in removed_names or source_name in removed_names or \
+                            (name, pin_name) not in target_folded_pins or \
+                            _get_connection_key(connection) not in target_connection_set:
+                        self.unfold_pin(pin)
+
+            # Delete connections
+            for node in list(nodes.values()):
+                for pin in node.outputs.values():
+                    for connection in list(pin.connections):
+                        key = _get_connection_key(connection)
+
+                        if key not in target_connection_set or key[0] in removed_names or key[2] in removed_names:
+                            self.delete_connection(connection)
+                            counts['disconnected'] += 1
+
+            # Delete nodes
+            for name in removed_names:
+                self.delete_node(nodes[name])
+
+            # Create nodes
+            for name in added_names:
+                try:
+                    _validate_node_name(name)
+
+                except ValueError:
+                    self._logger.exception("Invalid node name {}".format(name))
+                    continue
+
+                node = self._build_node(name, name_to_spyder_node[name])
+                if node is None:
+                    continue
+
+                self._add_node(node)
+                counts['added'] += 1
+
+            # Change arguments
+            for node, name, value in argument_changes:
+                self.set_param_value(node, "args", name, value)
+                counts['changed'] += 1
+
+            # Create connections
+            existing_connections = {_get_connection_key(c): c for n in nodes.values() for p in n.outputs.values()
+                                    for c in p.connections}
+            output_to_keys = {}
+
+            for key in target_connections:
+                if key[0] in dormant_names or key[2] in dormant_names:
+                    continue
+
+                output_to_keys.setdefault(key[:2], []).append(key)
+
+                if key in existing_connections:
+                    continue
+
+                from_name, output_name, to_name, input_name = key
+
+                try:
+                    output_pin = nodes[from_name].outputs[output_name]
+                    input_pin = nodes[to_name].inputs[input_name]
+
+                except KeyError:
+                    self._logger.error("Unable to find all node pins in connection: {}.{}, {}.{}".format(*key))
+                    continue
+
+                try:
+                    self.create_connection(output_pin, input_pin)
+
+                except NodeConnectionError:
+                    self._logger.exception("Unable to create connection between {}.{}, {}.{}".format(*key))
+                    continue
+
+                counts['connected'] += 1
+
+            # Restore connection order
+            for (from_name, output_name), keys in output_to_keys.items():
+                try:
+                    output_pin = nodes[from_name].outputs[output_name]
+
+                except KeyError:
+                    continue
+
+                key_to_connection = {_get_connection_key(c): c for c in output_pin.connections}
+                ordered_connections = [key_to_connection[k] for k in keys if k in key_to_connection]
+
+                for index, connection in enumerate(ordered_connections):
+                    if output_pin.connections.index(connection) != index:
+                        self.reorder_connection(connection, index)
+
+            # Fold pins
+            for name, pin_name in target_folded_pins:
+                if name in dormant_names:
+                    continue
+
+                try:
+                    pin = nodes[name].inputs[pin_name]
+
+                except KeyError:
+                    self._logger.error("Couldn't find pin {}.{} to fold".format(name, pin_name))
+                    continue
+
+                if pin.is_folded:
+                    continue
+
+                if not pin.is_foldable:
+                    self._logger.error("Couldn't fold pin {}.{}".format(name, pin_name))
+                    continue
+
+                self.fold_pin(pin)
+
+            # Move nodes, before the variables folded by them
+            for node in sorted(nodes.values(), key=attrgetter("is_folded")):
+                spyder_node = name_to_spyder_node.get(node.name)
+                if spyder_node is None:
+                    continue
+
+                position = (spyder_node.position.x, spyder_node.position.y)
+                if tuple(node.position) != position:
+                    self.reposition_node(node, position)
+
+        self.docstring = hivemap.docstring
+
+        self._logger.info("Patched hivemap: {added} nodes added, {removed} removed, {changed} arguments changed, "
+                          "{connected} connections created, {disconnected} deleted".format(**counts))
+        return counts
+
+    def _find_patched_dormant_names(self, name_to_spyder_node, target_connections):
+        """Return set of names of the dormant nodes which differ from their hivemap nodes, or which are connected to
+        output pins whose connections are created, deleted or reordered
+
+        :param name_to_spyder_node: mapping of name to hivemap node
+        :param target_connections: connection keys of hivemap, in hivemap order
+        """
+        graph = self._dormant_graph
+        if graph is None:
+            return set()
+
+        name_to_record = graph.name_to_record
+        patched_names = set()
+
+        for name, record in name_to_record.items():
+            spyder_node = name_to_spyder_node.get(name)
+
+            if spyder_node is None or spyder_node.reference_path != record.reference_path or \
+                    spyder_node.family != record.family or \
+                    (spyder_node.position.x, spyder_node.position.y) != (record.position.x, record.position.y) or \
+                    list(spyder_node.folded_pins) != list(record.folded_pins) or \
+                    _get_parameter_strings(spyder_node) != _get_parameter_strings(record):
+                patched_names.add(name)
+
+        # Output pins with dormant connections are compared in full (in hivemap order)
+        target_output_to_keys = {}
+        for key in target_connections:
+            target_output_to_keys.setdefault(key[:2], []).append(key)
+
+        outputs = {(c.from_node, c.output_name) for c in graph.get_dormant_connections()}
+        outputs.update(o for o, keys in target_output_to_keys.items()
+                       if any(k[0] in name_to_record or k[2] in name_to_record for k in keys))
+
+        for node_name, pin_name in outputs:
+            node = self.nodes.get(node_name)
+
+            if node is None:
+                connections = _merge_dormant_connections(graph, node_name, pin_name, [])
+
+            else:
+                try:
+                    pin = node.outputs[pin_name]
+
+                except KeyError:
+                    connections = []
+
+                else:
+                    connections = _merge_dormant_connections(graph, node_name, pin_name, pin.connections)
+
+            keys = [(c.from_node, c.output_name, c.to_node, c.input_name) if isinstance(c, DormantConnection)
+                    else _get_connection_key(c) for c in connections]
+            target_keys = target_output_to_keys.get((node_name, pin_name), [])
+
+            if keys != target_keys:
+                patched_names.update(name for key in chain(keys, target_keys) for name in (key[0], key[2])
+                                     if name in name_to_record)
+
+        return patched_names
+
+    def hydrate_nodes(self, names):
+        """Create dormant nodes with the given names, and any dormant connections of these nodes.
+
+        Hydration does not change the hivemap, so it is not written to history.
+        Return list of created nodes
+
+        :param names: names of dormant nodes, or of nodes with dormant connections
+        """
+        graph = self._dormant_graph
+        if graph is None:
+            return []
+
+        created_nodes = {}
+        reserved_names = {}
+        name_to_node = ChainMap(created_nodes, self.nodes)
+        used_names = ChainMap(reserved_names, created_nodes, self.nodes, graph.name_to_record)
+
+        def reserve_name(base_name):
+            name = _get_unique_name(used_names, base_name)
+            _validate_node_name(name)
+            reserved_names[name] = True
+            return name
+
+        node_records, connections, reordered_pins = self._hydrate_records(graph, names, name_to_node)
+        if not node_records:
+            return []
+
+        nodes = [node for node, record in node_records]
+
+        for node, record in node_records:
+            folding_nodes, folding_connections = self._fold_record_pins(node, record.folded_pins, reserve_name)
+            nodes.extend(folding_nodes)
+
+            connections.extend(folding_connections)
+
+        for node in nodes:
+            self.nodes[node.name] = node
+            self._index_node(node)
+
+        self._notify("graph_loaded", nodes, connections)
+
+        for output_pin in reordered_pins:
+            for index, connection in enumerate(output_pin.connections):
+                self._notify("connection_reordered", connection, index)
+
+        self._logger.debug("Hydrated {} nodes and {} connections".format(len(nodes), len(connections)))
+        return nodes
+
+    def hydrate_region(self, x, y, width, height):
+        """Hydrate dormant nodes inside a rectangle
+
+        :param x: minimum x position
+        :param y: minimum y position
+        :param width: width of rectangle
+        :param height: height of rectangle
+        """
+        if self._dormant_graph is None:
+            return []
+
+        return self.hydrate_nodes(self._dormant_graph.find_in_rect(x, y, width, height))
+
+    def hydrate_all(self):
+        """Hydrate all dormant nodes"""
+        if self._dormant_graph is None:
+            return []
+
+        return self.hydrate_nodes(list(self._dormant_graph.tracked_names))
+
+    def _hydrate_neighbours(self, node):
+        """Hydrate dormant connections of a node before it is edited
+
+        :param node: Node object
+        """
+        graph = self._dormant_graph
+
+        if graph is not None and graph.name_to_connections.get(node.name):
+            self.hydrate_nodes([node.name])
+
+    def cut(self, nodes):
+        """Cut nodes to clipboard
+
+        :param nodes: nodes to cut
+        """
+        with self.history.command_context("cut"):
+            clipboard = self.copy(nodes)
+
+            # Delete nodes
+            self.delete_nodes(nodes)
+
+        return clipboard
+
+    def copy(self, nodes):
+        """Copy nodes to clipboard
+
+        :param nodes: nodes to copy
+        """
+        with_folded_nodes = set(nodes)
+
+        # Find nodes that are internally folded
+        for node in nodes:
+            for pin in node.inputs.values():
+                if pin.is_folded:
+                    target_connection = next(iter(pin.connections))
+                    target_pin = target_connection.output_pin
+                    target_node = target_pin.node
+                    with_folded_nodes.add(target_node)
+
+        return self._export_to_hivemap(with_folded_nodes)
+
+    def paste(self, clipboard, position):
+        """Paste nodes from clipboard
+
+        :param position: position of target center of mass of nodes
+        """
+        spyder_nodes = clipboard.nodes
+        if not spyder_nodes:
+            return
+
+        # Find midpoint
+        average_x = sum(n.position.x for n in spyder_nodes) / len(spyder_nodes)
+        average_y = sum(n.position.y for n in spyder_nodes) / len(spyder_nodes)
+
+        # Displacement to the center
+        offset = position[0] - average_x, position[1] - average_y
+
+        with self.history.command_context("paste"):
+            self._import_from_hivemap(clipboard, offset)
+
+    def _export_to_hivemap(self, nodes=None, docstring=""):
+        # Dormant nodes are only exported with the entire graph
+        dormant_graph = None
+
+        if nodes is None:
+            nodes = self.nodes.values()
+            dormant_graph = self._dormant_graph
+
+        hivemap = model.Hivemap()
+        hivemap.docstring = docstring
+
+        for node in nodes:
+            # Create parameter groups
+            parameter_groups = parameter_group_dict_to_array(node.params)
+            folded_pins = [pin_name for pin_name, pin in node.inputs.items() if pin.is_folded]
+
+            # Serialise HiveNode instance
+            if node.node_type == NodeTypes.HIVE:
+                family = "HIVE"
+
+            else:
+                assert node.node_type == NodeTypes.BEE
+                family = "BEE"
+
+            spyder_node = model.Node(identifier=node.name, family=family, reference_path=node.reference_path,
+                                     position=node.position, parameter_groups=parameter_groups,
+                                     folded_pins=folded_pins)
+
+            hivemap.nodes.append(spyder_node)
+
+        if dormant_graph is not None:
+            for name, record in dormant_graph.name_to_record.items():
+                hivemap.nodes.append(_spyder_node_from_record(name, record))
 
         for node in nodes:
             node_name = node.name
 
             for pin_name, pin in node.outputs.items():
-                for connection in pin.connections:
+                connections = pin.connections
+
+                if dormant_graph is not None:
+                    connections = _merge_dormant_connections(dormant_graph, node_name, pin_name, connections)
+
+                for connection in connections:
+                    if isinstance(connection, DormantConnection):
+                        hivemap.connections.append(model.Connection(connection.from_node, connection.output_name,
+                                                                    connection.to_node, connection.input_name,
+                                                                    connection.is_trigger))
+                        continue
+
                     target_pin = connection.input_pin
                     target_node = target_pin.node
 
@@ -673,99 +1744,415 @@ class NodeManager(object):
                                                          is_trigger)
                     hivemap.connections.append(spyder_connection)
 
+        # Connections from dormant nodes are all dormant
+        if dormant_graph is not None:
+            for name in dormant_graph.name_to_record:
+                dormant_connections = sorted(c for c in dormant_graph.name_to_connections.get(name, ())
+                                             if c.from_node == name)
+
+                for connection in dormant_connections:
+                    hivemap.connections.append(model.Connection(connection.from_node, connection.output_name,
+                                                                connection.to_node, connection.input_name,
+                                                                connection.is_trigger))
+
         return hivemap
 
-    def _import_from_hivemap(self, hivemap):
-        # Create nodes
-        # Mapping from original ID to new ID
-        id_to_node_name = {}
-        node_to_spyder_hive_node = {}
-        node_to_spyder_node = {}
+    def _insert_graph(self, nodes, connections, dormant_graph=None):
+        """Add a pre-built, connected graph of nodes to the model, and write to history.
 
-        created_nodes = {}
+        Observers are notified once with on_graph_loaded, rather than per node / connection / fold
 
-        # Load IO public
-        for spyder_node in hivemap.nodes:
-            reference_path = spyder_node.reference_path
-            params = parameter_group_array_to_dict(spyder_node.parameter_groups)
+        :param nodes: list of nodes to add
+        :param connections: list of (connected) connections between these nodes
+        :param dormant_graph: optional dormant part of the graph
+        """
+        for node in nodes:
+            self.nodes[node.name] = node
+            self._index_node(node)
 
-            if spyder_node.family == "BEE":
-                try:
-                    node = self._create_bee(reference_path, params)
+        if dormant_graph is not None:
+            self._dormant_graph = dormant_graph
 
-                except Exception as err:
-                    self._logger.exception("Unable to create bee node {}".format(spyder_node.identifier))
-                    continue
+        self._notify("graph_loaded", nodes, connections)
 
-            else:
-                try:
-                    node = self._create_hive(reference_path, params)
+        self._logger.info("Loaded {} nodes and {} connections".format(len(nodes), len(connections)))
 
-                except Exception as err:
-                    self._logger.exception("Unable to create hive node {}".format(spyder_node.identifier))
-                    continue
+        if self.history.is_recording:
+            graph_data = self._graph_to_data(nodes, self._get_graph_connections(nodes), dormant_graph)
+            self.history.record_delta(self._add_graph_from_data, (graph_data,), self._remove_graph_by_names,
+                                      ([node.name for node in nodes], dormant_graph is not None))
 
-                # Specific mapping for HIVE nodes only.
-                node_to_spyder_hive_node[node] = spyder_node
+    def _remove_graph(self, nodes, dormant_graph=None):
+        """Remove a graph of nodes and their connections from the model, and write to history.
 
-            node_to_spyder_node[node] = spyder_node
+        The command describes the removed graph by data, so that undoing it restores the graph in one step
 
-        # Attempt to set common data between IO public and Hives
-        for node, spyder_node in node_to_spyder_node.items():
-            # Try to use original name, otherwise make unique
-            self.rename_node(node, spyder_node.identifier, attempt_till_success=True)
+        :param nodes: list of nodes to remove
+        :param dormant_graph: optional dormant part of the graph
+        """
+        connections = self._get_graph_connections(nodes)
 
-            # Set original position
-            self.reposition_node(node, (spyder_node.position.x, spyder_node.position.y))
+        if self.history.is_recording:
+            graph_data = self._graph_to_data(nodes, connections, dormant_graph)
 
-            # Map original copied ID to new allocated ID
-            node_name = node.name
-            id_to_node_name[spyder_node.identifier] = node_name
-            created_nodes[node_name] = node
+        self._notify("graph_unloaded", nodes, connections)
 
-        # Recreate connections
-        for connection in hivemap.connections:
+        for connection in connections:
+            connection.delete()
+
+        for node in nodes:
+            self._unindex_node(node)
+            self.nodes.pop(node.name)
+
+        if dormant_graph is not None:
+            self._dormant_graph = None
+
+        if self.history.is_recording:
+            self.history.record_delta(self._remove_graph_by_names,
+                                      ([node.name for node in nodes], dormant_graph is not None),
+                                      self._add_graph_from_data, (graph_data,))
+
+    def _build_node(self, name, spyder_node):
+        """Instantiate and position the node described by a hivemap node, or return None if it cannot be created
+
+        :param name: name of node
+        :param spyder_node: hivemap node
+        """
+        reference_path = spyder_node.reference_path
+        params = parameter_group_array_to_dict(spyder_node.parameter_groups)
+
+        if spyder_node.family == "BEE":
             try:
-                from_id = id_to_node_name[connection.from_node]
-                to_id = id_to_node_name[connection.to_node]
+                node = self._new_bee(name, reference_path, params)
+
+            except Exception:
+                self._logger.exception("Unable to create bee node {}".format(spyder_node.identifier))
+                return None
+
+        else:
+            try:
+                node = self._new_hive(name, reference_path, params)
+
+            except Exception:
+                self._logger.exception("Unable to create hive node {}".format(spyder_node.identifier))
+                return None
+
+        # Set original position
+        with node.make_writable():
+            node.position = (spyder_node.position.x, spyder_node.position.y)
+
+        return node
+
+    @staticmethod
+    def _new_connection(output_pin, input_pin):
+        """Create and connect a connection between two pins, without writing to history
+
+        :param output_pin: output pin from which the connection originates
+        :param input_pin: input pin at which the connection is completed
+        """
+        if input_pin.is_folded:
+            raise NodeConnectionError("Cannot connect to a folded pin")
+
+        result = Connection.get_connection_type(output_pin, input_pin)
+        if result == ConnectionType.INVALID:
+            raise NodeConnectionError("Can't connect {} to {}".format(output_pin, input_pin))
+
+        connection = Connection(output_pin, input_pin, is_trigger=(result == ConnectionType.TRIGGER))
+        connection.connect()
+        return connection
+
+    def _connect_by_name(self, name_to_node, from_name, output_name, to_name, input_name):
+        """Create and connect a connection between two named node pins, without writing to history.
+
+        Return the connection, or None if it could not be created
+
+        :param name_to_node: mapping of name to node
+        :param from_name: name of source node
+        :param output_name: name of output pin
+        :param to_name: name of target node
+        :param input_name: name of input pin
+        """
+        try:
+            from_node = name_to_node[from_name]
+            to_node = name_to_node[to_name]
+
+        except KeyError:
+            self._logger.error("Unable to find all nodes in connection: {}, {}".format(from_name, to_name))
+            return None
+
+        try:
+            from_pin = from_node.outputs[output_name]
+            to_pin = to_node.inputs[input_name]
+
+        except KeyError:
+            self._logger.error("Unable to find all node pins in connection: {}.{}, {}.{}"
+                               .format(from_name, output_name, to_name, input_name))
+            return None
+
+        try:
+            return self._new_connection(from_pin, to_pin)
+
+        except Exception:
+            self._logger.exception("Unable to create connection between {}.{}, {}.{}"
+                                   .format(from_name, output_name, to_name, input_name))
+            return None
+
+    def _fold_record_pins(self, node, folded_pin_names, reserve_name):
+        """Fold the pins of a newly built node, without writing to history.
+
+        Return list of created variable nodes, and list of created connections
+
+        :param node: Node object
+        :param folded_pin_names: names of pins to fold
+        :param reserve_name: callable which returns an unused name from a base name
+        """
+        nodes = []
+        connections = []
+
+        for pin_name in folded_pin_names:
+            try:
+                pin = node.inputs[pin_name]
 
             except KeyError:
-                self._logger.error("Unable to find all nodes in connection: {}, {}".format(connection.from_node,
-                                                                                           connection.to_node))
+                self._logger.error("Couldn't find pin {}.{} to fold".format(node.name, pin_name))
+                continue
+
+            if not pin.is_foldable:
+                self._logger.error("Couldn't fold pin {}.{}".format(node.name, pin_name))
+                continue
+
+            # Create variable, as in fold_pin
+            if not pin.connections:
+                params = dict(meta_args=dict(data_type=pin.data_type),
+                              args=dict(start_value=start_value_from_type(pin.data_type)))
+
+                target_node = self._new_hive(reserve_name(pin.name), FOLD_NODE_REFERENCE_PATH, params)
+                with target_node.make_writable():
+                    target_node.position = node.position
+
+                nodes.append(target_node)
+
+                target_pin = next(iter(target_node.outputs.values()))
+                connections.append(self._new_connection(target_pin, pin))
+
+            with pin.make_writable():
+                pin.is_folded = True
+
+        return nodes, connections
+
+    def _hydrate_records(self, graph, names, name_to_node):
+        """Build the dormant nodes required to complete the given nodes, and create their dormant connections.
+
+        Nodes are completed by hydrating all of their dormant neighbours, as well as the variables of the folded pins of
+        hydrated nodes. Connections are inserted in hivemap order. Pins are not folded.
+        Return list of (node, record) pairs of built nodes, list of created connections and set of reordered output
+        pins
+
+        :param graph: dormant graph
+        :param names: names of nodes to complete
+        :param name_to_node: mapping of name to node for hydrated nodes, to which built nodes are added
+        """
+        name_to_record = graph.name_to_record
+        name_to_connections = graph.name_to_connections
+
+        requested_names = {n for n in names if n in name_to_record or name_to_connections.get(n)}
+
+        names_to_build = {n for n in requested_names if n in name_to_record}
+        for name in requested_names:
+            for dormant_connection in name_to_connections.get(name, ()):
+                names_to_build.update(n for n in (dormant_connection.from_node, dormant_connection.to_node)
+                                      if n in name_to_record)
+
+        # Folded variables are hydrated with the nodes which fold them
+        for name in list(names_to_build):
+            folded_pins = name_to_record[name].folded_pins
+            if not folded_pins:
                 continue
 
-            from_node = created_nodes[from_id]
-            to_node = created_nodes[to_id]
+            for dormant_connection in name_to_connections.get(name, ()):
+                if dormant_connection.to_node == name and dormant_connection.input_name in folded_pins and \
+                        dormant_connection.from_node in name_to_record:
+                    names_to_build.add(dormant_connection.from_node)
+
+        node_records = []
+
+        for name in sorted(names_to_build):
+            record = name_to_record[name]
+            node = self._build_node(name, record)
+
+            if node is not None:
+                name_to_node[name] = node
+                node_records.append((node, record))
 
+        # Create dormant connections whose nodes are now hydrated
+        dormant_connections = set()
+        for name in requested_names | names_to_build:
+            dormant_connections.update(name_to_connections.get(name, ()))
+
+        connections = []
+        reordered_pins = set()
+
+        for dormant_connection in sorted(dormant_connections):
+            from_name = dormant_connection.from_node
+            to_name = dormant_connection.to_node
+
+            # Remains dormant
+            if (from_name in name_to_record and from_name not in name_to_node) or \
+                    (to_name in name_to_record and to_name not in name_to_node):
+                continue
+
+            graph.remove_dormant_connection(dormant_connection)
+
+            connection = self._connect_by_name(name_to_node, from_name, dormant_connection.output_name, to_name,
+                                               dormant_connection.input_name)
+            if connection is None:
+                continue
+
+            sequence = dormant_connection.sequence
+            graph.add_connection(connection, sequence)
+            connections.append(connection)
+
+            # Restore hivemap order of output pin connections
+            output_pin = connection.output_pin
+            index = sum(1 for c in output_pin.connections if graph.get_sequence(c) < sequence)
+
+            if index != len(output_pin.connections) - 1:
+                output_pin.reorder_target(connection, index)
+                reordered_pins.add(output_pin)
+
+        # Discard records of built nodes, and any which could not be built
+        for name in names_to_build:
+            del name_to_record[name]
+
+            if name not in name_to_node:
+                for dormant_connection in list(name_to_connections.get(name, ())):
+                    self._logger.error("Unable to find all nodes in connection: {}, {}"
+                                       .format(dormant_connection.from_node, dormant_connection.to_node))
+                    graph.remove_dormant_connection(dormant_connection)
+
+        tracked_names = requested_names | names_to_build
+        for dormant_connection in dormant_connections:
+            tracked_names.update((dormant_connection.from_node, dormant_connection.to_node))
+
+        for name in tracked_names:
+            graph.update_tracking(name)
+
+        return node_records, connections, reordered_pins
+
+    def _build_graph_from_hivemap(self, hivemap, is_dormant=None):
+        """Build the nodes and connections described by a hivemap, without adding them to the model.
+
+        Nodes are named, positioned, connected and folded directly, so that no history is recorded and no observers
+        are notified until the graph is inserted with _insert_graph.
+        Nodes and connections are iterated once, so they may be streamed (see hivemap_io.HivemapRecordReader).
+
+        Return list of nodes, list of connections, and dormant graph (or None)
+
+        :param hivemap: Hivemap or HivemapRecords instance
+        :param is_dormant: optional predicate of a hivemap node, if True the node is kept as a record
+        """
+        # Names taken by existing nodes, or by nodes in this graph
+        used_names = set(self._get_used_names())
+
+        nodes = []
+        connections = []
+        identifier_to_name = {}
+        name_to_node = {}
+        node_records = []
+
+        dormant_graph = None if is_dormant is None else _DormantGraph()
+
+        def reserve_name(base_name):
+            name = _get_unique_name(used_names, base_name)
+            _validate_node_name(name)
+            used_names.add(name)
+            return name
+
+        # Create nodes
+        for spyder_node in hivemap.nodes:
+            # Try to use original name, otherwise make unique
+            name = reserve_name(spyder_node.identifier)
+
+            if dormant_graph is not None and spyder_node.reference_path not in _always_hydrated_reference_paths \
+                    and is_dormant(spyder_node):
+                dormant_graph.add_node(name, node_to_record(spyder_node))
+
+            else:
+                node = self._build_node(name, spyder_node)
+
+                if node is None:
+                    used_names.discard(name)
+                    continue
+
+                nodes.append(node)
+                name_to_node[name] = node
+                node_records.append((node, spyder_node))
+
+            identifier_to_name[spyder_node.identifier] = name
+
+        # Recreate connections
+        for sequence, connection in enumerate(hivemap.connections):
             try:
-                from_pin = from_node.outputs[connection.output_name]
-                to_pin = to_node.inputs[connection.input_name]
+                from_name = identifier_to_name[connection.from_node]
+                to_name = identifier_to_name[connection.to_node]
 
             except KeyError:
-                self._logger.error("Unable to find all node pins in connection: {}.{}, {}.{}"
-                                   .format(connection.from_node, connection.output_name, connection.to_node,
-                                           connection.input_name))
+                self._logger.error("Unable to find all nodes in connection: {}, {}".format(connection.from_node,
+                                                                                           connection.to_node))
                 continue
 
-            try:
-                self.create_connection(from_pin, to_pin)
+            if dormant_graph is None:
+                created_connection = self._connect_by_name(name_to_node, from_name, connection.output_name, to_name,
+                                                           connection.input_name)
+                if created_connection is not None:
+                    connections.append(created_connection)
 
-            except Exception:
-                self._logger.exception("Unable to create connection between {}.{}, {}.{}"
-                                       .format(connection.from_node, connection.output_name, connection.to_node,
-                                               connection.input_name))
+            elif from_name in dormant_graph.name_to_record or to_name in dormant_graph.name_to_record:
+                dormant_graph.add_dormant_connection(
+                    DormantConnection(sequence, from_name, connection.output_name, to_name, connection.input_name,
+                                      bool(connection.is_trigger)))
+
+            else:
+                created_connection = self._connect_by_name(name_to_node, from_name, connection.output_name, to_name,
+                                                           connection.input_name)
+                if created_connection is not None:
+                    dormant_graph.add_connection(created_connection, sequence)
+                    connections.append(created_connection)
+
+        # Complete the hydrated nodes
+        if dormant_graph is not None:
+            hydrated_node_records, hydrated_connections, _ = self._hydrate_records(dormant_graph, list(name_to_node),
+                                                                                   name_to_node)
+            nodes.extend(node for node, record in hydrated_node_records)
+            node_records.extend(hydrated_node_records)
+            connections.extend(hydrated_connections)
 
         # Fold folded pins
-        for node, spyder_node in node_to_spyder_node.items():
+        for node, spyder_node in node_records:
+            folding_nodes, folding_connections = self._fold_record_pins(node, spyder_node.folded_pins, reserve_name)
+            nodes.extend(folding_nodes)
+            connections.extend(folding_connections)
 
-            for pin_name in spyder_node.folded_pins:
-                try:
-                    pin = node.inputs[pin_name]
+        return nodes, connections, dormant_graph
 
-                except KeyError:
-                    self._logger.error("Couldn't find pin {}.{} to fold".format(node.name, pin_name))
-                    continue
+    def _import_from_hivemap(self, hivemap, offset=(0.0, 0.0), is_dormant=None):
+        """Build and add the graph described by a hivemap as a single history command
 
-                self.fold_pin(pin)
+        :param hivemap: Hivemap or HivemapRecords instance
+        :param offset: displacement to apply to node positions
+        :param is_dormant: optional predicate of a hivemap node, if True the node is kept as a record until it is
+        hydrated
+        """
+        nodes, connections, dormant_graph = self._build_graph_from_hivemap(hivemap, is_dormant)
+
+        offset_x, offset_y = offset
+        if offset_x or offset_y:
+            for node in nodes:
+                with node.make_writable():
+                    node.position = node.position[0] + offset_x, node.position[1] + offset_y
+
+        if nodes or dormant_graph is not None:
+            self._insert_graph(nodes, connections, dormant_graph)
 
+        created_nodes = {node.name: node for node in nodes}
         return dict(nodes=created_nodes, docstring=hivemap.docstring)
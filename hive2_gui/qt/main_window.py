@@ -2,15 +2,17 @@ import os
 import subprocess
 import webbrowser
 from functools import partial
+from importlib import import_module
 from os import path
 from sys import executable as EXECUTABLE_PATH
 
-from PyQt5.QtCore import Qt, QUrl, QStringListModel
+from PyQt5.QtCore import Qt, QUrl, QStringListModel, QTimer
 from PyQt5.QtGui import QIcon, QKeySequence
 from PyQt5.QtWidgets import (QMainWindow, QStatusBar, QAction, QDialog, QMessageBox, QFileDialog, QCompleter, QLineEdit,
                              QHBoxLayout, QMenu, QDockWidget, QLabel)
 
 from ..finders import all_bees, HiveFinder
+from ..finders.watcher import create_watcher, ChangeKinds
 from .debugging import QtNetworkDebugManager
 from .node_editor import NodeEditorSpace
 from .tabs import TabViewWidget
@@ -18,7 +20,9 @@ from .tree import TreeWidget
 from .utils import ContextAdaptor
 from .web_view import QEditorWebView
 from .. import tools
-from ..importer import clear_imported_hivemaps, sys_path_add_context, module_is_hivemap
+from ..cache import clear_caches
+from ..hivemap_io import BINARY_HIVEMAP_EXTENSION, get_default_hivemap_extension
+from ..importer import clear_imported_hivemaps, get_hook, sys_path_add_context, module_is_hivemap
 from ..node import NodeTypes
 from ..utils import find_file_path_of_hive_path
 
@@ -46,6 +50,7 @@ class MainWindow(QMainWindow):
     _hivemapExtension = "hivemap"
     _untitledFileName = "<Unsaved>"
     _noProjectText = "<No Project>"
+    _projectWatchInterval = 1000
 
     def __init__(self):
         super(MainWindow, self).__init__()
@@ -78,6 +83,12 @@ class MainWindow(QMainWindow):
         self.hive_finder = HiveFinder()
         self._current_hive_list = None
 
+        # Watch project for changes to hives
+        self._project_watcher = None
+        self._project_watch_timer = QTimer(self)
+        self._project_watch_timer.setInterval(self._projectWatchInterval)
+        self._project_watch_timer.timeout.connect(self._pollProjectChanges)
+
         self._projectDirectory = None
         self._project_context = None
 
@@ -145,6 +156,17 @@ class MainWindow(QMainWindow):
         self.viewMenu = QMenu("&View")
         self.viewMenu.addAction(self._project_hives_window.toggleViewAction())
 
+        self.optionsMenu = QMenu("&Options")
+        self.lazyLoadingAction = QAction("&Lazy Loading", menu_bar, checkable=True, checked=NodeEditorSpace.lazyLoading,
+                                         statusTip="Load nodes of opened files when they are scrolled into view",
+                                         toggled=self._setLazyLoading)
+        self.journallingAction = QAction("&Journal Unsaved Changes", menu_bar, checkable=True,
+                                         checked=NodeEditorSpace.journalling,
+                                         statusTip="Keep unsaved changes on disk, so that they can be recovered after "
+                                                   "a crash", toggled=self._setJournalling)
+        self.optionsMenu.addAction(self.lazyLoadingAction)
+        self.optionsMenu.addAction(self.journallingAction)
+
         self.runMenu = QMenu("&Run")
         self.runPandaAction = QAction("Launch &Panda3D", menu_bar,
                                       shortcut=QKeySequence(self.tr("CTRL+P", "Launch  in Panda3D")),
@@ -229,6 +251,8 @@ class MainWindow(QMainWindow):
             event.ignore()
 
         else:
+            # Keep the inspection results of this session
+            self.hive_finder.save_catalogue()
             event.accept()
 
     def projectDirectory(self):
@@ -292,6 +316,7 @@ class MainWindow(QMainWindow):
                     self.debugger.session.close()
 
         widget.onExit()
+        widget.closeJournal()
         return True
 
     def _onTabChanged(self, previous_index=None):
@@ -401,8 +426,22 @@ class MainWindow(QMainWindow):
         self.fileMenu.addAction(self.saveAsAction)
 
         menu_bar.addMenu(self.viewMenu)
+        menu_bar.addMenu(self.optionsMenu)
         menu_bar.addAction(self.helpAction)
 
+    def _setLazyLoading(self, enabled):
+        # Only applies to files which are opened afterwards
+        NodeEditorSpace.lazyLoading = enabled
+
+    def _setJournalling(self, enabled):
+        NodeEditorSpace.journalling = enabled
+
+        for index in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(index)
+
+            if isinstance(widget, NodeEditorSpace):
+                widget.setJournalling(enabled)
+
     def insertFromPath(self):
         dialogue = QDialog(self)
         layout = QHBoxLayout()
@@ -455,6 +494,7 @@ class MainWindow(QMainWindow):
 
     def reloadProject(self):
         directory = self._projectDirectory
+        clear_caches()
         self._openProject(directory)
 
     def _openProject(self, directory_path):
@@ -483,9 +523,50 @@ class MainWindow(QMainWindow):
         # Update hives display in project window
         self._project_hives_window.setWidget(self._project_hives_active_widget)
         hives_in_project = self.hive_finder.hives_by_path[directory_path]
-        project_hivemaps = [p for p in hives_in_project if module_is_hivemap(__import__(p.rsplit('.', 1)[0]))]
+        project_hivemaps = [p for p in hives_in_project if self._isHivemapHive(p)]
         self._project_hives_active_widget.setItems(project_hivemaps)
 
+        # Watch for changes to project
+        self._project_watcher = create_watcher(directory_path)
+        self._project_watch_timer.start()
+
+    @staticmethod
+    def _isHivemapHive(reference_path):
+        return module_is_hivemap(import_module(reference_path.rsplit('.', 1)[0]))
+
+    def _pollProjectChanges(self):
+        """Update the hive lists in place from changed project files"""
+        changes = self._project_watcher.poll()
+        if not changes:
+            return
+
+        update = self.hive_finder.update(c.file_path for c in changes)
+        modified_paths = {path.normpath(c.file_path) for c in changes if c.kind == ChangeKinds.MODIFIED}
+
+        for i in range(self.tab_widget.count()):
+            widget = self.tab_widget.widget(i)
+
+            if isinstance(widget, NodeEditorSpace):
+                widget.removeHivesFromTree(update.removed)
+                widget.addHivesToTree(update.added)
+
+                # Patch editors of externally modified hivemaps, unless they have unsaved changes. Changes written by
+                # the editor itself are ignored
+                file_path = widget.filePath()
+                if file_path is not None and path.normpath(file_path) in modified_paths \
+                        and not widget.hasUnsavedChanges() and widget.isFileModifiedExternally():
+                    widget.load()
+
+        project_widget = self._project_hives_active_widget
+
+        for reference_path in update.removed:
+            if project_widget.hasItem(reference_path):
+                project_widget.remove(reference_path)
+
+        for reference_path in update.added:
+            if self._isHivemapHive(reference_path):
+                project_widget.append(reference_path)
+
     def closeOpenTabs(self):
         while self.tab_widget.count() > 1:
             self.tab_widget.removeTab(1)
@@ -494,6 +575,12 @@ class MainWindow(QMainWindow):
         # Close open tabs
         self.closeOpenTabs()
 
+        # Stop watching project
+        if self._project_watcher is not None:
+            self._project_watch_timer.stop()
+            self._project_watcher.close()
+            self._project_watcher = None
+
         # If project was open
         if self._project_context:
             self._project_context.exit()
@@ -583,7 +670,7 @@ class MainWindow(QMainWindow):
     def openFile(self):
         dialogue = QFileDialog(self, caption="Open Hivemap")
         dialogue.setDefaultSuffix(self._hivemapExtension)
-        dialogue.setNameFilter(dialogue.tr("Hivemaps (*.{})".format(self._hivemapExtension)))
+        dialogue.setNameFilter(dialogue.tr("Hivemaps (*.hivemap *.hivemapb)"))
         dialogue.setFileMode(QFileDialog.AnyFile)
         dialogue.setAcceptMode(QFileDialog.AcceptOpen)
 
@@ -615,9 +702,17 @@ class MainWindow(QMainWindow):
         widget = self.tab_widget.currentWidget()
         assert isinstance(widget, NodeEditorSpace)
 
+        # Large hivemaps are saved in the binary format by default, as it can be read lazily
+        node_manager = widget.nodeManager()
+        extension = get_default_hivemap_extension(len(node_manager.nodes) + len(node_manager.dormant_names))
+
         dialogue = QFileDialog(self, caption="Save Hivemap")
-        dialogue.setDefaultSuffix(self._hivemapExtension)
-        dialogue.setNameFilter(dialogue.tr("Hivemaps (*.{})".format(self._hivemapExtension)))
+        dialogue.setDefaultSuffix(extension[1:])
+        name_filters = [dialogue.tr("Hivemaps (*.hivemap)"), dialogue.tr("Binary Hivemaps (*.hivemapb)")]
+        dialogue.setNameFilters(name_filters)
+        dialogue.selectNameFilter(name_filters[extension == BINARY_HIVEMAP_EXTENSION])
+        dialogue.filterSelected.connect(
+            lambda name_filter: dialogue.setDefaultSuffix("hivemapb" if "*.hivemapb" in name_filter else "hivemap"))
         dialogue.setFileMode(QFileDialog.AnyFile)
         dialogue.setAcceptMode(QFileDialog.AcceptSave)
 
@@ -629,6 +724,9 @@ class MainWindow(QMainWindow):
         widget.save(file_path=file_path)
         widget.setFilePath(file_path)
 
+        # Hivemap finder caches directory listings, so new hivemaps must be announced
+        get_hook().invalidate_listings()
+
         # Update tab name
         name = self._getDisplayName(file_path, allow_untitled=False)
         index = self.tab_widget.currentIndex()
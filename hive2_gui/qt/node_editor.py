@@ -1,8 +1,9 @@
 import os
 from functools import partial
+from logging import getLogger
 from webbrowser import open as open_url
 
-from PyQt5.QtCore import Qt, pyqtSignal, QEvent, QPoint
+from PyQt5.QtCore import Qt, pyqtSignal, QEvent, QPoint, QPointF
 from PyQt5.QtGui import QIcon, QCursor, QStandardItemModel, QStandardItem
 from PyQt5.QtWidgets import (QDialog, QWidget, QVBoxLayout, QPushButton, QMessageBox, QSplitter, QTextEdit, QHBoxLayout,
                              QHeaderView, QTableView, QListWidget, QListWidgetItem, QMenu, QMainWindow, QDockWidget,
@@ -18,12 +19,16 @@ from .widgets import create_widget
 from .view import NodeView, NodePreviewView
 
 from ..code_generator import hivemap_to_python_source
+from ..hivemap_io import HivemapRecordReader, write_hivemap
 from ..history import CommandLogManager
 from ..inspector import InspectorOption
+from ..journal import HistoryJournal, get_journal_path, recover_journal
 from ..utils import find_file_path_of_hive_path, import_module_from_hive_path
 from ..node import MimicFlags, NodeTypes
 from ..node_manager import NodeManager
 
+logger = getLogger(__name__)
+
 
 class SourceCodePreviewDialogue(QDialog):
 
@@ -212,14 +217,28 @@ class NodeEditorSpace(QMainWindow):
     onNodeContextMenu = pyqtSignal(object, object)
     onDroppedForParent = pyqtSignal(QEvent, QPoint)
 
+    # Keep nodes outside of the view as records until they are scrolled into view (see the Options menu)
+    lazyLoading = False
+    lazyLoadingMargin = 500.0
+
+    # Undo history is limited by the size of its commands, rather than by their number (None for no limit)
+    historyByteLimit = 64 * 1024 * 1024
+
+    # Journal the history of saved files to disk, so that unsaved changes can be recovered after a crash (see the
+    # Options menu)
+    journalling = True
+
     def __init__(self, file_path=None, project_path=None):
         super(NodeEditorSpace, self).__init__()
 
         self._filePath = file_path
-        self._history = CommandLogManager()
+        # (Modification time, size) of the file when it was last written or read by this editor
+        self._fileSignature = None
+        self._history = CommandLogManager(limit=None, byte_limit=self.historyByteLimit)
         self._history.on_updated.subscribe(self._onHistoryUpdated)
 
         self._nodeManager = NodeManager(self._history)
+        self._journal = None
 
         self._view = NodeView(self)
 
@@ -237,6 +256,8 @@ class NodeEditorSpace(QMainWindow):
         node_manager.on_connection_reordered.subscribe(self._onConnectionReordered)
         node_manager.on_pin_folded.subscribe(self._onPinFolded)
         node_manager.on_pin_unfolded.subscribe(self._onPinUnfolded)
+        node_manager.on_graph_loaded.subscribe(self._onGraphLoaded)
+        node_manager.on_graph_unloaded.subscribe(self._onGraphUnloaded)
 
         self._historyID = self._history.command_id
         self._lastSavedID = self._historyID
@@ -254,6 +275,7 @@ class NodeEditorSpace(QMainWindow):
         view.onDragMove.connect(self._guiOnDragMove)
         view.onNodeRightClick.connect(self._guiNodeRightClicked)
         view.onSocketInteract.connect(self._guiSocketInteract)
+        view.onVisibleRectChanged.connect(self._guiVisibleRectChanged)
 
         self._nodeToQtNode = {}
         self._connectionToQtConnection = {}
@@ -330,9 +352,89 @@ class NodeEditorSpace(QMainWindow):
     def filePath(self):
         return self._filePath
 
+    @staticmethod
+    def _getFileSignature(file_path):
+        """Return (modification time, size) of file, or None if it does not exist"""
+        try:
+            stat = os.stat(file_path)
+
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size
+
+    def isFileModifiedExternally(self):
+        """Return True if the file was changed since this editor last wrote or read it"""
+        if self._filePath is None:
+            return False
+
+        return self._getFileSignature(self._filePath) != self._fileSignature
+
     def setFilePath(self, file_path):
+        if file_path == self._filePath:
+            return
+
         self._filePath = file_path
 
+        # Journal is kept beside the file
+        if self._journal is not None:
+            self._openJournal()
+
+    def _openJournal(self):
+        """Start journalling the history of the current file, replacing any previous journal"""
+        self.closeJournal()
+
+        if self.journalling and self._filePath is not None:
+            self._journal = HistoryJournal(get_journal_path(self._filePath), self._nodeManager)
+            self._journal.open()
+
+    def setJournalling(self, enabled):
+        """Start or stop journalling the history of the current file
+
+        :param enabled: True if the history is journalled
+        """
+        self.journalling = enabled
+
+        if not enabled:
+            self.closeJournal()
+
+        elif self._journal is None:
+            self._openJournal()
+
+    def closeJournal(self):
+        """Stop journalling and discard the journal, as the editor was closed normally"""
+        if self._journal is not None:
+            self._journal.close(discard=True)
+            self._journal = None
+
+    def _recoverJournal(self, file_path):
+        """Offer to restore the unsaved changes to a file from its journal. Return True if they were restored
+
+        :param file_path: path of hivemap file
+        """
+        journal_path = get_journal_path(file_path)
+
+        if not os.path.exists(journal_path):
+            return False
+
+        reply = QMessageBox.question(self, 'Recover Changes', "This file has unsaved changes from a previous session. "
+                                                              "Do you want to recover them?",
+                                     QMessageBox.Yes, QMessageBox.No)
+
+        if reply != QMessageBox.Yes:
+            return False
+
+        try:
+            recover_journal(journal_path, self._nodeManager)
+
+        except Exception as err:
+            logger.exception("Unable to recover journal {}".format(journal_path))
+            QMessageBox.critical(self, 'Recover Changes', "The unsaved changes could not be recovered, so the saved "
+                                                          "file will be opened instead.\n\n{}".format(err))
+            return False
+
+        return True
+
     def hasUnsavedChanges(self):
         return self._lastSavedID != self._historyID
 
@@ -418,6 +520,9 @@ class NodeEditorSpace(QMainWindow):
 
             self.load()
 
+        # Debugging refers to nodes by name
+        self._nodeManager.hydrate_all()
+
         self._debugController = controller
         self._debugWindow.setWidget(self._debugActiveWidget)
 
@@ -633,6 +738,29 @@ class NodeEditorSpace(QMainWindow):
         target_gui_node = self._nodeToQtNode[target_node]
         self._view.unfoldNode(socket_row, target_gui_node)
 
+    def _onGraphLoaded(self, nodes, connections):
+        for node in nodes:
+            self._onNodeCreated(node)
+            self._onNodeMoved(node, node.position)
+
+        for connection in connections:
+            self._onConnectionCreated(connection)
+
+        for node in nodes:
+            for pin in node.inputs.values():
+                if pin.is_folded:
+                    self._onPinFolded(pin)
+
+    def _onGraphUnloaded(self, nodes, connections):
+        # Other connections of affected pins are reordered separately by the node manager
+        for connection in connections:
+            gui_connection = self._connectionToQtConnection.pop(connection)
+            self._view.removeConnection(gui_connection)
+            gui_connection.onDeleted()
+
+        for node in nodes:
+            self._onNodeDestroyed(node)
+
     # GUI nodes
     def _guiOnDragMove(self, event):
         mime_data = event.mimeData()
@@ -719,6 +847,13 @@ class NodeEditorSpace(QMainWindow):
 
         self.doOpenFile.emit(hivemap_file_path)
 
+    def _guiVisibleRectChanged(self, rect):
+        if not self._nodeManager.dormant_names:
+            return
+
+        rect = self._getHydrationRect()
+        self._nodeManager.hydrate_region(rect.x(), rect.y(), rect.width(), rect.height())
+
     def _guiNodesDestroyed(self, gui_nodes):
         nodes = [gui_node.node() for gui_node in gui_nodes]
         self._nodeManager.delete_nodes(nodes)
@@ -859,10 +994,13 @@ class NodeEditorSpace(QMainWindow):
                                                       "editor")
             raise ValueError("Cyclic references cannot be saved to hivemap")
 
-        # Export data
-        data = self._nodeManager.to_string()
-        with open(file_path, "w") as f:
-            f.write(data)
+        # Export data (format is chosen by file extension)
+        write_hivemap(file_path, self._nodeManager.to_hivemap())
+        self._fileSignature = self._getFileSignature(file_path)
+
+        # Journal only needs the changes since the file was saved
+        if self._journal is not None:
+            self._journal.compact()
 
         # Mark pending changes as false
         self._lastSavedID = self._historyID
@@ -875,13 +1013,23 @@ class NodeEditorSpace(QMainWindow):
             if file_path is None:
                 raise ValueError("Untitled hivemap cannot be loaded without filename")
 
-        with open(file_path, 'r') as f:
-            data = f.read()
-
         node_manager = self._nodeManager
 
+        # Reloading the current file only applies the changes
+        is_reload = file_path == self._filePath and bool(node_manager.nodes or node_manager.dormant_names)
+        is_recovered = not is_reload and self.journalling and self._recoverJournal(file_path)
+        # Taken before reading, so that writes made during the read are seen as external changes
+        file_signature = self._getFileSignature(file_path)
+
         try:
-            node_manager.load_string(data)
+            # Nodes are created as their records are read
+            if not is_recovered:
+                with HivemapRecordReader(file_path) as reader:
+                    if is_reload:
+                        node_manager.patch_hivemap(reader.records())
+
+                    else:
+                        node_manager.load_hivemap(reader.records(), is_dormant=self._createDormancyTest())
 
         except Exception as err:
             print("Error during loading")
@@ -890,13 +1038,53 @@ class NodeEditorSpace(QMainWindow):
             return
 
         self._filePath = file_path
+        self._fileSignature = file_signature
 
-        # Mark pending changes as false
-        self._lastSavedID = self._historyID
+        # Recovered changes are unsaved
+        if is_recovered:
+            self.onSaveStateUpdated.emit(True)
+
+        else:
+            # Mark pending changes as false
+            self._lastSavedID = self._historyID
+            self.onSaveStateUpdated.emit(False)
+
+        if not is_reload:
+            self._openJournal()
+            self._frameLoadedGraph()
 
-        self._view.frameSceneContent()
         self._docstringWidget.setPlainText(node_manager.docstring)
 
+    def _getHydrationRect(self):
+        margin = self.lazyLoadingMargin
+        return self._view.visibleSceneRect().adjusted(-margin, -margin, margin, margin)
+
+    def _createDormancyTest(self):
+        """Return predicate which tests if a hivemap node is loaded as a record, or None if lazy loading is disabled.
+
+        The view can only be framed once the bounds of the graph are known, so all nodes are loaded as records, and
+        those around the view are hydrated after it is framed (see _frameLoadedGraph)
+        """
+        if not self.lazyLoading:
+            return None
+
+        return lambda spyder_node: True
+
+    def _frameLoadedGraph(self):
+        """Centre the view on the loaded graph, then hydrate the dormant nodes around the view"""
+        node_manager = self._nodeManager
+
+        if not node_manager.dormant_names:
+            self._view.frameSceneContent()
+            return
+
+        # Scene only contains the hydrated nodes, so the graph is framed from the positions of its records
+        x, y, width, height = node_manager.get_bounding_box()
+        self._view.center = QPointF(x + width / 2, y + height / 2)
+
+        rect = self._getHydrationRect()
+        node_manager.hydrate_region(rect.x(), rect.y(), rect.width(), rect.height())
+
     def loadFromText(self, text):
         self._nodeManager.load_string(text)
 
@@ -907,6 +1095,16 @@ class NodeEditorSpace(QMainWindow):
         self._hiveWindow.setWidget(self._hiveWidget)
         self._hiveWidget.onRightClick.connect(self._guiTreeHiveEdit)
 
+    def addHivesToTree(self, hives):
+        for reference_path in hives:
+            if not self._hiveWidget.hasItem(reference_path):
+                self._hiveWidget.append(reference_path)
+
+    def removeHivesFromTree(self, hives):
+        for reference_path in hives:
+            if self._hiveWidget.hasItem(reference_path):
+                self._hiveWidget.remove(reference_path)
+
     def updateBeeTree(self, bees):
         self._beeWidget.setItems(bees)
         self._beeWidget.onSelected.connect(partial(self._onSelectedTreeNode, node_type=NodeTypes.BEE))
@@ -74,7 +74,7 @@ class TreeWidget(QTreeWidget):
         assert isinstance(path, str)
 
         key = path.split('.')
-        assert key not in self._keys
+        assert tuple(key) not in self._keys
         head, tail = key[0], key[1:]
 
         if head not in self._allItems:
@@ -111,44 +111,40 @@ class TreeWidget(QTreeWidget):
         self._keys.append(key)
         self._widgetIdToKey[id(widget)] = key
 
-    def _removeEmptyGroup(self, group):
-        g = len(group)
-        nr_items = len([k for k in self._allItems.keys() if k[:g] == group])
-        min = 1 if g > 1 else 0
-        if nr_items == min:
-            if len(group) == 1:
-                group = group[0]
-                w = self._allItems.pop(group)
-                ind = self.indexOfTopLevelItem(w)
-                self.takeTopLevelItem(ind)
-            else:
-                w = self._allItems.pop(group)
-                parent = group[:-1]
-                if len(parent) == 1: parent = parent[0]
-                ww = self._allItems[parent]
-                ww.removeChild(w)
+    @staticmethod
+    def _getItemKey(key):
+        """Return key of item in _allItems (top level items are keyed by name)"""
+        if len(key) == 1:
+            return key[0]
+
+        return key
+
+    def hasItem(self, path):
+        assert isinstance(path, str)
+        return tuple(path.split('.')) in self._keys
 
     def remove(self, path):
         assert isinstance(path, str)
-        key = path.split('.')
+        key = tuple(path.split('.'))
         assert key in self._keys
 
         self._keys.remove(key)
-        item = self._allItems.pop(key)
+        item = self._allItems[self._getItemKey(key)]
         self._widgetIdToKey.pop(id(item))
 
-        if len(key) == 1:
-            ind = self.indexOfTopLevelItem(item)
-            self.takeTopLevelItem(ind)
+        # Remove items which no longer lead to any key
+        for n in range(len(key), 0, -1):
+            group = key[:n]
 
-        else:
-            parent = key[:-1]
-            if len(parent) == 1:
-                parent = parent[0]
+            if any(k[:n] == group for k in self._keys):
+                break
 
-            ww = self._allItems[parent]
-            ww.removeChild(item)
+            item = self._allItems.pop(self._getItemKey(group))
 
-        for n in range(len(key), 0, -1):
-            group = key[:n]
-            self._removeEmptyGroup(group)
+            if n == 1:
+                ind = self.indexOfTopLevelItem(item)
+                self.takeTopLevelItem(ind)
+
+            else:
+                parent = self._allItems[self._getItemKey(group[:-1])]
+                parent.removeChild(item)
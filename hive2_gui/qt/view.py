@@ -120,6 +120,8 @@ class NodeView(QGraphicsView):
     onDragMove = pyqtSignal(QEvent)
     onDropped = pyqtSignal(QEvent, QPoint)
 
+    onVisibleRectChanged = pyqtSignal(QRectF)
+
     def __init__(self, parent=None):
         QGraphicsView.__init__(self, parent)
 
@@ -351,6 +353,19 @@ class NodeView(QGraphicsView):
         self.frameSceneContent()
         self.setZoom(new_scene.zoom())
 
+    def visibleSceneRect(self):
+        return self.mapToScene(self.viewport().rect()).boundingRect()
+
+    def scrollContentsBy(self, dx, dy):
+        super(NodeView, self).scrollContentsBy(dx, dy)
+
+        self.onVisibleRectChanged.emit(self.visibleSceneRect())
+
+    def resizeEvent(self, event):
+        super(NodeView, self).resizeEvent(event)
+
+        self.onVisibleRectChanged.emit(self.visibleSceneRect())
+
     def frameSceneContent(self):
         new_center = QPointF(self.scene().itemsBoundingRect().center())
         self.centerOn(new_center)
@@ -533,6 +548,7 @@ class NodeView(QGraphicsView):
         self.setTransform(new_transform)
 
         self.scene().setZoom(self._zoom)
+        self.onVisibleRectChanged.emit(self.visibleSceneRect())
 
     def zoomIn(self):
         self.setZoom(self._zoom + self._zoomIncrement)
@@ -0,0 +1,307 @@
+"""Compile the hivemaps of a project directory into importable Python modules.
+
+Generated modules do not import hive_editor, so they can be imported without PyQt5 or the hivemap import hook.
+Nested hivemaps are imported from their own generated modules.
+Only hivemaps which have changed since they were last compiled are rebuilt. Modules are stamped with the digest of the
+hivemap, and of the project files of the hives it uses (followed transitively through nested hivemaps). Hives
+outside of the project directory (e.g. dragonfly) are not stamped.
+"""
+import os
+import sys
+from argparse import ArgumentParser
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+
+from hive_editor.hivemap_io import HIVEMAP_EXTENSIONS, is_hivemap_path, read_hivemap
+from hive_editor.importer import HIVEMAP_CACHE_VERSION
+from hive_editor.utils import underscore_to_camel_case
+
+
+STAMP_PREFIX = "# hivemap-sha256: "
+
+CompileJob = namedtuple("CompileJob", "hivemap_path output_path class_name stamp prune_unreachable")
+CompileResult = namedtuple("CompileResult", "output_path removed_identifiers")
+
+
+def find_hivemaps(project_directory):
+    """Yield file paths of hivemaps in a project directory
+
+    :param project_directory: path of project directory
+    """
+    for directory_path, directory_names, file_names in os.walk(project_directory):
+        directory_names[:] = sorted(n for n in directory_names if not (n.startswith('.') or n == "__pycache__"))
+
+        for file_name in sorted(file_names):
+            if is_hivemap_path(file_name):
+                yield os.path.join(directory_path, file_name)
+
+
+def get_output_path(hivemap_path, project_directory, output_directory=None):
+    """Return path of the Python module generated for a hivemap
+
+    :param hivemap_path: path of hivemap file
+    :param project_directory: path of project directory
+    :param output_directory: directory to write modules to, or None to write them beside their hivemaps
+    """
+    module_path = os.path.splitext(hivemap_path)[0] + ".py"
+
+    if output_directory is None:
+        return module_path
+
+    return os.path.join(output_directory, os.path.relpath(module_path, project_directory))
+
+
+def _find_project_module_path(import_path, project_directory):
+    """Return path of the file of a module in the project directory, or None if it is not a project module.
+
+    Hivemaps take precedence over Python modules, as nested hivemaps are compiled from their hivemap files
+
+    :param import_path: absolute import path of module
+    :param project_directory: path of project directory
+    """
+    base_path = os.path.join(project_directory, *import_path.split("."))
+    file_paths = [base_path + e for e in HIVEMAP_EXTENSIONS]
+    file_paths.extend((base_path + ".py", os.path.join(base_path, "__init__.py")))
+
+    for file_path in file_paths:
+        if os.path.isfile(file_path):
+            return file_path
+
+    return None
+
+
+def get_dependency_paths(hivemap_path, project_directory, path_to_dependencies=None):
+    """Return sorted list of paths of the project files which a hivemap depends upon.
+
+    These are the modules of the hives it uses, and their dependencies if they are hivemaps. Python modules are
+    stamped by their own file only. Hivemaps which cannot be read have no dependencies (they fail to compile)
+
+    :param hivemap_path: path of hivemap file
+    :param project_directory: path of project directory
+    :param path_to_dependencies: optional dictionary of hivemap path to its direct dependencies, shared between calls
+    """
+    if path_to_dependencies is None:
+        path_to_dependencies = {}
+
+    dependency_paths = set()
+    pending = [hivemap_path]
+
+    while pending:
+        file_path = pending.pop()
+
+        try:
+            direct_dependencies = path_to_dependencies[file_path]
+
+        except KeyError:
+            try:
+                hivemap = read_hivemap(file_path)
+
+            except Exception:
+                direct_dependencies = set()
+
+            else:
+                import_paths = {n.reference_path.rsplit(".", 1)[0] for n in hivemap.nodes if n.family == "HIVE"}
+                direct_dependencies = {_find_project_module_path(p, project_directory) for p in import_paths}
+                direct_dependencies.discard(None)
+
+            path_to_dependencies[file_path] = direct_dependencies
+
+        for dependency_path in direct_dependencies:
+            if dependency_path in dependency_paths or dependency_path == hivemap_path:
+                continue
+
+            dependency_paths.add(dependency_path)
+
+            if is_hivemap_path(dependency_path):
+                pending.append(dependency_path)
+
+    return sorted(dependency_paths)
+
+
+def get_stamp(hivemap_path, prune_unreachable=False, dependency_paths=()):
+    """Return stamp line identifying the contents of a hivemap and of its dependencies, and the generator options a
+    module was built from
+
+    :param hivemap_path: path of hivemap file
+    :param prune_unreachable: unreachable nodes are removed
+    :param dependency_paths: paths of the files which the hivemap depends upon (see get_dependency_paths)
+    """
+    hasher = sha256()
+
+    for file_path in [hivemap_path] + list(dependency_paths):
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+
+        except OSError:
+            data = b""
+
+        hasher.update(sha256(data).digest())
+
+    return "{}{} v{}{}".format(STAMP_PREFIX, hasher.hexdigest(), HIVEMAP_CACHE_VERSION,
+                               " pruned" if prune_unreachable else "")
+
+
+def read_stamp(output_path):
+    """Return stamp line of a generated module, or None if it doesn't exist
+
+    :param output_path: path of generated module
+    """
+    try:
+        with open(output_path) as f:
+            for line in f:
+                if line.startswith(STAMP_PREFIX):
+                    return line.rstrip("\n")
+
+                if not line.startswith("#"):
+                    break
+
+    except OSError:
+        pass
+
+    return None
+
+
+def _initialise_worker(project_directory):
+    """Allow nested hivemaps to be imported from their hivemap files, rather than from stale generated modules"""
+    from hive_editor.importer import get_hook, install_hook
+
+    sys.path.insert(0, project_directory)
+
+    hook = get_hook()
+    if hook is None:
+        hook = install_hook()
+
+    sys.meta_path.remove(hook)
+    sys.meta_path.insert(0, hook)
+
+
+def compile_hivemap(job):
+    """Compile hivemap to Python module.
+
+    Return CompileResult
+
+    :param job: CompileJob instance
+    """
+    from hive_editor.code_generator import (plan_hivemap, prune_unreachable_nodes, canonicalise_plan,
+                                            plan_to_python_source)
+
+    hivemap = read_hivemap(job.hivemap_path)
+
+    plan = plan_hivemap(hivemap, import_editor=False)
+    removed_identifiers = []
+
+    if job.prune_unreachable:
+        plan, removed_identifiers = prune_unreachable_nodes(plan)
+
+    source = plan_to_python_source(canonicalise_plan(plan), job.class_name)
+    header = "# Generated from {} by compile_project, do not edit\n{}\n".format(os.path.basename(job.hivemap_path),
+                                                                               job.stamp)
+
+    os.makedirs(os.path.dirname(job.output_path), exist_ok=True)
+    temporary_path = "{}.tmp".format(job.output_path)
+
+    with open(temporary_path, "w") as f:
+        f.write(header)
+        f.write(source)
+        f.write("\n")
+
+    os.replace(temporary_path, job.output_path)
+    return CompileResult(job.output_path, removed_identifiers)
+
+
+def _write_package_files(output_path, project_directory, output_directory):
+    """Create __init__.py files in the output directory for each package in the project containing a hivemap"""
+    relative_directory = os.path.relpath(os.path.dirname(output_path), output_directory)
+
+    while relative_directory not in {"", "."}:
+        init_file_path = os.path.join(project_directory, relative_directory, "__init__.py")
+        output_init_file_path = os.path.join(output_directory, relative_directory, "__init__.py")
+
+        if os.path.exists(init_file_path) and not os.path.exists(output_init_file_path):
+            open(output_init_file_path, "w").close()
+
+        relative_directory = os.path.dirname(relative_directory)
+
+
+def compile_project(project_directory, output_directory=None, max_workers=None, force=False,
+                    prune_unreachable=False):
+    """Compile all changed hivemaps in a project directory to Python modules, in parallel.
+
+    Return list of (hivemap path, exception) pairs for hivemaps which could not be compiled
+
+    :param project_directory: path of project directory
+    :param output_directory: directory to write modules to, or None to write them beside their hivemaps
+    :param max_workers: maximum number of worker processes (default to CPU count)
+    :param force: rebuild hivemaps which are unchanged
+    :param prune_unreachable: remove nodes which are not connected to the hive IO or behaviour
+    (see code_generator.prune_unreachable_nodes)
+    """
+    project_directory = os.path.abspath(project_directory)
+    if output_directory is not None:
+        output_directory = os.path.abspath(output_directory)
+
+    jobs = []
+    path_to_dependencies = {}
+
+    for hivemap_path in find_hivemaps(project_directory):
+        output_path = get_output_path(hivemap_path, project_directory, output_directory)
+        dependency_paths = get_dependency_paths(hivemap_path, project_directory, path_to_dependencies)
+        stamp = get_stamp(hivemap_path, prune_unreachable, dependency_paths)
+
+        if not force and read_stamp(output_path) == stamp:
+            continue
+
+        class_name = underscore_to_camel_case(os.path.splitext(os.path.basename(hivemap_path))[0])
+        jobs.append(CompileJob(hivemap_path, output_path, class_name, stamp, prune_unreachable))
+
+    print("{} hivemaps to compile".format(len(jobs)))
+
+    if not jobs:
+        return []
+
+    failures = []
+
+    with ProcessPoolExecutor(max_workers, initializer=_initialise_worker, initargs=(project_directory,)) as executor:
+        futures = [(job, executor.submit(compile_hivemap, job)) for job in jobs]
+
+        for job, future in futures:
+            try:
+                output_path, removed_identifiers = future.result()
+
+            except Exception as err:
+                print("Unable to compile {}: {}".format(job.hivemap_path, err))
+                failures.append((job.hivemap_path, err))
+                continue
+
+            if output_directory is not None:
+                _write_package_files(output_path, project_directory, output_directory)
+
+            print("Compiled {}".format(output_path))
+
+            if removed_identifiers:
+                print("Removed unreachable nodes: {}".format(", ".join(removed_identifiers)))
+
+    return failures
+
+
+def main():
+    parser = ArgumentParser(description="Compile the hivemaps of a project into Python modules")
+    parser.add_argument('project', type=str)
+    parser.add_argument('-output', type=str, default=None,
+                        help="Directory to write modules to (default to writing beside hivemaps)")
+    parser.add_argument('-jobs', type=int, default=None, help="Number of worker processes")
+    parser.add_argument('-force', action='store_true', help="Rebuild unchanged hivemaps")
+    parser.add_argument('-prune', action='store_true',
+                        help="Remove nodes which are not connected to the hive IO or behaviour")
+
+    args = parser.parse_args()
+
+    failures = compile_project(args.project, args.output, args.jobs, args.force, args.prune)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
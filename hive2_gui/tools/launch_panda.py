@@ -5,12 +5,13 @@ from os import chdir
 
 from dragonfly.panda3d import Mainloop
 from hive_editor.debugging.network import NetworkDebugContext
-from hive_editor.code_generator import hivemap_to_python_source
-from hive_editor.models import model
+from hive_editor.code_generator import hivemap_to_hive_class
+from hive_editor.hivemap_io import read_hivemap
 
 
 parser = ArgumentParser(description="Launch Hivemap in Panda3D")
 parser.add_argument('hivemap', type=str)
+parser.add_argument('-dump-source', type=str, default=None, help="Write generated Python source to file")
 parser.set_defaults(debug=False)
 
 subparsers = parser.add_subparsers()
@@ -29,11 +30,8 @@ chdir(directory)
 hive_class_name = "LaunchHive"
 
 # Load hivemap and produce hive
-hivemap = model.Hivemap.fromfile(args.hivemap)
-source = hivemap_to_python_source(hivemap, hive_class_name)
-namespace = {}
-exec(source, namespace)
-hive_class = namespace[hive_class_name]
+hivemap = read_hivemap(args.hivemap)
+hive_class = hivemap_to_hive_class(hivemap, hive_class_name, file_name=args.hivemap, source_dump_path=args.dump_source)
 
 
 # Embed inside Panda mainloop hive
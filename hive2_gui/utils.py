@@ -120,7 +120,7 @@ def get_bind_class_args(hive_cls):
 
 
 def get_io_info(hive_object):
-    """Get UI info for a runtime hive object"""
+    """Get UI info for a hive object, or a HiveObject class (whose external bees are declared on the class)"""
     external_bees = hive_object._hive_ex
 
     inputs = OrderedDict()
@@ -208,6 +208,34 @@ def find_file_path_of_hive_path(hive_path):
         raise ValueError("No hivemap for '{}' exists".format(module_path))
 
 
+def hive_object_class_from_import_result(import_result, meta_args):
+    """Build a HiveObject class using a meta args dictionary, without instantiating it
+
+    :param import_result: HiveImportResult object (tuple)
+    :param meta_args: dictionary of meta args (ignored for meta primitives)
+    """
+    if import_result.is_meta_primitive:
+        return import_result.cls._hive_object_cls
+
+    # Get HiveObject class
+    _, _, hive_object_cls = import_result.cls._build_hive_object_from_arguments((), meta_args)
+    return hive_object_cls
+
+
+def hive_pins_are_declared_on_class(import_result):
+    """Return True if the external bees of a hive are declared on its HiveObject class, so that its pins can be
+    discovered without instantiating it.
+
+    Dyna hives are built when they are instantiated (from their args), so their pins are only declared on instances
+
+    :param import_result: HiveImportResult object (tuple)
+    """
+    if import_result.is_meta_primitive:
+        return True
+
+    return not import_result.cls._is_dyna_hive
+
+
 def hive_object_instance_from_import_result(import_result, params):
     """Instantiate a hive using a parameter dictionary
 
@@ -215,13 +243,7 @@ def hive_object_instance_from_import_result(import_result, params):
     :param params: dictionary of optional (meta_args (if HiveBuilder), args and cls_args)
     """
     try:
-        if import_result.is_meta_primitive:
-            hive_object_cls = import_result.cls._hive_object_cls
-
-        else:
-            # Get HiveObject class
-            meta_args = params.get("meta_args", {})
-            _, _, hive_object_cls = import_result.cls._build_hive_object_from_arguments((), meta_args)
+        hive_object_cls = hive_object_class_from_import_result(import_result, params.get("meta_args", {}))
 
         # Get RuntimeHive instance
         args = params.get("args", {}).copy()
@@ -234,6 +256,26 @@ def hive_object_instance_from_import_result(import_result, params):
         raise RuntimeError("Unable to instantiate Hive class from {}: {}".format(import_result, err))
 
 
+def freeze(value):
+    """Return a hashable (and type-distinguishing) equivalent of a possibly nested container value
+
+    Raises TypeError if the value cannot be made hashable.
+
+    :param value: value to freeze
+    """
+    if isinstance(value, dict):
+        return dict, tuple((k, freeze(v)) for k, v in sorted(value.items(), key=lambda item: item[0]))
+
+    if isinstance(value, (list, tuple)):
+        return value.__class__, tuple(freeze(v) for v in value)
+
+    if isinstance(value, (set, frozenset)):
+        return value.__class__, frozenset(freeze(v) for v in value)
+
+    hash(value)
+    return value.__class__, value
+
+
 def camelcase_to_underscores(name):
     s1 = re_sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
     return re_sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
@@ -13,4 +13,6 @@ setup(name='hive2_gui',
       # Project uses reStructuredText, so ensure that the docutils get
       # installed or upgraded on the target machine
       install_requires=['PyQt5', 'pygments', 'qdarkstyle', 'hive2'],
+      # Native filesystem notifications for project changes (otherwise polled)
+      extras_require={'watch': ['watchdog']},
 )
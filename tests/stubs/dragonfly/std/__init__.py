@@ -0,0 +1,45 @@
+import hive
+
+
+def declare_variable(meta_args):
+    meta_args.data_type = hive.parameter("str", "int")
+
+
+def build_variable(i, ex, args, meta_args):
+    """Store a value of any data type"""
+    args.start_value = hive.parameter(meta_args.data_type)
+    ex.value = hive.output(data_type=meta_args.data_type, mode="pull")
+
+
+Variable = hive.meta_hive("Variable", build_variable, declare_variable)
+BuilderVariable = hive.meta_hive("BuilderVariable", build_variable, declare_variable)
+
+
+def build_add(i, ex, args):
+    """Add two pulled values"""
+    ex.a = hive.antenna(data_type="int", mode="pull")
+    ex.b = hive.antenna(data_type="int", mode="pull")
+    ex.result = hive.output(data_type="int", mode="pull")
+    ex.evaluate = hive.entry()
+    ex.evaluated = hive.hook()
+
+
+Add = hive.hive("Add", build_add)
+
+
+def declare_sum(meta_args):
+    meta_args.data_type = hive.parameter("str", "int")
+
+
+def build_sum(i, ex, args, meta_args):
+    """Sum a number of pulled values"""
+    args.count = hive.parameter("int", 2)
+
+    for index in range(args.count):
+        setattr(ex, "value_{}".format(index), hive.antenna(data_type=meta_args.data_type, mode="pull"))
+
+    ex.result = hive.output(data_type=meta_args.data_type, mode="pull")
+
+
+# Pins depend upon args, so are only declared on instances
+Sum = hive.dyna_hive("Sum", build_sum, declare_sum)
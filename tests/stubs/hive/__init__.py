@@ -0,0 +1,255 @@
+"""Stand-in for the parts of the hive2 API used by hive2_gui, for tests run without hive2.
+
+Hives are built by running their builders with namespaces which record the declared parameters and bees, so that
+their arguments and pins can be inspected. Bees and connections are only recorded, so hive instances do not run.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .interfaces import Antenna, Output, TriggerSource, TriggerTarget, IOModes
+
+
+class _Namespace:
+    """Ordered namespace of a builder (i, ex, args or meta_args), whose declarations are iterated as name, value pairs.
+
+    Reading a parameter returns its value, if one is given, or its start value
+    """
+
+    def __init__(self, values=None):
+        object.__setattr__(self, "_items", OrderedDict())
+        object.__setattr__(self, "_values", {} if values is None else values)
+
+    def __setattr__(self, name, value):
+        self._items[name] = value
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+
+        except KeyError:
+            pass
+
+        try:
+            item = self._items[name]
+
+        except KeyError:
+            raise AttributeError(name)
+
+        if isinstance(item, parameter):
+            return item.start_value
+
+        return item
+
+    def __iter__(self):
+        return iter(self._items.items())
+
+    def __bool__(self):
+        return bool(self._items)
+
+
+class parameter:
+
+    class no_value:
+        pass
+
+    def __init__(self, data_type="", start_value=no_value, options=None):
+        self.data_type = data_type
+        self.start_value = start_value
+        self.options = options
+
+
+class HiveObject:
+
+    def __init__(self, **kwargs):
+        self._hive_arg_values = kwargs
+
+        # Dyna hives are built from their args when they are instantiated
+        if self._hive_parent_class._is_dyna_hive:
+            self._hive_ex = self._hive_parent_class._run_builders(self._hive_meta_arg_values, kwargs)[1]
+
+    def __getattr__(self, name):
+        # External bees are attributes of hive instances
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return getattr(self._hive_ex, name)
+
+
+class HiveBuilder:
+    _builders = ()
+    _declarators = ()
+    _is_dyna_hive = False
+    _hive_meta_args = None
+
+    def __new__(cls, **kwargs):
+        if cls._declarators:
+            return cls._build_hive_object_from_arguments((), kwargs)[2]
+
+        return cls._build(())(**kwargs)
+
+    @classmethod
+    def _hive_build_meta_args_wrapper(cls):
+        meta_args = _Namespace()
+        for declarator in cls._declarators:
+            declarator(meta_args)
+
+        cls._hive_meta_args = meta_args
+
+    @classmethod
+    def _build_hive_object_from_arguments(cls, args, meta_args):
+        cls._hive_build_meta_args_wrapper()
+
+        meta_arg_values = {name: meta_args.get(name, meta_arg.start_value) for name, meta_arg in cls._hive_meta_args}
+        return args, meta_arg_values, cls._build(tuple(sorted(meta_arg_values.items())))
+
+    @classmethod
+    def _run_builders(cls, meta_arg_values, arg_values=None):
+        i, ex, args = _Namespace(), _Namespace(), _Namespace(arg_values)
+
+        for builder, bind_class in cls._builders:
+            if cls._declarators:
+                builder(i, ex, args, _Namespace(meta_arg_values))
+
+            else:
+                builder(i, ex, args)
+
+        return i, ex, args
+
+    @classmethod
+    def _build(cls, meta_args):
+        meta_arg_values = dict(meta_args)
+        i, ex, args = cls._run_builders(meta_arg_values)
+
+        namespace = dict(_hive_parent_class=cls, _hive_args=args, _hive_meta_arg_values=meta_arg_values,
+                         __doc__=cls.__doc__)
+
+        if not cls._is_dyna_hive:
+            namespace["_hive_ex"] = ex
+
+        return type("{}Object".format(cls.__name__), (HiveObject,), namespace)
+
+
+class MetaHivePrimitive:
+    pass
+
+
+def _create_hive_class(name, builder, bind_class, **namespace):
+    builders = () if builder is None else ((builder, bind_class),)
+    namespace.update(_builders=builders, __doc__=getattr(builder, "__doc__", None))
+    return type(name, (HiveBuilder,), namespace)
+
+
+def hive(name, builder=None, bind_class=None):
+    return _create_hive_class(name, builder, bind_class)
+
+
+def dyna_hive(name, builder=None, declarator=None, bind_class=None):
+    declarators = () if declarator is None else (declarator,)
+    return _create_hive_class(name, builder, bind_class, _is_dyna_hive=True, _declarators=declarators)
+
+
+def meta_hive(name, builder=None, declarator=None, bind_class=None):
+    return _create_hive_class(name, builder, bind_class, _declarators=(declarator,))
+
+
+def validate_external_name(name):
+    if name.startswith("_"):
+        raise ValueError("External names cannot start with '_': {}".format(name))
+
+
+def get_base_data_type(data_type):
+    return (data_type or "").split(".")[0]
+
+
+def get_argument_types(func):
+    return {}
+
+
+def get_argument_options(func):
+    return {}
+
+
+@contextmanager
+def matchmaker_validation_enabled_as(enabled):
+    yield
+
+
+class _Bee:
+    """Recorded bee declaration. IO bees of stand-in hives are given their data type and mode as keywords"""
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    @property
+    def data_type(self):
+        return self.kwargs.get("data_type", "")
+
+    @property
+    def mode(self):
+        return self.kwargs.get("mode", IOModes.PUSH)
+
+    def implements(self, interface):
+        return isinstance(self, interface)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and (self.args, self.kwargs) == (other.args, other.kwargs)
+
+    def __repr__(self):
+        return "{}{}{}".format(type(self).__name__, self.args, self.kwargs)
+
+
+class attribute(_Bee):
+    pass
+
+
+class modifier(_Bee):
+    pass
+
+
+class triggerfunc(_Bee):
+    pass
+
+
+class antenna(_Bee, Antenna):
+    pass
+
+
+class output(_Bee, Output):
+    pass
+
+
+class entry(_Bee, TriggerTarget):
+    pass
+
+
+class hook(_Bee, TriggerSource):
+    pass
+
+
+class pull_in(_Bee):
+    pass
+
+
+class pull_out(_Bee):
+    pass
+
+
+class push_in(_Bee):
+    pass
+
+
+class push_out(_Bee):
+    pass
+
+
+# Connections made by builders, in order
+connections = []
+
+
+def connect(source, target):
+    connections.append(("connect", source, target))
+
+
+def trigger(source, target, pretrigger=False):
+    connections.append(("trigger", source, target, pretrigger))
@@ -0,0 +1,23 @@
+class Antenna:
+    pass
+
+
+class Output:
+    pass
+
+
+class TriggerSource:
+    pass
+
+
+class TriggerTarget:
+    pass
+
+
+class Nameable:
+    pass
+
+
+class IOModes:
+    PUSH = "push"
+    PULL = "pull"
@@ -0,0 +1,25 @@
+class MatchFlags:
+    none = 0
+    match_shortest = 1
+    permit_any = 2
+
+
+def _split_data_type(data_type):
+    return tuple(data_type.split(".")) if data_type else ()
+
+
+def data_types_match(source, target, flags=MatchFlags.none):
+    """Return True if dotted data types match, comparing only their common prefix if MatchFlags.match_shortest is set,
+    and permitting untyped data types if MatchFlags.permit_any is set
+    """
+    source_parts = _split_data_type(source)
+    target_parts = _split_data_type(target)
+
+    if not (source_parts and target_parts):
+        return bool(flags & MatchFlags.permit_any) or source_parts == target_parts
+
+    if flags & MatchFlags.match_shortest:
+        length = min(len(source_parts), len(target_parts))
+        return source_parts[:length] == target_parts[:length]
+
+    return source_parts == target_parts
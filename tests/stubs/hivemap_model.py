@@ -0,0 +1,91 @@
+"""Stand-in for the Spyder types of hive2_gui/models/model.spy, for tests run without Spyder.
+
+Fields are assigned by position or keyword, and hivemaps are serialised as Python literals
+"""
+from ast import literal_eval
+from copy import deepcopy
+
+
+class _Type:
+    fields = ()
+    defaults = {}
+
+    def __init__(self, *args, **kwargs):
+        values = deepcopy(self.defaults)
+        values.update(zip(self.fields, args))
+        values.update(kwargs)
+
+        for name in self.fields:
+            setattr(self, name, values[name])
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_literal() == other.to_literal()
+
+    def __repr__(self):
+        return "{}{!r}".format(type(self).__name__, self.to_literal())
+
+    def to_literal(self):
+        return tuple(getattr(self, name) for name in self.fields)
+
+
+class Coordinate2D(_Type):
+    fields = ("x", "y")
+
+
+class InstanceParameter(_Type):
+    fields = ("identifier", "data_type", "value")
+
+
+class InstanceParameterGroup(_Type):
+    fields = ("identifier", "params")
+
+    def to_literal(self):
+        return self.identifier, [p.to_literal() for p in self.params]
+
+
+class Node(_Type):
+    fields = ("identifier", "family", "reference_path", "position", "parameter_groups", "folded_pins")
+    defaults = dict(position=(0.0, 0.0), parameter_groups=[], folded_pins=[])
+
+    def __setattr__(self, name, value):
+        if name == "position" and not isinstance(value, Coordinate2D):
+            value = Coordinate2D(*value)
+
+        super().__setattr__(name, value)
+
+    def to_literal(self):
+        return (self.identifier, self.family, self.reference_path, self.position.to_literal(),
+                [g.to_literal() for g in self.parameter_groups], list(self.folded_pins))
+
+
+class Connection(_Type):
+    fields = ("from_node", "output_name", "to_node", "input_name", "is_trigger")
+
+
+class Hivemap(_Type):
+    fields = ("nodes", "connections", "docstring")
+    defaults = dict(nodes=[], connections=[], docstring="")
+
+    def __init__(self, *args, **kwargs):
+        # Parse serialised hivemap
+        if len(args) == 1 and isinstance(args[0], str):
+            nodes, connections, docstring = literal_eval(args[0])
+            args = ([_node_from_literal(n) for n in nodes], [Connection(*c) for c in connections], docstring)
+
+        super().__init__(*args, **kwargs)
+
+    def __str__(self):
+        return repr(self.to_literal())
+
+    def to_literal(self):
+        return [n.to_literal() for n in self.nodes], [c.to_literal() for c in self.connections], self.docstring
+
+
+def _node_from_literal(literal):
+    identifier, family, reference_path, position, parameter_groups, folded_pins = literal
+    parameter_groups = [InstanceParameterGroup(group_identifier, [InstanceParameter(*p) for p in params])
+                        for group_identifier, params in parameter_groups]
+    return Node(identifier, family, reference_path, position, parameter_groups, folded_pins)
+
+
+types = (Coordinate2D, InstanceParameter, InstanceParameterGroup, Node, Connection, Hivemap)
@@ -0,0 +1,110 @@
+import unittest
+from collections import OrderedDict
+
+from hive2_gui.cache import InspectionCache, inspection_cache
+from hive2_gui.inspector import HiveNodeInspector, InspectorOption
+
+
+class InspectionCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = InspectionCache()
+
+    def test_get_set(self):
+        self.cache.set("module.Hive", {"data_type": "int"}, "int value")
+        self.cache.set("module.Hive", {"data_type": "float"}, "float value")
+
+        self.assertEqual(self.cache.get("module.Hive", {"data_type": "int"}), "int value")
+        self.assertEqual(self.cache.get("module.Hive", {"data_type": "float"}), "float value")
+        self.assertRaises(KeyError, self.cache.get, "module.Hive", {"data_type": "str"})
+        self.assertRaises(KeyError, self.cache.get, "module.Other", {"data_type": "int"})
+
+    def test_meta_args_are_distinguished_by_type(self):
+        self.cache.set("module.Hive", {"value": 1}, "int value")
+
+        self.assertRaises(KeyError, self.cache.get, "module.Hive", {"value": 1.0})
+        self.assertRaises(KeyError, self.cache.get, "module.Hive", {"value": True})
+
+    def test_unhashable_meta_args(self):
+        meta_args = {"value": bytearray(b"data")}
+        self.cache.set("module.Hive", meta_args, "value")
+
+        self.assertRaises(KeyError, self.cache.get, "module.Hive", meta_args)
+
+    def test_invalidate(self):
+        self.cache.set("module.Hive", {}, "value")
+        self.cache.set("module.Other", {}, "value")
+
+        self.cache.invalidate("module.Hive")
+
+        self.assertNotIn("module.Hive", self.cache)
+        self.assertIn("module.Other", self.cache)
+
+    def test_entries_keep_meta_args(self):
+        meta_args = {"values": [1, 2]}
+        self.cache.set("module.Hive", meta_args, "value")
+        meta_args["values"].append(3)
+
+        self.assertEqual(self.cache.get_entries("module.Hive"), [({"values": [1, 2]}, "value")])
+        self.assertEqual(self.cache.get_entries("module.Other"), [])
+
+
+class _CountingInspector(HiveNodeInspector):
+    """Inspector of hives with a meta args stage and an args stage, which counts its inspections"""
+
+    def __init__(self):
+        self.inspection_count = 0
+
+    def inspect(self, reference_path):
+        self.inspection_count += 1
+        return self._inspect_stages()
+
+    @staticmethod
+    def _inspect_stages():
+        meta_args = yield ("meta_args", OrderedDict(data_type=InspectorOption("str", "int", options={"int", "str"})))
+        yield ("args", OrderedDict(start_value=InspectorOption(meta_args["data_type"], {"values": [1, 2]})))
+
+
+class InspectConfiguredTestCase(unittest.TestCase):
+
+    reference_path = "test_cache.Hive"
+
+    def setUp(self):
+        self.inspector = _CountingInspector()
+        inspection_cache.invalidate(self.reference_path)
+        self.addCleanup(inspection_cache.invalidate, self.reference_path)
+
+    @staticmethod
+    def get_params(data_type):
+        return {"meta_args": {"data_type": data_type}, "args": {"start_value": None}}
+
+    def test_results_are_cached_by_meta_args(self):
+        first = self.inspector.inspect_configured(self.reference_path, self.get_params("int"))
+        second = self.inspector.inspect_configured(self.reference_path, self.get_params("int"))
+
+        self.assertEqual(self.inspector.inspection_count, 1)
+        self.assertEqual(list(first), ["meta_args", "args"])
+        self.assertEqual(second["args"]["start_value"].data_type, "int")
+
+        self.inspector.inspect_configured(self.reference_path, self.get_params("str"))
+        self.assertEqual(self.inspector.inspection_count, 2)
+
+    def test_results_are_not_shared(self):
+        params = self.get_params("int")
+
+        first = self.inspector.inspect_configured(self.reference_path, params)
+        first["args"]["start_value"].default["values"].append(3)
+        first["meta_args"]["data_type"].options.add("float")
+
+        second = self.inspector.inspect_configured(self.reference_path, params)
+        self.assertEqual(second["args"]["start_value"].default, {"values": [1, 2]})
+        self.assertEqual(second["meta_args"]["data_type"].options, {"int", "str"})
+
+        second["args"]["start_value"].default["values"].clear()
+
+        third = self.inspector.inspect_configured(self.reference_path, params)
+        self.assertEqual(third["args"]["start_value"].default, {"values": [1, 2]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,411 @@
+import sys
+import unittest
+from unittest import mock
+
+import hive
+
+import hive2_gui
+from hive2_gui.code_generator import (AttributeDeclaration, ConnectionStatement, HiveDeclaration, HivemapPlan,
+                                      IODeclaration, ModifierDeclaration, TriggerfuncDeclaration, WrapperDeclaration,
+                                      canonicalise_plan, decode_parameter_value, hivemap_to_hive_class,
+                                      hivemap_to_python_source, parameter_array_to_dict, parameter_decoders,
+                                      parameter_dict_to_array, plan_to_builder, plan_to_python_source,
+                                      prune_unreachable_nodes, register_parameter_decoder)
+from hive2_gui.models import model
+
+
+def _create_plan():
+    declarations = [HiveDeclaration("adder", "dragonfly.std.Add", [{"data_type": "int"}]),
+                    AttributeDeclaration("i", "value", "int", "0"),
+                    WrapperDeclaration("value_out", "hive.pull_out", ("i", "value")),
+                    ModifierDeclaration("report"),
+                    WrapperDeclaration("value_in", "hive.push_in", ("i", "value"))]
+    connections = [ConnectionStatement(("i", "value_out"), ("i", "adder", "a"), False, False),
+                   ConnectionStatement(("i", "adder", "result"), ("i", "value_in"), False, False)]
+    io_declarations = [IODeclaration("result", "hive.output", ("i", "adder", "result")),
+                       IODeclaration("value", "hive.antenna", ("i", "value_in"))]
+    return HivemapPlan(["hive_editor", "hive", "dragonfly.std", "dragonfly.event"], "Docstring",
+                       [("report", "print(self)"), ("other", "pass")], declarations, connections, io_declarations)
+
+
+def _reverse_plan(plan):
+    """Return plan with imports, modifiers and declarations in reverse order"""
+    return plan._replace(imports=plan.imports[::-1], modifiers=plan.modifiers[::-1],
+                         declarations=plan.declarations[::-1])
+
+
+class CanonicalPlanTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.plan = _create_plan()
+
+    def test_node_order(self):
+        canonical_plan = canonicalise_plan(self.plan)
+
+        self.assertEqual(canonicalise_plan(_reverse_plan(self.plan)), canonical_plan)
+        self.assertEqual(plan_to_python_source(canonicalise_plan(_reverse_plan(self.plan)), "Hive"),
+                         plan_to_python_source(canonical_plan, "Hive"))
+
+    def test_imports(self):
+        canonical_plan = canonicalise_plan(_reverse_plan(self.plan))
+
+        self.assertEqual(canonical_plan.imports, ["hive_editor", "hive", "dragonfly.event", "dragonfly.std"])
+
+    def test_wrappers_follow_attributes(self):
+        declarations = canonicalise_plan(_reverse_plan(self.plan)).declarations
+
+        self.assertEqual([d.identifier for d in declarations], ["adder", "report", "value", "value_in", "value_out"])
+
+    def test_connection_order_is_kept(self):
+        plan = self.plan._replace(connections=self.plan.connections[::-1],
+                                  io_declarations=self.plan.io_declarations[::-1])
+
+        canonical_plan = canonicalise_plan(plan)
+        self.assertEqual(canonical_plan.connections, plan.connections)
+        self.assertEqual(canonical_plan.io_declarations, plan.io_declarations)
+        self.assertNotEqual(canonical_plan, canonicalise_plan(self.plan))
+
+
+_plan_source_lines = [
+    "# Imports",
+    "import hive_editor",
+    "import hive",
+    "import dragonfly.std",
+    "import dragonfly.event",
+    "",
+    "",
+    "def builder(i, ex, args):",
+    '    """Docstring"""',
+    "    # Declarations",
+    "    def other(self):",
+    "        pass",
+    "    ",
+    "    def report(self):",
+    "        print(self)",
+    "    ",
+    "    i.adder = dragonfly.std.Add(data_type='int')",
+    "    i.value = hive.attribute('int', 0)",
+    "    i.value_out = hive.pull_out(i.value)",
+    "    i.report = hive.modifier(report)",
+    "    i.value_in = hive.push_in(i.value)",
+    "    ",
+    "    # Connectivity",
+    "    hive.connect(i.value_out, i.adder.a)",
+    "    hive.connect(i.adder.result, i.value_in)",
+    "    ",
+    "    # IO",
+    "    ex.result = hive.output(i.adder.result)",
+    "    ex.value = hive.antenna(i.value_in)",
+    "    ",
+    "    ",
+    "Hive = hive.hive('Hive', builder=builder)"]
+
+
+def _create_hivemap():
+    def parameter_group(identifier, *params):
+        return model.InstanceParameterGroup(identifier, [model.InstanceParameter(*p) for p in params])
+
+    nodes = [model.Node("add", "HIVE", "dragonfly.std.Add", (0.0, 0.0), [], []),
+             model.Node("value", "BEE", "hive.attribute", (0.0, 0.0),
+                        [parameter_group("meta_args", ("data_type", "str", "int")),
+                         parameter_group("args", ("start_value", "int", "1"), ("export", "bool", "False"))], []),
+             model.Node("pull_value", "BEE", "hive.pull_out", (0.0, 0.0),
+                        [parameter_group("meta_args", ("attribute_name", "str", "value"))], []),
+             model.Node("evaluate", "BEE", "hive.modifier", (0.0, 0.0),
+                        [parameter_group("args", ("code", "str", "print(1)\nprint(2)"))], []),
+             model.Node("result", "BEE", "hive.output", (0.0, 0.0), [], [])]
+    connections = [model.Connection("pull_value", "value", "add", "a", False),
+                   model.Connection("add", "result", "result", "output", False)]
+    return model.Hivemap(nodes, connections, "Add one")
+
+
+class PythonSourceTestCase(unittest.TestCase):
+
+    def test_plan_to_python_source(self):
+        self.assertEqual(plan_to_python_source(_create_plan(), "Hive"), "\n".join(_plan_source_lines))
+
+    def test_empty_plan(self):
+        source = plan_to_python_source(HivemapPlan(["hive"], "", [], [], [], []), "Empty", builder_name="build")
+
+        self.assertEqual(source, "\n".join(["# Imports", "import hive", "", "", "def build(i, ex, args):", "    pass",
+                                            "Empty = hive.hive('Empty', builder=build)"]))
+
+    def test_docstring(self):
+        plan = HivemapPlan(["hive"], 'First "line"\nSecond line', [], [], [], [])
+        source = plan_to_python_source(plan, "Hive")
+
+        self.assertIn('    """First \\"line\\"\n    Second line\n    """', source)
+
+        namespace = {}
+        exec(source, namespace)
+        self.assertEqual(namespace["builder"].__doc__, 'First "line"\n    Second line\n    ')
+
+    def test_hivemap_to_python_source(self):
+        source = hivemap_to_python_source(_create_hivemap(), "AddOne", import_editor=False)
+
+        self.assertIn("i.add = dragonfly.std.Add()", source)
+        self.assertIn("i.value = hive.attribute('int', 1)", source)
+        self.assertIn("i.pull_value = hive.pull_out(i.value)", source)
+        self.assertIn("    def evaluate(self):\n        print(1)\n        print(2)\n", source)
+        self.assertIn("hive.connect(i.pull_value, i.add.a)", source)
+        self.assertIn("ex.result = hive.output(i.add.result)", source)
+
+        # Source builds a hive
+        namespace = {}
+        exec(source, namespace)
+
+        hive_object_cls = namespace["AddOne"]._build(())
+        self.assertEqual(hive_object_cls.__doc__, "Add one")
+        self.assertEqual([name for name, _ in hive_object_cls._hive_ex], ["result"])
+
+    def test_invalid_names(self):
+        self.assertRaises(ValueError, hivemap_to_python_source, _create_hivemap(), "Add One")
+        self.assertRaises(ValueError, hivemap_to_python_source, _create_hivemap(), "AddOne", builder_name="1")
+
+
+def _describe(value):
+    """Return comparable description of a value declared by a builder"""
+    if isinstance(value, hive._Bee):
+        return type(value).__name__, [_describe(a) for a in value.args], value.kwargs
+
+    if isinstance(value, hive.HiveObject):
+        return type(value).__name__, value._hive_arg_values
+
+    if callable(value):
+        return value.__name__
+
+    return value
+
+
+def _run_builder(builder, args=None):
+    """Run builder with recording wrappers, and return description of declarations and connections"""
+    i, ex, builder_args = hive._Namespace(), hive._Namespace(), hive._Namespace(args)
+    del hive.connections[:]
+
+    builder(i, ex, builder_args)
+
+    connections = [tuple(_describe(v) for v in c) for c in hive.connections]
+    return [(n, _describe(v)) for n, v in i], [(n, _describe(v)) for n, v in ex], connections
+
+
+def _create_builder_plan():
+    declarations = [HiveDeclaration("adder", "dragonfly.std.Add", [{}]),
+                    HiveDeclaration("variable", "dragonfly.std.Variable", [{"data_type": "int"}, {"start_value": 2}]),
+                    AttributeDeclaration("i", "value", "int", "0"),
+                    AttributeDeclaration("ex", "values", "list", "[1, 2]"),
+                    WrapperDeclaration("value_out", "hive.pull_out", ("i", "value")),
+                    ModifierDeclaration("report"),
+                    TriggerfuncDeclaration("trigger")]
+    connections = [ConnectionStatement(("i", "value_out"), ("i", "adder", "a"), False, False),
+                   ConnectionStatement(("i", "trigger"), ("i", "report"), True, True),
+                   ConnectionStatement(("i", "adder", "evaluated"), ("i", "report"), True, False)]
+    io_declarations = [IODeclaration("result", "hive.output", ("i", "adder", "result"))]
+    return HivemapPlan(["hive", "dragonfly.std"], "Docstring\nof hive", [("report", "return args.name")],
+                       declarations, connections, io_declarations)
+
+
+class BuilderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(hive.connections.clear)
+
+    def test_matches_python_source(self):
+        plan = _create_builder_plan()
+
+        namespace = {}
+        exec(plan_to_python_source(plan, "Hive"), namespace)
+
+        builder = plan_to_builder(plan)
+        self.assertEqual(_run_builder(builder), _run_builder(namespace["builder"]))
+        self.assertEqual(builder.__doc__, namespace["builder"].__doc__)
+        self.assertEqual(builder.__name__, "builder")
+
+    def test_declarations(self):
+        i, ex, connections = _run_builder(plan_to_builder(_create_builder_plan()))
+
+        self.assertEqual([n for n, _ in i], ["adder", "variable", "value", "value_out", "report", "trigger"])
+        self.assertEqual(dict(i)["value"], ("attribute", ["int", 0], {}))
+        self.assertEqual(dict(ex)["values"], ("attribute", ["list", [1, 2]], {}))
+        self.assertEqual(dict(ex)["result"], ("output", [("output", [], {"data_type": "int", "mode": "pull"})], {}))
+        self.assertEqual(connections[1], ("trigger", ("triggerfunc", [], {}), ("modifier", ["report"], {}), True))
+
+    def test_modifiers_access_builder_args(self):
+        builder = plan_to_builder(_create_builder_plan())
+
+        i = hive._Namespace()
+        builder(i, hive._Namespace(), hive._Namespace(dict(name="hive")))
+
+        modifier, = dict(i)["report"].args
+        self.assertEqual(modifier(None), "hive")
+        self.assertEqual(modifier.__qualname__, "builder.<locals>.report")
+
+    def test_start_values_are_not_shared(self):
+        builder = plan_to_builder(_create_builder_plan())
+
+        first_ex, second_ex = hive._Namespace(), hive._Namespace()
+        builder(hive._Namespace(), first_ex, hive._Namespace())
+        builder(hive._Namespace(), second_ex, hive._Namespace())
+
+        self.assertIsNot(first_ex.values.args[1], second_ex.values.args[1])
+
+    def test_start_values_are_not_evaluated(self):
+        plan = _create_builder_plan()
+        declaration = AttributeDeclaration("i", "value", "int", "__import__('os').getcwd()")
+
+        self.assertRaises(ValueError, plan_to_builder, plan._replace(declarations=[declaration]))
+
+    def test_imports_are_written_to_namespace(self):
+        namespace = {}
+        plan_to_builder(_create_builder_plan(), namespace)
+
+        self.assertIs(namespace["hive"], hive)
+        self.assertIn("dragonfly", namespace)
+
+    def test_hivemap_to_hive_class(self):
+        namespace = {}
+
+        # Built hives import the editor package by its installed name
+        with mock.patch.dict(sys.modules, hive_editor=hive2_gui):
+            hive_cls = hivemap_to_hive_class(_create_hivemap(), "AddOne", namespace=namespace)
+
+        self.assertIs(namespace["AddOne"], hive_cls)
+        self.assertEqual([n for n, _ in hive_cls._build(())._hive_ex], ["result"])
+
+
+def _create_pruning_plan(io_declarations=(), modifiers=(), connections=()):
+    declarations = [HiveDeclaration("tick", "dragonfly.event.Tick", [{}]),
+                    HiveDeclaration("adder", "dragonfly.std.Add", [{}]),
+                    HiveDeclaration("unused", "dragonfly.std.Variable", [{"data_type": "int"}, {}]),
+                    AttributeDeclaration("i", "value", "int", "0"),
+                    WrapperDeclaration("value_out", "hive.pull_out", ("i", "value"))]
+    declarations.extend([ModifierDeclaration(identifier) for identifier, _ in modifiers])
+
+    connections = [ConnectionStatement(("i", "value_out"), ("i", "adder", "a"), False, False)] + list(connections)
+    return HivemapPlan(["hive", "dragonfly.event", "dragonfly.std"], "", list(modifiers), declarations, connections,
+                       list(io_declarations))
+
+
+def _get_identifiers(plan):
+    return {d.identifier for d in plan.declarations}
+
+
+class PruneTestCase(unittest.TestCase):
+
+    def test_io(self):
+        plan = _create_pruning_plan([IODeclaration("result", "hive.output", ("i", "adder", "result"))])
+        pruned_plan, removed_identifiers = prune_unreachable_nodes(plan)
+
+        self.assertEqual(_get_identifiers(pruned_plan), {"adder", "value", "value_out"})
+        self.assertEqual(set(removed_identifiers), {"tick", "unused"})
+        self.assertEqual(pruned_plan.imports, ["hive", "dragonfly.std"])
+        self.assertEqual(pruned_plan.connections, plan.connections)
+
+    def test_modifiers_without_io(self):
+        connections = [ConnectionStatement(("i", "tick", "on_tick"), ("i", "report"), True, False)]
+        plan = _create_pruning_plan(modifiers=[("report", "print(i.value)")], connections=connections)
+
+        pruned_plan, removed_identifiers = prune_unreachable_nodes(plan)
+
+        # Modifier code may use any attribute
+        self.assertEqual(removed_identifiers, ["unused"])
+        self.assertEqual(_get_identifiers(pruned_plan), {"tick", "adder", "value", "value_out", "report"})
+        self.assertEqual(pruned_plan.modifiers, plan.modifiers)
+
+    def test_trigger_sources_without_io(self):
+        connections = [ConnectionStatement(("i", "tick", "on_tick"), ("i", "adder", "evaluate"), True, False)]
+        plan = _create_pruning_plan(connections=connections)
+
+        pruned_plan, removed_identifiers = prune_unreachable_nodes(plan)
+
+        self.assertEqual(removed_identifiers, ["unused"])
+        self.assertEqual(pruned_plan.connections, plan.connections)
+
+    def test_nothing_connected(self):
+        pruned_plan, removed_identifiers = prune_unreachable_nodes(_create_pruning_plan())
+
+        self.assertEqual(set(removed_identifiers), {"tick", "adder", "unused", "value", "value_out"})
+        self.assertEqual(pruned_plan.declarations, [])
+        self.assertEqual(pruned_plan.connections, [])
+
+    def test_unchanged_plan(self):
+        connections = [ConnectionStatement(("i", "tick", "on_tick"), ("i", "adder", "evaluate"), True, False),
+                       ConnectionStatement(("i", "value_out"), ("i", "unused", "value"), False, False)]
+        plan = _create_pruning_plan(connections=connections)
+
+        pruned_plan, removed_identifiers = prune_unreachable_nodes(plan)
+
+        self.assertEqual(removed_identifiers, [])
+        self.assertIs(pruned_plan, plan)
+
+
+class DecodeParameterTestCase(unittest.TestCase):
+
+    def test_decoders(self):
+        self.assertEqual(decode_parameter_value("str", "some text"), "some text")
+        self.assertIs(decode_parameter_value("bool", "True"), True)
+        self.assertIs(decode_parameter_value("bool", "False"), False)
+        self.assertIsNone(decode_parameter_value("NoneType", "None"))
+        self.assertEqual(decode_parameter_value("int", "-12"), -12)
+        self.assertEqual(decode_parameter_value("float", "1.5e3"), 1500.0)
+        self.assertEqual(decode_parameter_value("tuple", "(1, -2.5, +3,)"), (1, -2.5, 3))
+        self.assertEqual(decode_parameter_value("tuple", "()"), ())
+        self.assertEqual(decode_parameter_value("list", "[1.0, 2]"), [1.0, 2])
+        self.assertEqual(decode_parameter_value("vector", "(0.0, 1.0, 0.0)"), (0.0, 1.0, 0.0))
+
+    def test_number_types(self):
+        self.assertIsInstance(decode_parameter_value("tuple", "(1, 2)")[0], int)
+        self.assertIsInstance(decode_parameter_value("tuple", "(1.0, 2)")[0], float)
+
+    def test_literal_eval_fallback(self):
+        # Values which the decoder of their data type cannot handle
+        self.assertEqual(decode_parameter_value("tuple", "('a', (1, 2))"), ("a", (1, 2)))
+        self.assertEqual(decode_parameter_value("list", "[[1], {'a': None}]"), [[1], {"a": None}])
+        self.assertEqual(decode_parameter_value("int", "0x10"), 16)
+
+        # Data types without decoders
+        self.assertEqual(decode_parameter_value("dict", "{'a': 1}"), {"a": 1})
+        self.assertEqual(decode_parameter_value("set", "{1, 2}"), {1, 2})
+
+    def test_values_are_not_evaluated(self):
+        for data_type in ("int", "dict", "tuple"):
+            self.assertRaises(ValueError, decode_parameter_value, data_type, "__import__('os').getcwd()")
+
+        self.assertRaises(ValueError, decode_parameter_value, "int", "1 +")
+
+    def test_register_parameter_decoder(self):
+        self.addCleanup(parameter_decoders.pop, "colour_name")
+
+        def decode_colour_name(value):
+            try:
+                return {"red": (1.0, 0.0, 0.0), "green": (0.0, 1.0, 0.0)}[value]
+
+            except KeyError:
+                raise ValueError(value)
+
+        register_parameter_decoder("colour_name", decode_colour_name)
+
+        self.assertEqual(decode_parameter_value("colour_name", "red"), (1.0, 0.0, 0.0))
+
+        # Values the decoder rejects fall back to literal_eval
+        self.assertEqual(decode_parameter_value("colour_name", "(0.0, 0.0, 1.0)"), (0.0, 0.0, 1.0))
+        self.assertRaises(ValueError, decode_parameter_value, "colour_name", "blue")
+
+    def test_decoder_type_errors(self):
+        self.addCleanup(parameter_decoders.pop, "strict")
+
+        def decode_strict(value):
+            raise TypeError(value)
+
+        register_parameter_decoder("strict", decode_strict)
+        self.assertEqual(decode_parameter_value("strict", "[1]"), [1])
+
+    def test_round_trip(self):
+        params = dict(a=1, b=2.5, c=True, d=None, e=(1, 2.0), f=[3, 4], g={"x": (1, 2)})
+        array = parameter_dict_to_array(params)
+
+        self.assertEqual([p.data_type for p in array], ["int", "float", "bool", "NoneType", "tuple", "list", "dict"])
+        self.assertEqual(parameter_array_to_dict(array), params)
+
+
+if __name__ == "__main__":
+    unittest.main()
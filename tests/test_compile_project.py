@@ -0,0 +1,182 @@
+import io
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from hive2_gui import importer
+from hive2_gui.models import model
+from hive2_gui.tools import compile_project
+
+
+_adder_source = """import hive
+
+
+def build_adder(i, ex, args):
+    ex.a = hive.antenna(data_type="int", mode="pull")
+    ex.result = hive.output(data_type="int", mode="pull")
+
+
+Adder = hive.hive("Adder", build_adder)
+"""
+
+
+def _write_hivemap(file_path, nodes, connections=()):
+    with open(file_path, "w") as f:
+        f.write(str(model.Hivemap(nodes, list(connections), "")))
+
+
+class CompileProjectTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.project_directory = os.path.join(directory.name, "project")
+        self.output_directory = os.path.join(directory.name, "output")
+        os.mkdir(self.project_directory)
+
+        self.adder_path = self.get_project_path("adder.py")
+        with open(self.adder_path, "w") as f:
+            f.write(_adder_source)
+
+        self.inner_path = self.get_project_path("inner_hive.hivemap")
+        _write_hivemap(self.inner_path, [model.Node("add", "HIVE", "adder.Adder"),
+                                         model.Node("result", "BEE", "hive.output")],
+                       [model.Connection("add", "result", "result", "output", False)])
+
+        self.outer_path = self.get_project_path("outer_hive.hivemap")
+        _write_hivemap(self.outer_path, [model.Node("inner", "HIVE", "inner_hive.InnerHive")])
+
+    def get_project_path(self, *names):
+        return os.path.join(self.project_directory, *names)
+
+    def run_main(self, *args):
+        """Run command line tool, and return its output"""
+        stdout = io.StringIO()
+        argv = ["compile_project", self.project_directory, "-jobs", "1"] + list(args)
+
+        with mock.patch.object(sys, "argv", argv), redirect_stdout(stdout):
+            compile_project.main()
+
+        return stdout.getvalue()
+
+    def test_compile(self):
+        output = self.run_main()
+        self.assertIn("2 hivemaps to compile", output)
+
+        with open(self.get_project_path("inner_hive.py")) as f:
+            source = f.read()
+
+        self.assertTrue(source.startswith("# Generated from inner_hive.hivemap by compile_project, do not edit\n"))
+        self.assertIn("import adder\n", source)
+        self.assertIn("ex.result = hive.output(i.add.result)", source)
+        self.assertIn("InnerHive = hive.hive('InnerHive', builder=builder)", source)
+        self.assertNotIn("hive_editor", source)
+
+        self.assertEqual(compile_project.read_stamp(self.get_project_path("inner_hive.py")),
+                         compile_project.get_stamp(self.inner_path, dependency_paths=[self.adder_path]))
+
+    def test_unchanged_hivemaps_are_not_compiled(self):
+        self.run_main()
+
+        self.assertIn("0 hivemaps to compile", self.run_main())
+        self.assertIn("2 hivemaps to compile", self.run_main("-force"))
+
+    def test_changed_dependency(self):
+        self.run_main()
+
+        # Dependencies of nested hivemaps are also stamped
+        with open(self.adder_path, "a") as f:
+            f.write("\n# Changed\n")
+
+        self.assertIn("2 hivemaps to compile", self.run_main())
+
+    def test_changed_nested_hivemap(self):
+        self.run_main()
+
+        _write_hivemap(self.inner_path, [model.Node("add", "HIVE", "adder.Adder")])
+
+        output = self.run_main()
+        self.assertIn("2 hivemaps to compile", output)
+
+    def test_prune(self):
+        self.run_main()
+
+        # Stamps include generator options
+        output = self.run_main("-prune")
+        self.assertIn("2 hivemaps to compile", output)
+
+        self.assertTrue(compile_project.read_stamp(self.get_project_path("outer_hive.py")).endswith(" pruned"))
+
+    def test_output_directory(self):
+        package_directory = self.get_project_path("package")
+        os.mkdir(package_directory)
+        open(os.path.join(package_directory, "__init__.py"), "w").close()
+
+        _write_hivemap(os.path.join(package_directory, "nested_hive.hivemap"),
+                       [model.Node("inner", "HIVE", "inner_hive.InnerHive")])
+
+        self.run_main("-output", self.output_directory)
+
+        self.assertTrue(os.path.exists(os.path.join(self.output_directory, "inner_hive.py")))
+        self.assertTrue(os.path.exists(os.path.join(self.output_directory, "package", "nested_hive.py")))
+        self.assertTrue(os.path.exists(os.path.join(self.output_directory, "package", "__init__.py")))
+        self.assertFalse(os.path.exists(self.get_project_path("inner_hive.py")))
+
+    def test_failure(self):
+        with open(self.get_project_path("invalid_hive.hivemap"), "w") as f:
+            f.write("invalid")
+
+        with self.assertRaises(SystemExit) as context:
+            self.run_main()
+
+        self.assertEqual(context.exception.code, 1)
+        self.assertTrue(os.path.exists(self.get_project_path("inner_hive.py")))
+
+    def test_dependency_paths(self):
+        self.assertEqual(compile_project.get_dependency_paths(self.outer_path, self.project_directory),
+                         [self.adder_path, self.inner_path])
+        self.assertEqual(compile_project.get_dependency_paths(self.inner_path, self.project_directory),
+                         [self.adder_path])
+
+        # Hives outside of the project are not stamped
+        _write_hivemap(self.inner_path, [model.Node("add", "HIVE", "dragonfly.std.Add")])
+        self.assertEqual(compile_project.get_dependency_paths(self.outer_path, self.project_directory),
+                         [self.inner_path])
+
+    def test_recursive_dependency(self):
+        _write_hivemap(self.inner_path, [model.Node("outer", "HIVE", "outer_hive.OuterHive")])
+
+        self.assertEqual(compile_project.get_dependency_paths(self.outer_path, self.project_directory),
+                         [self.inner_path])
+
+
+class InitialiseWorkerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        meta_path = sys.meta_path[:]
+        self.addCleanup(setattr, sys, "meta_path", meta_path)
+        self.addCleanup(setattr, importer, "_finder", importer.get_hook())
+
+        path = sys.path[:]
+        self.addCleanup(setattr, sys, "path", path)
+
+    def test_hook_is_first(self):
+        compile_project._initialise_worker("project")
+
+        self.assertIs(sys.meta_path[0], importer.get_hook())
+        self.assertEqual(sys.meta_path.count(importer.get_hook()), 1)
+        self.assertEqual(sys.path[0], "project")
+
+    def test_hook_is_installed(self):
+        importer.uninstall_hook()
+        compile_project._initialise_worker("project")
+
+        self.assertIsNotNone(importer.get_hook())
+        self.assertIs(sys.meta_path[0], importer.get_hook())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from hive2_gui import factory
+from hive2_gui.cache import clear_caches
+from hive2_gui.utils import hive_import_from_path, hive_pins_are_declared_on_class
+
+
+class HiveNodeFactoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    def create_node(self, hive_factory, reference_path, params):
+        with mock.patch.object(factory, "hive_object_instance_from_import_result",
+                               wraps=factory.hive_object_instance_from_import_result) as instantiate:
+            node = hive_factory.new("node", reference_path, params, {})
+
+        return node, instantiate.call_count
+
+    def test_pins_are_declared_on_class(self):
+        self.assertTrue(hive_pins_are_declared_on_class(hive_import_from_path("dragonfly.std.Add")))
+        self.assertTrue(hive_pins_are_declared_on_class(hive_import_from_path("dragonfly.std.Variable")))
+        self.assertFalse(hive_pins_are_declared_on_class(hive_import_from_path("dragonfly.std.Sum")))
+
+    def test_class_pins(self):
+        node, instantiate_count = self.create_node(factory.HiveNodeFactory(), "dragonfly.std.Variable",
+                                                   dict(meta_args=dict(data_type="float"), args={}))
+
+        self.assertEqual(instantiate_count, 0)
+        self.assertEqual(list(node.outputs), ["value"])
+        self.assertEqual(node.outputs["value"].data_type, "float")
+        self.assertEqual(node.outputs["value"].mode, "pull")
+        self.assertEqual(node.tooltip, "Store a value of any data type")
+
+    def test_instantiate_hives(self):
+        node, instantiate_count = self.create_node(factory.HiveNodeFactory(instantiate_hives=True), "dragonfly.std.Add",
+                                                   dict(args={}))
+
+        self.assertEqual(instantiate_count, 1)
+        self.assertEqual(list(node.inputs), ["a", "b", "evaluate"])
+        self.assertEqual(list(node.outputs), ["result", "evaluated"])
+
+    def test_dyna_hive_is_instantiated(self):
+        node, instantiate_count = self.create_node(factory.HiveNodeFactory(), "dragonfly.std.Sum",
+                                                   dict(meta_args=dict(data_type="int"), args=dict(count=3)))
+
+        self.assertEqual(instantiate_count, 1)
+        self.assertEqual(list(node.inputs), ["value_0", "value_1", "value_2"])
+
+    def test_class_fallback(self):
+        hive_factory = factory.HiveNodeFactory()
+
+        io_info = [RuntimeError("Not inspectable"), dict(inputs={}, outputs={}, pin_order=[])]
+
+        with mock.patch.object(factory, "get_io_info", side_effect=io_info):
+            node, instantiate_count = self.create_node(hive_factory, "dragonfly.std.Add", dict(args={}))
+
+        self.assertEqual(instantiate_count, 1)
+        self.assertEqual(len(node.inputs), 0)
+
+    def test_pin_layout_is_cached(self):
+        hive_factory = factory.HiveNodeFactory(instantiate_hives=True)
+        params = dict(meta_args=dict(data_type="int"), args=dict(start_value=1))
+
+        self.create_node(hive_factory, "dragonfly.std.Variable", params)
+        node, instantiate_count = self.create_node(hive_factory, "dragonfly.std.Variable",
+                                                   dict(params, args=dict(start_value=2)))
+
+        self.assertEqual(instantiate_count, 0)
+        self.assertEqual(list(node.outputs), ["value"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,425 @@
+import os
+import sys
+import unittest
+from collections import OrderedDict
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from hive2_gui.cache import clear_caches, inspection_cache, pin_layout_cache
+from hive2_gui.factory import PinLayout
+from hive2_gui.finders.hives import HiveFinder, HiveFinderUpdate, ModuleCandidate, ScanModes, scan_module_file, scan_module_source
+from hive2_gui.importer import get_dependency_stamps
+from hive2_gui.inspector import InspectorOption
+
+
+def _create_pin_layout():
+    io_info = dict(inputs=OrderedDict(value=("push", "int")), outputs=OrderedDict(result=("pull", "int")),
+                   pin_order=["value", "result"])
+    return PinLayout(io_info, "Add two values")
+
+
+def _create_param_info():
+    meta_args = OrderedDict(data_type=InspectorOption("str", options={"int", "float"}))
+    args = OrderedDict(start_value=InspectorOption("int", 0), name=InspectorOption("str", "value"))
+    return OrderedDict(meta_args=meta_args, args=args)
+
+
+def _get_option_fields(param_info):
+    return {stage_name: [(name, option.data_type, option.default, option.options)
+                         for name, option in stage_options.items()]
+            for stage_name, stage_options in param_info.items()}
+
+
+class CatalogueInspectionsTestCase(unittest.TestCase):
+
+    reference_path = "test_finders.Hive"
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+        self.entry = {"import_path": "test_finders", "hives": [[self.reference_path, "test_finders.Hive"]]}
+        self.meta_args = {"data_type": "int"}
+
+        pin_layout_cache.set(self.reference_path, self.meta_args, _create_pin_layout())
+        inspection_cache.set(self.reference_path, self.meta_args, _create_param_info())
+
+    def assertRestored(self):
+        pin_layout = pin_layout_cache.get(self.reference_path, self.meta_args)
+        self.assertEqual(pin_layout, _create_pin_layout())
+
+        param_info = inspection_cache.get(self.reference_path, self.meta_args)
+        self.assertEqual(_get_option_fields(param_info), _get_option_fields(_create_param_info()))
+        self.assertIs(param_info["meta_args"]["data_type"].default, InspectorOption.NoValue)
+
+    def test_round_trip(self):
+        HiveFinder._store_inspections(self.entry)
+        clear_caches()
+
+        HiveFinder._restore_inspections(self.entry)
+        self.assertRestored()
+
+    def test_results_of_session_are_kept(self):
+        HiveFinder._store_inspections(self.entry)
+        inspection_cache.set(self.reference_path, self.meta_args, "newer")
+
+        HiveFinder._restore_inspections(self.entry)
+        self.assertEqual(inspection_cache.get(self.reference_path, self.meta_args), "newer")
+
+    def test_persisted_results_are_kept(self):
+        HiveFinder._store_inspections(self.entry)
+        clear_caches()
+
+        inspection_cache.set(self.reference_path, {"data_type": "float"}, _create_param_info())
+        HiveFinder._store_inspections(self.entry)
+
+        clear_caches()
+        HiveFinder._restore_inspections(self.entry)
+
+        self.assertRestored()
+        self.assertIsNotNone(inspection_cache.get(self.reference_path, {"data_type": "float"}))
+
+    def test_values_that_cannot_be_encoded_are_skipped(self):
+        param_info = _create_param_info()
+        param_info["args"]["callback"] = InspectorOption("function", object())
+        inspection_cache.set(self.reference_path, {"data_type": "float"}, param_info)
+
+        HiveFinder._store_inspections(self.entry)
+        clear_caches()
+
+        HiveFinder._restore_inspections(self.entry)
+        self.assertRestored()
+        self.assertRaises(KeyError, inspection_cache.get, self.reference_path, {"data_type": "float"})
+
+    def test_save_catalogue(self):
+        with TemporaryDirectory() as directory:
+            catalogue_path = os.path.join(directory, "catalogue", "hive_catalogue.json")
+
+            finder = HiveFinder(catalogue_path=catalogue_path)
+            finder._catalogue = {"test_finders.py": self.entry}
+            finder.save_catalogue()
+            clear_caches()
+
+            catalogue = HiveFinder(catalogue_path=catalogue_path)._load_catalogue()
+
+        self.assertEqual(list(catalogue), ["test_finders.py"])
+
+        HiveFinder._restore_inspections(catalogue["test_finders.py"])
+        self.assertRestored()
+
+    def test_invalid_catalogue(self):
+        with TemporaryDirectory() as directory:
+            catalogue_path = os.path.join(directory, "hive_catalogue.json")
+
+            with open(catalogue_path, "w") as f:
+                f.write("{")
+
+            self.assertEqual(HiveFinder(catalogue_path=catalogue_path)._load_catalogue(), {})
+
+
+class CatalogueDependenciesTestCase(unittest.TestCase):
+
+    reference_path = "finders_module.Hive"
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.dependency_path = os.path.join(directory.name, "finders_dependency.py")
+        with open(self.dependency_path, "w") as f:
+            f.write("value = 1\n")
+
+        with open(os.path.join(directory.name, "finders_module.py"), "w") as f:
+            f.write("import finders_dependency\n")
+
+        sys.path.insert(0, directory.name)
+        self.addCleanup(sys.path.remove, directory.name)
+
+        for name in ("finders_module", "finders_dependency"):
+            self.addCleanup(sys.modules.pop, name, None)
+
+        import finders_module
+
+        self.entry = {"import_path": "finders_module", "hives": [[self.reference_path, self.reference_path]]}
+        self.meta_args = {"data_type": "int"}
+
+        pin_layout_cache.set(self.reference_path, self.meta_args, _create_pin_layout())
+
+    def test_dependencies_are_stored(self):
+        HiveFinder._store_inspections(self.entry)
+
+        self.assertEqual(self.entry['dependencies'], get_dependency_stamps(["finders_dependency"]))
+        self.assertEqual([s[0] for s in self.entry['dependencies']], [self.dependency_path])
+
+    def test_unchanged_dependencies(self):
+        HiveFinder._store_inspections(self.entry)
+        clear_caches()
+
+        HiveFinder._restore_inspections(self.entry)
+        self.assertEqual(pin_layout_cache.get(self.reference_path, self.meta_args), _create_pin_layout())
+
+    def test_changed_dependency(self):
+        HiveFinder._store_inspections(self.entry)
+        clear_caches()
+
+        with open(self.dependency_path, "w") as f:
+            f.write("value = 2 * 1\n")
+
+        HiveFinder._restore_inspections(self.entry)
+        self.assertRaises(KeyError, pin_layout_cache.get, self.reference_path, self.meta_args)
+
+        # Discarded results are not persisted again
+        HiveFinder._store_inspections(self.entry)
+        self.assertEqual(self.entry['inspections'], {})
+
+    def test_deleted_dependency(self):
+        HiveFinder._store_inspections(self.entry)
+        clear_caches()
+
+        os.remove(self.dependency_path)
+
+        HiveFinder._restore_inspections(self.entry)
+        self.assertRaises(KeyError, pin_layout_cache.get, self.reference_path, self.meta_args)
+
+    def test_stamps_are_kept_if_module_is_not_imported(self):
+        HiveFinder._store_inspections(self.entry)
+        dependencies = self.entry['dependencies']
+
+        del sys.modules["finders_module"]
+        HiveFinder._store_inspections(self.entry)
+
+        self.assertEqual(self.entry['dependencies'], dependencies)
+
+
+_module_source = b"""
+import hive
+import hive as h
+from hive import dyna_hive as create_dyna_hive
+from other import Imported
+
+
+def build(i, ex, args):
+    pass
+
+
+First = hive.hive("First", build)
+Second = h.meta_hive("Second", build, None)
+Third = create_dyna_hive("Third", build, None)
+Extended = First.extend("Extended")
+_Private = hive.hive("_Private", build)
+NotHive = dict(a=1)
+
+
+class Derived(First):
+    pass
+
+
+class Primitive(hive.MetaHivePrimitive):
+    pass
+
+
+class Other:
+    pass
+
+
+def create():
+    Local = hive.hive("Local", build)
+"""
+
+
+class ScanModuleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_scan_module_source(self):
+        self.assertEqual(scan_module_source(_module_source),
+                         ["First", "Second", "Third", "Extended", "_Private", "Derived", "Primitive"])
+
+    def test_scan_module_file(self):
+        file_path = os.path.join(self.directory, "module.py")
+        with open(file_path, "wb") as f:
+            f.write(_module_source)
+
+        candidate = ModuleCandidate(file_path, "package.module", False, 0, 0)
+        self.assertEqual([p for p, _ in scan_module_file(candidate)],
+                         ["package.module.Derived", "package.module.Extended", "package.module.First",
+                          "package.module.Primitive", "package.module.Second", "package.module.Third"])
+
+    def test_scan_hivemap(self):
+        file_path = os.path.join(self.directory, "some_hive.hivemap")
+        open(file_path, "w").close()
+
+        candidate = ModuleCandidate(file_path, "package.some_hive", False, 0, 0)
+        self.assertEqual(scan_module_file(candidate), [["package.some_hive.SomeHive", "package.some_hive.SomeHive"]])
+
+    def test_scan_package_without_init(self):
+        candidate = ModuleCandidate(self.directory, "package", True, 0, 0)
+        self.assertEqual(scan_module_file(candidate), [])
+
+    def create_candidates(self, count):
+        candidates = []
+
+        for index in range(count):
+            file_path = os.path.join(self.directory, "module_{}.py".format(index))
+            with open(file_path, "w") as f:
+                f.write("import hive\nHive{0} = hive.hive('Hive{0}')\n".format(index))
+
+            candidates.append(ModuleCandidate(file_path, "module_{}".format(index), False, 0, 0))
+
+        # Modules with syntax errors are skipped
+        file_path = os.path.join(self.directory, "invalid.py")
+        with open(file_path, "w") as f:
+            f.write("def invalid(:\n")
+
+        candidates.append(ModuleCandidate(file_path, "invalid", False, 0, 0))
+        return candidates
+
+    def test_scan_candidates(self):
+        finder = HiveFinder(catalogue_path=None, scan_mode=ScanModes.AST, max_workers=2)
+        finder.min_parallel_scan_count = 4
+        candidates = self.create_candidates(5)
+
+        with self.assertLogs("hive2_gui.finders.hives", "ERROR"):
+            parallel_results = finder._scan_candidates(candidates)
+
+        finder.min_parallel_scan_count = len(candidates) + 1
+
+        with self.assertLogs("hive2_gui.finders.hives", "ERROR"):
+            serial_results = finder._scan_candidates(candidates)
+
+        self.assertEqual(parallel_results, serial_results)
+        self.assertEqual(len(parallel_results), 5)
+        self.assertEqual(parallel_results[candidates[3].file_path], [["module_3.Hive3", "module_3.Hive3"]])
+
+    def test_invalid_scan_mode(self):
+        self.assertRaises(ValueError, HiveFinder, scan_mode="compile")
+
+
+def _write_hive_module(file_path, *hive_names):
+    with open(file_path, "w") as f:
+        f.write("import hive\n")
+
+        for name in hive_names:
+            f.write("{0} = hive.hive('{0}')\n".format(name))
+
+
+class HiveFinderUpdateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.package_path = os.path.join(self.directory, "package")
+        os.mkdir(self.package_path)
+        open(os.path.join(self.package_path, "__init__.py"), "w").close()
+
+        self.first_path = os.path.join(self.package_path, "first.py")
+        _write_hive_module(self.first_path, "First")
+
+        self.second_path = os.path.join(self.directory, "second.py")
+        _write_hive_module(self.second_path, "Second")
+
+        self.finder = HiveFinder(self.directory, catalogue_path=None, scan_mode=ScanModes.AST)
+        self.finder.reload()
+
+    def get_hives(self):
+        return self.finder.hives_by_path[self.directory]
+
+    def test_reload(self):
+        self.assertEqual(self.get_hives(), ["package.first.First", "second.Second"])
+
+    def test_created(self):
+        third_path = os.path.join(self.package_path, "third.py")
+        _write_hive_module(third_path, "Third")
+
+        update = self.finder.update([third_path])
+
+        self.assertEqual(update, HiveFinderUpdate(["package.third.Third"], [], []))
+        self.assertEqual(self.get_hives(), ["package.first.First", "package.third.Third", "second.Second"])
+        self.assertIn("package.third.Third", self.finder.all_hives)
+
+    def test_created_package(self):
+        package_path = os.path.join(self.directory, "other")
+        os.mkdir(package_path)
+
+        module_path = os.path.join(package_path, "module.py")
+        _write_hive_module(module_path, "Other")
+
+        update = self.finder.update([module_path])
+
+        self.assertEqual(update.added, ["other.module.Other"])
+
+        # Hives are found in search order
+        finder = HiveFinder(self.directory, catalogue_path=None, scan_mode=ScanModes.AST)
+        finder.reload()
+        self.assertEqual(self.get_hives(), finder.hives_by_path[self.directory])
+        self.assertEqual(self.get_hives(), ["other.module.Other", "package.first.First", "second.Second"])
+
+    def test_modified(self):
+        pin_layout_cache.set("package.first.First", {}, _create_pin_layout())
+        _write_hive_module(self.first_path, "First", "Fourth")
+
+        update = self.finder.update([self.first_path])
+
+        self.assertEqual(update, HiveFinderUpdate(["package.first.Fourth"], [], ["package.first.First"]))
+        self.assertRaises(KeyError, pin_layout_cache.get, "package.first.First", {})
+
+    def test_deleted(self):
+        os.remove(self.second_path)
+
+        update = self.finder.update([self.second_path])
+
+        self.assertEqual(update, HiveFinderUpdate([], ["second.Second"], []))
+        self.assertEqual(self.get_hives(), ["package.first.First"])
+
+    def test_deleted_package(self):
+        os.remove(self.first_path)
+        os.remove(os.path.join(self.package_path, "__init__.py"))
+        os.rmdir(self.package_path)
+
+        update = self.finder.update([self.package_path])
+
+        self.assertEqual(update.removed, ["package.first.First"])
+        self.assertEqual(self.get_hives(), ["second.Second"])
+
+    def test_only_changed_modules_are_analysed(self):
+        _write_hive_module(self.second_path, "Second", "Fifth")
+
+        with mock.patch.object(self.finder, "_scan_candidates", wraps=self.finder._scan_candidates) as scan:
+            self.finder.update([self.second_path])
+
+        candidates, = scan.call_args[0]
+        self.assertEqual([c.file_path for c in candidates], [self.second_path])
+
+    def test_unchanged(self):
+        update = self.finder.update([self.first_path, os.path.join(self.directory, "missing.py")])
+
+        self.assertEqual(update, HiveFinderUpdate([], [], []))
+        self.assertEqual(self.get_hives(), ["package.first.First", "second.Second"])
+
+    def test_hidden_files(self):
+        hidden_path = os.path.join(self.directory, "_hidden.py")
+        _write_hive_module(hidden_path, "Hidden")
+
+        with open(os.path.join(self.directory, "robots.txt"), "w") as f:
+            f.write("package\n")
+
+        excluded_path = os.path.join(self.directory, "excluded.py")
+        _write_hive_module(excluded_path, "Excluded")
+
+        update = self.finder.update([hidden_path, excluded_path])
+        self.assertEqual(update, HiveFinderUpdate([], [], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
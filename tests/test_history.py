@@ -0,0 +1,266 @@
+import unittest
+from logging import getLogger
+
+from hive2_gui.history import (CommandLog, CommandLogError, CommandLogManager, DeltaCommand, command_from_data,
+                               command_to_data)
+
+
+class _ValueModel:
+    """Mapping of name to value, whose changes are recorded as delta commands"""
+
+    def __init__(self, history):
+        self.history = history
+        self.values = {}
+
+    def set_value(self, name, value):
+        old_value = self.values.get(name)
+        self._set_value(name, value)
+
+        self.history.record_delta(self._set_value, (name, value), self._set_value, (name, old_value),
+                                  merge_key=("value", name))
+
+    def _set_value(self, name, value):
+        if value is None:
+            self.values.pop(name, None)
+
+        else:
+            self.values[name] = value
+
+    def get_callback(self, name):
+        if name != "_set_value":
+            raise ValueError(name)
+
+        return self._set_value
+
+    def encode_delta(self, execute, execute_args, un_execute, un_execute_args):
+        return execute.__name__, execute_args, un_execute.__name__, un_execute_args
+
+
+class CommandLogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.log = CommandLog(getLogger(__name__), limit=None)
+        self.values = []
+
+    def add(self, value):
+        """Append value to values, and add command to log"""
+        self.values.append(value)
+        self.log.add_command(DeltaCommand(self.values.append, (value,), self.values.pop, ()))
+        return self.log.command_id
+
+    def test_undo_redo(self):
+        self.add(1)
+        self.add(2)
+
+        self.log.undo()
+        self.assertEqual(self.values, [1])
+
+        self.log.undo()
+        self.assertEqual(self.values, [])
+        self.assertFalse(self.log.can_undo)
+        self.assertRaises(CommandLogError, self.log.undo)
+
+        self.log.redo_all()
+        self.assertEqual(self.values, [1, 2])
+        self.assertFalse(self.log.can_redo)
+        self.assertRaises(CommandLogError, self.log.redo)
+
+    def test_new_command_keeps_undone_branch(self):
+        first_id = self.add(1)
+        second_id = self.add(2)
+
+        self.log.undo()
+        third_id = self.add(3)
+
+        self.assertEqual(self.values, [1, 3])
+        self.assertEqual(self.log.command_count, 3)
+        self.assertEqual([c.id for c in self.log.commands], [first_id, third_id])
+
+        self.log.jump_to(second_id)
+        self.assertEqual(self.values, [1, 2])
+        self.assertEqual(self.log.command_id, second_id)
+
+        self.log.jump_to(third_id)
+        self.assertEqual(self.values, [1, 3])
+
+    def test_jump_to_follows_most_recent_branch(self):
+        first_id = self.add(1)
+        self.add(2)
+        self.log.undo()
+        self.add(3)
+
+        self.log.jump_to(first_id)
+        self.assertEqual(self.values, [1])
+
+        self.log.redo()
+        self.assertEqual(self.values, [1, 3])
+
+    def test_jump_to_initial_state(self):
+        self.add(1)
+        self.add(2)
+
+        initial_id = id(self.log)
+        self.assertTrue(self.log.has_command_id(initial_id))
+
+        self.log.jump_to(initial_id)
+        self.assertEqual(self.values, [])
+        self.assertFalse(self.log.can_undo)
+
+    def test_jump_to_unknown_command(self):
+        self.add(1)
+        self.assertRaises(CommandLogError, self.log.jump_to, -1)
+
+    def test_limit_evicts_other_branches_first(self):
+        self.log = CommandLog(getLogger(__name__), limit=3)
+
+        self.add(1)
+        branch_id = self.add(2)
+        self.log.undo()
+        self.add(3)
+        self.add(4)
+
+        self.assertEqual(self.log.command_count, 3)
+        self.assertFalse(self.log.has_command_id(branch_id))
+        self.assertEqual(self.values, [1, 3, 4])
+
+    def test_limit_evicts_oldest_commands(self):
+        self.log = CommandLog(getLogger(__name__), limit=2)
+
+        for value in range(4):
+            self.add(value)
+
+        self.assertEqual(len(self.log.commands), 2)
+
+        self.log.undo_all()
+        self.assertEqual(self.values, [0, 1])
+
+    def test_byte_limit(self):
+        self.log = CommandLog(getLogger(__name__), limit=None, byte_limit=64 * 1024)
+
+        for value in range(8):
+            self.add(bytes(16 * 1024) + bytes([value]))
+
+        self.assertLessEqual(self.log.cost, 64 * 1024)
+        self.assertLess(len(self.log.commands), 8)
+
+        # Latest command is kept
+        self.log.undo()
+        self.assertEqual(len(self.values), 7)
+
+
+class CommandLogManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.history = CommandLogManager(limit=None)
+        self.model = _ValueModel(self.history)
+
+    def test_undo_redo(self):
+        self.model.set_value("a", 1)
+        self.model.set_value("b", 2)
+
+        self.history.undo()
+        self.assertEqual(self.model.values, {"a": 1})
+
+        self.history.redo()
+        self.assertEqual(self.model.values, {"a": 1, "b": 2})
+
+    def test_undo_is_not_recorded(self):
+        self.model.set_value("a", 1)
+        self.history.undo()
+
+        self.assertEqual(len(self.history.commands), 1)
+
+    def test_merge_context(self):
+        with self.history.merge_context():
+            for value in range(1, 5):
+                self.model.set_value("a", value)
+
+        self.assertEqual(len(self.history.commands), 1)
+
+        self.history.undo()
+        self.assertEqual(self.model.values, {})
+
+        self.history.redo()
+        self.assertEqual(self.model.values, {"a": 4})
+
+    def test_different_targets_are_not_merged(self):
+        with self.history.merge_context():
+            self.model.set_value("a", 1)
+            self.model.set_value("b", 2)
+
+        self.assertEqual(len(self.history.commands), 2)
+
+    def test_commands_are_not_merged_across_contexts(self):
+        with self.history.merge_context():
+            self.model.set_value("a", 1)
+
+        with self.history.merge_context():
+            self.model.set_value("a", 2)
+
+        self.assertEqual(len(self.history.commands), 2)
+
+    def test_command_context(self):
+        with self.history.command_context("edit"):
+            self.model.set_value("a", 1)
+            self.model.set_value("b", 2)
+
+        self.assertEqual(len(self.history.commands), 1)
+
+        self.history.undo()
+        self.assertEqual(self.model.values, {})
+
+        self.history.redo()
+        self.assertEqual(self.model.values, {"a": 1, "b": 2})
+
+    def test_command_context_error(self):
+        with self.assertRaises(ValueError):
+            with self.history.command_context("edit"):
+                self.model.set_value("a", 1)
+                raise ValueError
+
+        # Changes made before the error are recorded as one command, and later commands are recorded at the top level
+        self.model.set_value("b", 2)
+        self.assertEqual(len(self.history.commands), 2)
+
+        self.history.undo()
+        self.history.undo()
+        self.assertEqual(self.model.values, {})
+
+    def test_jump_to(self):
+        self.model.set_value("a", 1)
+        branch_id = self.history.command_id
+
+        self.history.undo()
+        self.model.set_value("b", 2)
+
+        jumped = []
+        self.history.on_jumped.subscribe(lambda: jumped.append(True))
+
+        self.history.jump_to(branch_id)
+        self.assertEqual(self.model.values, {"a": 1})
+        self.assertEqual(jumped, [True])
+
+    def test_command_data_round_trip(self):
+        self.history.delta_encoder = self.model.encode_delta
+
+        with self.history.command_context("edit"):
+            self.model.set_value("a", 1)
+            self.model.set_value("b", 2)
+
+        command = self.history.commands[-1]
+        data = command_to_data(command)
+
+        self.history.undo()
+
+        restored = command_from_data(data, self.model.get_callback, getLogger(__name__), is_executed=False)
+        self.history.apply_command(restored)
+
+        self.assertEqual(self.model.values, {"a": 1, "b": 2})
+        self.assertEqual(command_to_data(restored), data)
+
+        self.history.undo()
+        self.assertEqual(self.model.values, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
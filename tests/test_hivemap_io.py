@@ -0,0 +1,175 @@
+import os
+import unittest
+from collections import namedtuple
+from tempfile import TemporaryDirectory
+
+from hive2_gui.hivemap_io import (BINARY_HIVEMAP_EXTENSION, LARGE_HIVEMAP_NODE_COUNT, TEXT_HIVEMAP_EXTENSION,
+                                  BinaryHivemapError, ConnectionRecord, HivemapRecordReader, HivemapRecords,
+                                  NodeRecord, ParameterGroupRecord, ParameterRecord, Position, dump_binary,
+                                  dump_literal, get_default_hivemap_extension, load_binary, load_binary_records,
+                                  load_literal)
+
+
+def _create_records():
+    args = ParameterGroupRecord("args", [ParameterRecord("start_value", "int", "-12"),
+                                         ParameterRecord("name", "str", "verbatim string"),
+                                         ParameterRecord("scale", "float", "0.5"),
+                                         ParameterRecord("position", "vector", "(1.0, 2.0, 3.0)"),
+                                         ParameterRecord("options", "dict", "{'a': [1, None, True]}"),
+                                         ParameterRecord("tags", "set", "{1, 2}")])
+    meta_args = ParameterGroupRecord("meta_args", [ParameterRecord("data_type", "str", "int")])
+
+    nodes = [NodeRecord("value", "BEE", "hive.attribute", Position(10.0, -20.5), [meta_args, args], []),
+             NodeRecord("adder", "HIVE", "dragonfly.std.Add", Position(0.0, 0.0), [], ["a", "b"])]
+    connections = [ConnectionRecord("value", "updated", "adder", "trigger", True),
+                   ConnectionRecord("adder", "result", "value", "value", False)]
+
+    return HivemapRecords("Docstring\nwith two lines", nodes, connections)
+
+
+class BinaryHivemapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.records = _create_records()
+
+    def test_load_binary_records(self):
+        loaded = load_binary_records(dump_binary(self.records))
+        self.assertEqual(loaded, self.records)
+
+    def test_record_reader(self):
+        with TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "test.hivemapb")
+
+            with open(file_path, "wb") as f:
+                f.write(dump_binary(self.records))
+
+            with HivemapRecordReader(file_path) as reader:
+                self.assertEqual(reader.docstring, self.records.docstring)
+                self.assertEqual(list(reader.iter_nodes()), self.records.nodes)
+                self.assertEqual(list(reader.iter_connections()), self.records.connections)
+                self.assertEqual(list(reader.iter_node_families()), [("value", "BEE"), ("adder", "HIVE")])
+
+    def test_closed_reader(self):
+        with TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "test.hivemapb")
+
+            with open(file_path, "wb") as f:
+                f.write(dump_binary(self.records))
+
+            with HivemapRecordReader(file_path) as reader:
+                pass
+
+            self.assertRaises(ValueError, reader.iter_nodes)
+
+    def test_invalid_data(self):
+        self.assertRaises(BinaryHivemapError, load_binary_records, b"HVMA" + bytes(64))
+        self.assertRaises(BinaryHivemapError, load_binary_records, dump_binary(self.records)[:-4])
+
+
+class HivemapRecordReaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.records = _create_records()
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_file(self, file_name, data):
+        file_path = os.path.join(self.directory.name, file_name)
+
+        with open(file_path, "wb") as f:
+            f.write(data)
+
+        return file_path
+
+    def write_binary(self):
+        return self.write_file("test.hivemapb", dump_binary(self.records))
+
+    def write_text(self):
+        return self.write_file("test.hivemap", str(load_binary(dump_binary(self.records))).encode("utf-8"))
+
+    def test_text_iterators(self):
+        with HivemapRecordReader(self.write_text()) as reader:
+            self.assertEqual(reader.docstring, self.records.docstring)
+            self.assertEqual(list(reader.iter_nodes()), self.records.nodes)
+            self.assertEqual(list(reader.iter_connections()), self.records.connections)
+            self.assertEqual(list(reader.iter_node_families()), [("value", "BEE"), ("adder", "HIVE")])
+
+    def test_iterators_are_independent(self):
+        for file_path in (self.write_binary(), self.write_text()):
+            with HivemapRecordReader(file_path) as reader:
+                nodes = reader.iter_nodes()
+                self.assertEqual(next(nodes), self.records.nodes[0])
+
+                # Each call starts a new pass over the records
+                self.assertEqual(list(reader.iter_nodes()), self.records.nodes)
+                self.assertEqual(list(nodes), self.records.nodes[1:])
+
+    def test_records(self):
+        for file_path in (self.write_binary(), self.write_text()):
+            with HivemapRecordReader(file_path) as reader:
+                records = reader.records()
+
+                self.assertEqual(records.docstring, self.records.docstring)
+                self.assertEqual(list(records.nodes), self.records.nodes)
+                self.assertEqual(list(records.connections), self.records.connections)
+
+    def test_close_unfinished_iterators(self):
+        reader = HivemapRecordReader(self.write_binary())
+        nodes = reader.iter_nodes()
+        next(nodes)
+
+        # Views of the mapping held by the iterator must not prevent it from being closed
+        reader.close()
+        self.assertEqual(list(nodes), [])
+        self.assertRaises(ValueError, reader.iter_connections)
+
+    def test_empty_binary_hivemap(self):
+        self.write_file("empty.hivemapb", b"")
+        self.assertRaises(BinaryHivemapError, HivemapRecordReader, os.path.join(self.directory.name, "empty.hivemapb"))
+
+    def test_text_with_binary_extension(self):
+        file_path = self.write_file("text.hivemapb", str(load_binary(dump_binary(self.records))).encode("utf-8"))
+        self.assertRaises(BinaryHivemapError, HivemapRecordReader, file_path)
+
+
+class DefaultExtensionTestCase(unittest.TestCase):
+
+    def test_default_extension(self):
+        self.assertEqual(get_default_hivemap_extension(0), TEXT_HIVEMAP_EXTENSION)
+        self.assertEqual(get_default_hivemap_extension(LARGE_HIVEMAP_NODE_COUNT - 1), TEXT_HIVEMAP_EXTENSION)
+        self.assertEqual(get_default_hivemap_extension(LARGE_HIVEMAP_NODE_COUNT), BINARY_HIVEMAP_EXTENSION)
+
+
+_Record = namedtuple("_Record", "name values")
+
+
+class LiteralTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        values = [None, True, False, 0, -1, 2 ** 70, 1.5, "text", b"\x00bytes", (1, "a"), [1, [2, (3,)]],
+                  {"a": {1: None}}, _Record("name", [_Record("child", ())])]
+
+        for value in values:
+            loaded = load_literal(dump_literal(value, (_Record,)), (_Record,))
+            self.assertEqual(loaded, value)
+            self.assertIs(type(loaded), type(value))
+
+    def test_unknown_values(self):
+        self.assertRaises(ValueError, dump_literal, {1, 2})
+        self.assertRaises(ValueError, dump_literal, object())
+        self.assertRaises(ValueError, dump_literal, _Record("name", ()))
+
+    def test_unknown_record_types(self):
+        data = dump_literal(_Record("name", ()), (_Record,))
+
+        self.assertRaises(ValueError, load_literal, data)
+        self.assertRaises(ValueError, load_literal, data, (namedtuple("_Record", "other"),))
+
+    def test_trailing_data(self):
+        self.assertRaises(ValueError, load_literal, dump_literal("text") + b"\x00")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+import os
+import sys
+import unittest
+from hashlib import sha256
+from tempfile import TemporaryDirectory
+from types import ModuleType
+from unittest import mock
+
+from hive2_gui.code_generator import ConnectionStatement, HiveDeclaration, HivemapPlan, IODeclaration
+from hive2_gui.importer import HivemapModuleFinder, HivemapModuleLoader, get_dependency_stamps, get_hivemap_cache_path
+
+
+_DEPENDENCY_NAME = "test_importer_dependency"
+_NESTED_NAME = "test_importer_nested"
+
+
+class PlanCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.dependency_path = os.path.join(self.directory, "{}.py".format(_DEPENDENCY_NAME))
+        self.write_dependency("value = 1\n")
+
+        sys.path.insert(0, self.directory)
+        self.addCleanup(sys.path.remove, self.directory)
+        self.addCleanup(sys.modules.pop, _DEPENDENCY_NAME, None)
+
+        # Cache files are not written if bytecode is not
+        dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        self.addCleanup(setattr, sys, "dont_write_bytecode", dont_write_bytecode)
+
+        self.cache_path = get_hivemap_cache_path(os.path.join(self.directory, "test.hivemap"))
+        self.digest = sha256(b"hivemap data").digest()
+
+        declarations = [HiveDeclaration("adder", "{}.Adder".format(_DEPENDENCY_NAME),
+                                        [{"data_type": "int"}, {"start_value": (1, 2.5, None)}])]
+        connections = [ConnectionStatement(("i", "adder", "result"), ("i", "adder", "a"), True, False)]
+        io_declarations = [IODeclaration("result", "hive.output", ("i", "adder", "result"))]
+        self.plan = HivemapPlan(["hive", _DEPENDENCY_NAME], "Docstring", [("modifier", "pass")], declarations,
+                                connections, io_declarations)
+
+    def write_dependency(self, source):
+        with open(self.dependency_path, "w") as f:
+            f.write(source)
+
+    def test_round_trip(self):
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, self.plan)
+
+        self.assertEqual(HivemapModuleLoader._read_cache(self.cache_path, self.digest), self.plan)
+
+    def test_missing_cache(self):
+        self.assertIsNone(HivemapModuleLoader._read_cache(self.cache_path, self.digest))
+
+    def test_bytecode_is_not_written(self):
+        sys.dont_write_bytecode = True
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, self.plan)
+
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_changed_hivemap(self):
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, self.plan)
+
+        digest = sha256(b"changed hivemap data").digest()
+        self.assertIsNone(HivemapModuleLoader._read_cache(self.cache_path, digest))
+
+    def test_changed_dependency(self):
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, self.plan)
+        self.write_dependency("value = 2 * 1\n")
+
+        self.assertIsNone(HivemapModuleLoader._read_cache(self.cache_path, self.digest))
+
+    def test_deleted_dependency(self):
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, self.plan)
+        os.remove(self.dependency_path)
+
+        self.assertIsNone(HivemapModuleLoader._read_cache(self.cache_path, self.digest))
+
+    def test_dependencies_are_not_imported(self):
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, self.plan)
+
+        with mock.patch("hive2_gui.importer.import_module", side_effect=AssertionError("Imported")):
+            self.assertEqual(HivemapModuleLoader._read_cache(self.cache_path, self.digest), self.plan)
+
+    def create_nested_hivemap(self):
+        """Create hivemap module which imports the dependency, and return plan which imports it"""
+        file_path = os.path.join(self.directory, "nested.hivemap")
+        with open(file_path, "w") as f:
+            f.write("nested")
+
+        loader = HivemapModuleLoader(_NESTED_NAME, file_path)
+        loader._plan = self.plan
+
+        module = ModuleType(_NESTED_NAME)
+        module.__file__ = file_path
+        module.__loader__ = loader
+
+        sys.modules[_NESTED_NAME] = module
+        self.addCleanup(sys.modules.pop, _NESTED_NAME, None)
+
+        return self.plan._replace(imports=["hive", _NESTED_NAME], declarations=[])
+
+    def test_nested_hivemap_dependencies(self):
+        plan = self.create_nested_hivemap()
+
+        file_paths = [s[0] for s in get_dependency_stamps(plan.imports)]
+        self.assertIn(self.dependency_path, file_paths)
+        self.assertIn(os.path.join(self.directory, "nested.hivemap"), file_paths)
+
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, plan)
+        self.assertEqual(HivemapModuleLoader._read_cache(self.cache_path, self.digest), plan)
+
+        # Dependencies of nested hivemaps are checked
+        self.write_dependency("value = 2 * 1\n")
+        self.assertIsNone(HivemapModuleLoader._read_cache(self.cache_path, self.digest))
+
+    def test_corrupt_cache(self):
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, self.plan)
+
+        with open(self.cache_path, "rb") as f:
+            data = f.read()
+
+        with open(self.cache_path, "wb") as f:
+            f.write(data[:-8])
+
+        self.assertIsNone(HivemapModuleLoader._read_cache(self.cache_path, self.digest))
+
+    def test_plan_that_cannot_be_serialised(self):
+        declarations = [HiveDeclaration("adder", "hive.Adder", [{"value": object()}])]
+        plan = self.plan._replace(declarations=declarations)
+
+        HivemapModuleLoader._write_cache(self.cache_path, self.digest, plan)
+        self.assertFalse(os.path.exists(self.cache_path))
+
+
+class HivemapListingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.finder = HivemapModuleFinder()
+
+    def create_file(self, file_name, directory=None):
+        if directory is None:
+            directory = self.directory
+
+        open(os.path.join(directory, file_name), "w").close()
+
+        # Ensure that the directory mtime changes, regardless of the filesystem resolution
+        stat = os.stat(directory)
+        os.utime(directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def test_listing(self):
+        self.create_file("first_hive.hivemap")
+        self.create_file("first_hive.hivemapb")
+        self.create_file("second_hive.hivemapb")
+        self.create_file("module.py")
+
+        self.assertEqual(self.finder._get_hivemap_names(self.directory),
+                         {"first_hive": "first_hive.hivemap", "second_hive": "second_hive.hivemapb"})
+
+    def test_listing_is_cached(self):
+        self.create_file("first_hive.hivemap")
+        names = self.finder._get_hivemap_names(self.directory)
+
+        with mock.patch("hive2_gui.importer.listdir") as listdir:
+            self.assertIs(self.finder._get_hivemap_names(self.directory), names)
+
+        listdir.assert_not_called()
+
+    def test_changed_directory(self):
+        self.assertEqual(self.finder._get_hivemap_names(self.directory), {})
+
+        self.create_file("new_hive.hivemap")
+        self.assertEqual(self.finder._get_hivemap_names(self.directory), {"new_hive": "new_hive.hivemap"})
+
+        spec = self.finder.find_spec("new_hive", [self.directory])
+        self.assertEqual(spec.origin, os.path.join(self.directory, "new_hive.hivemap"))
+
+    def test_missing_directory(self):
+        directory = os.path.join(self.directory, "missing")
+        self.assertEqual(self.finder._get_hivemap_names(directory), {})
+
+        os.mkdir(directory)
+        self.create_file("new_hive.hivemap", directory)
+        self.assertEqual(self.finder._get_hivemap_names(directory), {"new_hive": "new_hive.hivemap"})
+
+    def test_listings_are_bounded(self):
+        self.finder.max_listings = 2
+        directories = [os.path.join(self.directory, str(i)) for i in range(3)]
+
+        for directory in directories:
+            os.mkdir(directory)
+            self.finder._get_hivemap_names(directory)
+
+        # Least recently used listing is discarded
+        self.finder._get_hivemap_names(directories[1])
+        self.finder._get_hivemap_names(self.directory)
+
+        self.assertEqual(list(self.finder._directory_to_listing), [directories[1], self.directory])
+
+
+if __name__ == "__main__":
+    unittest.main()
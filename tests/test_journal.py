@@ -0,0 +1,190 @@
+import os
+import pickle
+import unittest
+from struct import Struct
+from tempfile import TemporaryDirectory
+from zlib import crc32
+
+from hive2_gui.history import CommandLogManager
+from hive2_gui.hivemap_io import HivemapRecords, NodeRecord, ParameterGroupRecord, ParameterRecord, Position
+from hive2_gui.journal import HistoryJournal, JournalEntryKinds, get_journal_path, read_journal, recover_journal
+
+
+class _RecordModel:
+    """Stand-in for NodeManager, whose model is a dictionary of node records changed by delta commands"""
+
+    delta_record_types = (NodeRecord, ParameterGroupRecord, ParameterRecord, Position)
+
+    _data_callback_names = frozenset(("_add_node", "_remove_node", "_move_node"))
+
+    def __init__(self):
+        self.history = CommandLogManager(limit=None)
+        self.nodes = {}
+
+    def add_node(self, name, x=0.0, y=0.0):
+        record = NodeRecord(name, "BEE", "hive.modifier", Position(x, y),
+                            [ParameterGroupRecord("args", [ParameterRecord("code", "str", "pass")])], [])
+        self._add_node(record)
+        self.history.record_delta(self._add_node, (record,), self._remove_node, (name,))
+
+    def remove_node(self, name):
+        record = self.nodes[name]
+        self._remove_node(name)
+        self.history.record_delta(self._remove_node, (name,), self._add_node, (record,))
+
+    def move_node(self, name, x, y):
+        position = self.nodes[name].position
+        self._move_node(name, Position(x, y))
+        self.history.record_delta(self._move_node, (name, Position(x, y)), self._move_node, (name, position),
+                                  merge_key=("move", name))
+
+    def _add_node(self, record):
+        self.nodes[record.identifier] = record
+
+    def _remove_node(self, name):
+        del self.nodes[name]
+
+    def _move_node(self, name, position):
+        self.nodes[name] = self.nodes[name]._replace(position=position)
+
+    def encode_delta(self, execute, execute_args, un_execute, un_execute_args):
+        if execute.__name__ not in self._data_callback_names or un_execute.__name__ not in self._data_callback_names:
+            return None
+
+        return execute.__name__, execute_args, un_execute.__name__, un_execute_args
+
+    def get_delta_callback(self, name):
+        if name not in self._data_callback_names:
+            raise ValueError("Unknown history callback '{}'".format(name))
+
+        return getattr(self, name)
+
+    def to_hivemap(self):
+        return HivemapRecords("", list(self.nodes.values()), [])
+
+    def load_hivemap(self, hivemap):
+        self.nodes = {record.identifier: record for record in hivemap.nodes}
+
+
+class HistoryJournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # Journals are closed (by their cleanups) before the directory is removed
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.file_path = get_journal_path(os.path.join(directory.name, "test.hivemap"))
+
+        self.model = _RecordModel()
+        self.model.add_node("before_journal")
+
+    def open_journal(self, **kwargs):
+        journal = HistoryJournal(self.file_path, self.model, **kwargs)
+        journal.open()
+        self.addCleanup(lambda: journal.is_open and journal.close())
+        return journal
+
+    def recover(self):
+        model = _RecordModel()
+        recover_journal(self.file_path, model)
+        return model
+
+    def assertRecovered(self, recovered):
+        """Assert that recovered model and history match the journalled model and history.
+
+        Commands recorded before the journal was opened cannot be recovered
+        """
+        self.assertEqual(recovered.nodes, self.model.nodes)
+
+        omitted_count = len(self.model.history.commands) - len(recovered.history.commands)
+        self.assertEqual(recovered.history.index, self.model.history.index - omitted_count)
+
+        while recovered.history.index >= 0:
+            self.model.history.undo()
+            recovered.history.undo()
+            self.assertEqual(recovered.nodes, self.model.nodes)
+
+    def test_recover(self):
+        journal = self.open_journal()
+
+        self.model.add_node("a")
+        self.model.add_node("b", 1.0, 2.0)
+
+        with self.model.history.merge_context():
+            for x in range(5):
+                self.model.move_node("a", x, x)
+
+        self.model.remove_node("b")
+        self.model.history.undo()
+        self.model.history.undo()
+        self.model.history.redo()
+
+        journal.flush()
+        self.assertRecovered(self.recover())
+
+    def test_recover_after_jump(self):
+        journal = self.open_journal()
+
+        self.model.add_node("a")
+        branch_id = self.model.history.command_id
+
+        self.model.history.undo()
+        self.model.add_node("b")
+        self.model.history.jump_to(branch_id)
+        self.model.add_node("c")
+
+        journal.flush()
+        recovered = self.recover()
+
+        self.assertEqual(set(recovered.nodes), {"before_journal", "a", "c"})
+        self.assertRecovered(recovered)
+
+    def test_recover_after_compaction(self):
+        journal = self.open_journal(compact_interval=3)
+
+        for index in range(10):
+            self.model.add_node("node_{}".format(index))
+
+        self.model.history.undo()
+
+        journal.flush()
+        self.assertRecovered(self.recover())
+
+    def test_incomplete_entry(self):
+        journal = self.open_journal()
+
+        self.model.add_node("a")
+        self.model.add_node("b")
+        journal.flush()
+        journal.close()
+
+        with open(self.file_path, "rb") as f:
+            data = f.read()
+
+        with open(self.file_path, "wb") as f:
+            f.write(data[:-3])
+
+        entries = read_journal(self.file_path, _RecordModel.delta_record_types)
+        self.assertEqual([e.kind for e in entries], [JournalEntryKinds.snapshot, JournalEntryKinds.command])
+
+        recovered = self.recover()
+        self.assertEqual(set(recovered.nodes), {"before_journal", "a"})
+
+    def test_discard(self):
+        journal = self.open_journal()
+        self.model.add_node("a")
+
+        journal.close(discard=True)
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_pickle_is_not_read(self):
+        payload = pickle.dumps((int(JournalEntryKinds.snapshot), (b"", [], -1)))
+
+        with open(self.file_path, "wb") as f:
+            f.write(Struct("<II").pack(len(payload), crc32(payload)) + payload)
+
+        self.assertEqual(read_journal(self.file_path, _RecordModel.delta_record_types), [])
+        self.assertRaises(ValueError, recover_journal, self.file_path, _RecordModel())
+
+
+if __name__ == "__main__":
+    unittest.main()
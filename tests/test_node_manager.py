@@ -0,0 +1,446 @@
+import unittest
+from logging import getLogger
+
+from hive2_gui.history import CommandLogManager
+from hive2_gui.hivemap_io import (ConnectionRecord, HivemapRecords, NodeRecord, ParameterGroupRecord, ParameterRecord,
+                                  Position)
+from hive2_gui.node import NodeTypes
+from hive2_gui.node_manager import NodeManager
+
+
+def _create_modifier_record(name, x=0.0, y=0.0, code="pass"):
+    args = ParameterGroupRecord("args", [ParameterRecord("code", "str", code)])
+    return NodeRecord(name, "BEE", "hive.modifier", Position(x, y), [args], [])
+
+
+def _create_trigger_record(from_node, to_node):
+    return ConnectionRecord(from_node, "triggered", to_node, "trigger", True)
+
+
+def _create_manager():
+    return NodeManager(CommandLogManager(limit=None), logger=getLogger(__name__))
+
+
+def _create_add_record(name, x=0.0, y=0.0, folded_pins=()):
+    return NodeRecord(name, "HIVE", "dragonfly.std.Add", Position(x, y), [], list(folded_pins))
+
+
+def _get_connection_names(manager):
+    names = set()
+    for node in manager.nodes.values():
+        for pin_name, pin in node.outputs.items():
+            for connection in pin.connections:
+                names.add((node.name, pin_name, connection.input_pin.node.name, connection.input_pin.name))
+
+    return names
+
+
+class ReferencePathIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = _create_manager()
+
+    def create_modifier(self):
+        return self.manager.create_node(NodeTypes.BEE, "hive.modifier", dict(args=dict(code="pass")))
+
+    def test_find_by_reference_path(self):
+        first = self.create_modifier()
+        second = self.create_modifier()
+        trigger = self.manager.create_node(NodeTypes.BEE, "hive.triggerfunc")
+
+        self.assertEqual(self.manager.find_by_reference_path("hive.modifier"),
+                         {first.name: first, second.name: second})
+        self.assertEqual(self.manager.find_by_reference_path("hive.triggerfunc"), {trigger.name: trigger})
+        self.assertEqual(self.manager.find_by_reference_path("hive.attribute"), {})
+
+        self.assertEqual(self.manager.count_by_reference_path("hive.modifier"), 2)
+        self.assertEqual(self.manager.count_by_reference_path("hive.attribute"), 0)
+        self.assertEqual(set(self.manager.reference_paths), {"hive.modifier", "hive.triggerfunc"})
+
+    def test_result_is_a_copy(self):
+        node = self.create_modifier()
+
+        nodes = self.manager.find_by_reference_path("hive.modifier")
+        nodes.clear()
+
+        self.assertEqual(self.manager.find_by_reference_path("hive.modifier"), {node.name: node})
+
+    def test_delete(self):
+        first = self.create_modifier()
+        second = self.create_modifier()
+
+        self.manager.delete_node(first)
+        self.assertEqual(self.manager.find_by_reference_path("hive.modifier"), {second.name: second})
+
+        self.manager.delete_node(second)
+        self.assertEqual(self.manager.count_by_reference_path("hive.modifier"), 0)
+        self.assertNotIn("hive.modifier", self.manager.reference_paths)
+
+        self.manager.history.undo()
+        self.assertEqual(set(self.manager.find_by_reference_path("hive.modifier")), {second.name})
+
+    def test_rename(self):
+        node = self.create_modifier()
+        self.manager.rename_node(node, "renamed")
+
+        self.assertEqual(self.manager.find_by_reference_path("hive.modifier"), {"renamed": node})
+
+        self.manager.history.undo()
+        self.assertEqual(set(self.manager.find_by_reference_path("hive.modifier")), {"modifier"})
+
+    def test_load_hivemap(self):
+        self.create_modifier()
+
+        hivemap = HivemapRecords("", [_create_modifier_record("a"), _create_modifier_record("b")],
+                                 [_create_trigger_record("a", "b")])
+        self.manager.load_hivemap(hivemap)
+
+        self.assertEqual(set(self.manager.find_by_reference_path("hive.modifier")), {"a", "b"})
+
+        self.manager.history.undo()
+        self.assertEqual(set(self.manager.find_by_reference_path("hive.modifier")), {"modifier"})
+
+
+class BulkLoadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = _create_manager()
+        self.loaded = []
+        self.created = []
+
+        self.manager.on_graph_loaded.subscribe(lambda nodes, connections: self.loaded.append((nodes, connections)))
+        self.manager.on_node_created.subscribe(self.created.append)
+
+    def test_single_command(self):
+        hivemap = HivemapRecords("Doc", [_create_modifier_record("a"), _create_modifier_record("b", 100.0, 50.0)],
+                                 [_create_trigger_record("a", "b")])
+        self.manager.load_hivemap(hivemap)
+
+        self.assertEqual(set(self.manager.nodes), {"a", "b"})
+        self.assertEqual(self.manager.nodes["b"].position, (100.0, 50.0))
+        self.assertEqual(_get_connection_names(self.manager), {("a", "triggered", "b", "trigger")})
+        self.assertEqual(self.manager.docstring, "Doc")
+
+        # Observers are notified once, rather than per node
+        self.assertEqual(len(self.loaded), 1)
+        nodes, connections = self.loaded[0]
+        self.assertEqual({n.name for n in nodes}, {"a", "b"})
+        self.assertEqual(len(connections), 1)
+        self.assertEqual(self.created, [])
+
+        self.assertEqual(len(self.manager.history.commands), 1)
+
+    def test_undo_redo(self):
+        existing = self.manager.create_node(NodeTypes.BEE, "hive.triggerfunc")
+        hivemap = HivemapRecords("", [_create_modifier_record("a"), _create_modifier_record("b")],
+                                 [_create_trigger_record("a", "b")])
+        self.manager.load_hivemap(hivemap)
+
+        self.manager.history.undo()
+        self.assertEqual(set(self.manager.nodes), {existing.name})
+
+        self.manager.history.redo()
+        self.assertEqual(set(self.manager.nodes), {"a", "b"})
+        self.assertEqual(_get_connection_names(self.manager), {("a", "triggered", "b", "trigger")})
+
+    def test_invalid_nodes_are_skipped(self):
+        invalid = NodeRecord("invalid", "BEE", "hive.invalid", Position(0.0, 0.0), [], [])
+        hivemap = HivemapRecords("", [_create_modifier_record("a"), invalid, _create_modifier_record("b")],
+                                 [_create_trigger_record("a", "invalid"), _create_trigger_record("a", "b")])
+        self.manager.load_hivemap(hivemap)
+
+        self.assertEqual(set(self.manager.nodes), {"a", "b"})
+        self.assertEqual(_get_connection_names(self.manager), {("a", "triggered", "b", "trigger")})
+
+    def test_folded_pins(self):
+        hivemap = HivemapRecords("", [_create_add_record("add", folded_pins=["a"])], [])
+        self.manager.load_hivemap(hivemap)
+
+        add = self.manager.nodes["add"]
+        self.assertTrue(add.inputs["a"].is_folded)
+        self.assertFalse(add.inputs["b"].is_folded)
+        self.assertEqual(len(self.manager.nodes), 2)
+
+        self.manager.history.undo()
+        self.assertEqual(self.manager.nodes, {})
+
+    def test_paste(self):
+        first = self.manager.create_node(NodeTypes.BEE, "hive.modifier", dict(args=dict(code="pass")))
+        second = self.manager.create_node(NodeTypes.BEE, "hive.modifier", dict(args=dict(code="pass")))
+        self.manager.reposition_node(second, (100.0, 0.0))
+        self.manager.create_connection(first.outputs["triggered"], second.inputs["trigger"])
+
+        clipboard = self.manager.copy([first, second])
+        command_count = len(self.manager.history.commands)
+        self.loaded.clear()
+
+        self.manager.paste(clipboard, (50.0, 200.0))
+
+        self.assertEqual(len(self.manager.nodes), 4)
+        self.assertEqual(len(self.manager.history.commands), command_count + 1)
+        self.assertEqual(len(self.loaded), 1)
+
+        nodes, connections = self.loaded[0]
+        positions = sorted(n.position for n in nodes)
+        self.assertEqual(positions, [(0.0, 200.0), (100.0, 200.0)])
+        self.assertTrue({n.name for n in nodes}.isdisjoint({first.name, second.name}))
+        self.assertEqual(len(connections), 1)
+
+
+class LazyLoadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = _create_manager()
+        self.hivemap = self.create_hivemap()
+
+    @staticmethod
+    def create_hivemap(far_x=5000.0):
+        nodes = [_create_modifier_record("near"), _create_modifier_record("far", far_x, 0.0),
+                 _create_modifier_record("distant", 9000.0, 0.0)]
+        return HivemapRecords("", nodes, [_create_trigger_record("far", "distant")])
+
+    @staticmethod
+    def is_dormant(spyder_node):
+        return spyder_node.position.x > 1000.0
+
+    def test_load_dormant(self):
+        self.manager.load_hivemap(self.hivemap, is_dormant=self.is_dormant)
+
+        self.assertEqual(set(self.manager.nodes), {"near"})
+        self.assertEqual(set(self.manager.dormant_names), {"far", "distant"})
+        self.assertEqual(_get_connection_names(self.manager), set())
+
+        # Dormant nodes are still part of the hivemap
+        hivemap = self.manager.to_hivemap()
+        self.assertEqual({n.identifier for n in hivemap.nodes}, {"near", "far", "distant"})
+        self.assertEqual([(c.from_node, c.to_node) for c in hivemap.connections], [("far", "distant")])
+
+        self.manager.history.undo()
+        self.assertEqual(self.manager.nodes, {})
+        self.assertEqual(set(self.manager.dormant_names), set())
+
+    def test_hydrated_neighbours(self):
+        hivemap = HivemapRecords("", self.hivemap.nodes, [_create_trigger_record("near", "far")])
+        self.manager.load_hivemap(hivemap, is_dormant=self.is_dormant)
+
+        # Hydrated nodes are completed with their connected nodes
+        self.assertEqual(set(self.manager.nodes), {"near", "far"})
+        self.assertEqual(set(self.manager.dormant_names), {"distant"})
+        self.assertEqual(_get_connection_names(self.manager), {("near", "triggered", "far", "trigger")})
+
+    def test_dormant_names_are_reserved(self):
+        self.manager.load_hivemap(self.hivemap, is_dormant=self.is_dormant)
+
+        node = self.manager.create_node(NodeTypes.BEE, "hive.modifier", dict(args=dict(code="pass")))
+        self.assertNotIn(node.name, {"near", "far", "distant"})
+
+    def test_hydrate_region(self):
+        self.manager.load_hivemap(self.hivemap, is_dormant=self.is_dormant)
+        command_count = len(self.manager.history.commands)
+
+        self.assertEqual(self.manager.hydrate_region(-100.0, -100.0, 200.0, 200.0), [])
+        self.assertEqual(self.manager.hydrate_region(2000.0, -100.0, 200.0, 200.0), [])
+
+        nodes = self.manager.hydrate_region(4900.0, -100.0, 200.0, 200.0)
+        self.assertEqual({n.name for n in nodes}, {"far", "distant"})
+        self.assertEqual(set(self.manager.nodes), {"near", "far", "distant"})
+        self.assertEqual(set(self.manager.dormant_names), set())
+        self.assertEqual(_get_connection_names(self.manager), {("far", "triggered", "distant", "trigger")})
+
+        # Hydration does not change the hivemap
+        self.assertEqual(len(self.manager.history.commands), command_count)
+
+    def test_bounding_box(self):
+        self.assertIsNone(self.manager.get_bounding_box())
+
+        self.manager.load_hivemap(self.hivemap, is_dormant=self.is_dormant)
+        self.assertEqual(self.manager.get_bounding_box(), (0.0, 0.0, 9000.0, 0.0))
+
+    def test_patch_unchanged_dormant(self):
+        self.manager.load_hivemap(self.hivemap, is_dormant=self.is_dormant)
+
+        counts = self.manager.patch_hivemap(self.create_hivemap())
+        self.assertEqual(counts, dict(added=0, removed=0, connected=0, disconnected=0, changed=0))
+        self.assertEqual(set(self.manager.dormant_names), {"far", "distant"})
+
+    def test_patch_changed_dormant(self):
+        self.manager.load_hivemap(self.hivemap, is_dormant=self.is_dormant)
+
+        self.manager.patch_hivemap(self.create_hivemap(far_x=6000.0))
+        self.assertEqual(set(self.manager.dormant_names), set())
+        self.assertEqual(self.manager.nodes["far"].position, (6000.0, 0.0))
+        self.assertEqual(_get_connection_names(self.manager), {("far", "triggered", "distant", "trigger")})
+
+        self.manager.history.undo()
+        self.assertEqual(self.manager.nodes["far"].position, (5000.0, 0.0))
+
+    def test_patch_removed_dormant(self):
+        self.manager.load_hivemap(self.hivemap, is_dormant=self.is_dormant)
+
+        hivemap = HivemapRecords("", self.hivemap.nodes[:2], [])
+        counts = self.manager.patch_hivemap(hivemap)
+        self.assertEqual(counts['removed'], 1)
+        self.assertEqual(set(self.manager.nodes), {"near", "far"})
+        self.assertEqual(set(self.manager.dormant_names), set())
+        self.assertEqual({n.identifier for n in self.manager.to_hivemap().nodes}, {"near", "far"})
+
+        self.manager.history.undo()
+        self.assertEqual(set(self.manager.nodes), {"near", "far", "distant"})
+        self.assertEqual(_get_connection_names(self.manager), {("far", "triggered", "distant", "trigger")})
+
+class PatchHivemapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = _create_manager()
+        self.manager.load_hivemap(HivemapRecords("", [_create_modifier_record("a"), _create_modifier_record("b")],
+                                                 [_create_trigger_record("a", "b")]))
+        self.command_count = len(self.manager.history.commands)
+
+    def patch(self, nodes, connections, docstring=""):
+        return self.manager.patch_hivemap(HivemapRecords(docstring, nodes, connections))
+
+    def assert_counts(self, counts, **expected):
+        self.assertEqual(counts, dict(dict(added=0, removed=0, connected=0, disconnected=0, changed=0), **expected))
+
+    def test_unchanged(self):
+        nodes = dict(self.manager.nodes)
+
+        counts = self.patch([_create_modifier_record("a"), _create_modifier_record("b")],
+                            [_create_trigger_record("a", "b")])
+        self.assert_counts(counts)
+
+        # Nodes are kept, rather than re-created
+        self.assertEqual(self.manager.nodes, nodes)
+        self.assertEqual(len(self.manager.history.commands), self.command_count)
+
+    def test_add(self):
+        counts = self.patch([_create_modifier_record("a"), _create_modifier_record("b"),
+                             _create_modifier_record("c", 100.0, 0.0)],
+                            [_create_trigger_record("a", "b"), _create_trigger_record("b", "c")])
+        self.assert_counts(counts, added=1, connected=1)
+
+        self.assertEqual(set(self.manager.nodes), {"a", "b", "c"})
+        self.assertEqual(self.manager.nodes["c"].position, (100.0, 0.0))
+        self.assertEqual(_get_connection_names(self.manager), {("a", "triggered", "b", "trigger"),
+                                                               ("b", "triggered", "c", "trigger")})
+
+    def test_remove(self):
+        counts = self.patch([_create_modifier_record("a")], [])
+        self.assert_counts(counts, removed=1, disconnected=1)
+
+        self.assertEqual(set(self.manager.nodes), {"a"})
+        self.assertEqual(_get_connection_names(self.manager), set())
+
+    def test_modify(self):
+        a = self.manager.nodes["a"]
+        b = self.manager.nodes["b"]
+
+        counts = self.patch([_create_modifier_record("a", code="print(1)"), _create_modifier_record("b", 50.0, 20.0)],
+                            [], docstring="Patched")
+        self.assert_counts(counts, disconnected=1, changed=1)
+
+        # Arguments are changed in place
+        self.assertIs(self.manager.nodes["a"], a)
+        self.assertEqual(a.params["args"]["code"], "print(1)")
+        self.assertIs(self.manager.nodes["b"], b)
+        self.assertEqual(b.position, (50.0, 20.0))
+        self.assertEqual(_get_connection_names(self.manager), set())
+        self.assertEqual(self.manager.docstring, "Patched")
+
+    def test_modify_type(self):
+        counts = self.patch([_create_modifier_record("a"), NodeRecord("b", "BEE", "hive.triggerfunc",
+                                                                      Position(0.0, 0.0), [], [])], [])
+        self.assert_counts(counts, added=1, removed=1, disconnected=1)
+
+        self.assertEqual(self.manager.nodes["b"].reference_path, "hive.triggerfunc")
+
+    def test_undo(self):
+        self.patch([_create_modifier_record("a", code="print(1)"), _create_modifier_record("c")],
+                   [_create_trigger_record("c", "a")])
+
+        # Patch is undone as one command
+        self.assertEqual(len(self.manager.history.commands), self.command_count + 1)
+        self.manager.history.undo()
+
+        self.assertEqual(set(self.manager.nodes), {"a", "b"})
+        self.assertEqual(self.manager.nodes["a"].params["args"]["code"], "pass")
+        self.assertEqual(_get_connection_names(self.manager), {("a", "triggered", "b", "trigger")})
+
+
+class SnapshotUndoTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = _create_manager()
+
+        nodes = [_create_modifier_record("a"), _create_modifier_record("b", 100.0, 0.0),
+                 _create_modifier_record("c", 100.0, 100.0), _create_add_record("add", 200.0, 0.0, folded_pins=["a"])]
+        self.manager.load_hivemap(HivemapRecords("", nodes, [_create_trigger_record("a", "c"),
+                                                             _create_trigger_record("a", "b")]))
+        self.original = self.get_state()
+        self.command_count = len(self.manager.history.commands)
+
+    def get_state(self):
+        manager = self.manager
+        return (sorted((name, node.reference_path, tuple(node.position)) for name, node in manager.nodes.items()),
+                _get_connection_names(manager),
+                [c.input_pin.node.name for c in manager.nodes["a"].outputs["triggered"].connections],
+                {(node.name, pin_name) for node in manager.nodes.values() for pin_name, pin in node.inputs.items()
+                 if pin.is_folded})
+
+    def load_replacement(self, is_dormant=None):
+        self.manager.load_hivemap(HivemapRecords("", [_create_modifier_record("d")], []),
+                                  is_dormant=is_dormant)
+
+    def test_undo_load(self):
+        self.load_replacement()
+        self.assertEqual(set(self.manager.nodes), {"d"})
+
+        # Loading is one command, which is undone in one step
+        self.assertEqual(len(self.manager.history.commands), self.command_count + 1)
+        self.manager.history.undo()
+
+        state = self.get_state()
+        self.assertEqual(state, self.original)
+        self.assertEqual(state[2], ["c", "b"])
+        self.assertEqual(state[3], {("add", "a")})
+
+        self.manager.history.redo()
+        self.assertEqual(set(self.manager.nodes), {"d"})
+
+    def test_undo_load_events(self):
+        self.load_replacement()
+
+        events = []
+        for name in ("graph_loaded", "graph_unloaded", "node_created", "node_destroyed", "connection_created",
+                     "connection_destroyed"):
+            getattr(self.manager, "on_{}".format(name)).subscribe(lambda *args, name=name: events.append(name))
+
+        self.manager.history.undo()
+
+        # Graphs are replaced as a whole, rather than node by node
+        self.assertEqual(sorted(events), ["graph_loaded", "graph_unloaded"])
+
+    def test_undo_load_of_dormant_graph(self):
+        self.manager.load_hivemap(HivemapRecords("", [_create_modifier_record("near"),
+                                                      _create_modifier_record("far", 5000.0, 0.0),
+                                                      _create_modifier_record("distant", 9000.0, 0.0)],
+                                                 [_create_trigger_record("far", "distant")]),
+                                  is_dormant=LazyLoadTestCase.is_dormant)
+
+        self.load_replacement()
+        self.manager.history.undo()
+
+        self.assertEqual(set(self.manager.nodes), {"near"})
+        self.assertEqual(set(self.manager.dormant_names), {"far", "distant"})
+
+        self.manager.hydrate_all()
+        self.assertEqual(_get_connection_names(self.manager), {("far", "triggered", "distant", "trigger")})
+
+        # Undoing the lazy load restores the original model
+        self.manager.history.undo()
+        self.assertEqual(self.get_state(), self.original)
+        self.assertEqual(set(self.manager.dormant_names), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
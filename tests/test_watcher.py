@@ -0,0 +1,90 @@
+import os
+import time
+import unittest
+from tempfile import TemporaryDirectory
+
+from hive2_gui.finders.watcher import ChangeKinds, FileChange, PollingWatcher
+
+
+def _write(file_path, text):
+    with open(file_path, "w") as f:
+        f.write(text)
+
+
+class PollingWatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.module_path = os.path.join(self.directory, "module.py")
+        _write(self.module_path, "")
+
+    def create_watcher(self, interval=None):
+        watcher = PollingWatcher(self.directory, interval=interval)
+        self.addCleanup(watcher.close)
+        return watcher
+
+    def test_poll(self):
+        watcher = self.create_watcher()
+        self.assertEqual(watcher.poll(), [])
+
+        hivemap_path = os.path.join(self.directory, "some_hive.hivemap")
+        _write(hivemap_path, "")
+        self.assertEqual(watcher.poll(), [FileChange(ChangeKinds.CREATED, hivemap_path)])
+
+        _write(self.module_path, "import hive\n")
+        self.assertEqual(watcher.poll(), [FileChange(ChangeKinds.MODIFIED, self.module_path)])
+
+        os.remove(hivemap_path)
+        self.assertEqual(watcher.poll(), [FileChange(ChangeKinds.DELETED, hivemap_path)])
+        self.assertEqual(watcher.poll(), [])
+
+    def test_ignored_files(self):
+        watcher = self.create_watcher()
+
+        for directory_name in ("__pycache__", ".hidden"):
+            os.mkdir(os.path.join(self.directory, directory_name))
+            _write(os.path.join(self.directory, directory_name, "module.py"), "")
+
+        _write(os.path.join(self.directory, "notes.txt"), "")
+
+        package_path = os.path.join(self.directory, "package")
+        os.mkdir(package_path)
+        _write(os.path.join(package_path, "__init__.py"), "")
+
+        self.assertEqual(watcher.poll(), [FileChange(ChangeKinds.CREATED, os.path.join(package_path, "__init__.py"))])
+
+    def test_paths(self):
+        watcher = self.create_watcher()
+
+        with TemporaryDirectory() as other_directory:
+            watcher.add_path(other_directory)
+            self.assertEqual(watcher.paths, {self.directory, other_directory})
+
+            watcher.remove_path(self.directory)
+            _write(self.module_path, "import hive\n")
+
+            self.assertEqual(watcher.poll(), [])
+            self.assertEqual(watcher.paths, {other_directory})
+
+    def test_thread(self):
+        watcher = self.create_watcher(interval=0.01)
+        _write(self.module_path, "import hive\n")
+
+        changes = []
+        end_time = time.monotonic() + 5.0
+
+        while not changes and time.monotonic() < end_time:
+            time.sleep(0.01)
+            changes = watcher.poll()
+
+        self.assertEqual(changes, [FileChange(ChangeKinds.MODIFIED, self.module_path)])
+
+        watcher.close()
+        self.assertEqual(watcher.paths, set())
+
+
+if __name__ == "__main__":
+    unittest.main()